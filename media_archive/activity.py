@@ -0,0 +1,126 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import tasks
+from .models import ActivityEvent, ActivityDaily
+
+logger = logging.getLogger(__name__)
+
+# Журнал действий: кто и когда создал, загрузил, одобрил, отклонил или
+# удалил объект. Представления не пишут в базу сами: record() после коммита
+# кладёт записи в буфер процесса, а фоновая задача сбрасывает его одним
+# bulk_create, когда набирается ARCHIVE_ACTIVITY_BATCH записей или проходит
+# ARCHIVE_ACTIVITY_FLUSH_SECONDS. В той же транзакции пополняются дневные
+# итоги ActivityDaily, по которым строится страница статистики.
+# При аварийном завершении процесса теряется не больше одного буфера.
+
+_buffer = []
+_lock = threading.Lock()
+_timer = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record(actor, action, object_type, object_ids):
+    """Записывает действие actor над объектами object_ids, если текущая
+    транзакция завершится успешно."""
+    now = timezone.now()
+    actor_id = actor.pk if actor is not None and actor.is_authenticated else None
+    rows = [
+        ActivityEvent(actor_id=actor_id, action=action, object_type=object_type,
+                      object_id=object_id, created_at=now)
+        for object_id in object_ids
+    ]
+    if rows:
+        transaction.on_commit(lambda: _add(rows))
+
+
+def _add(rows):
+    global _timer
+    if _setting('ARCHIVE_TASKS_EAGER', False):
+        write(rows)
+        return
+    with _lock:
+        _buffer.extend(rows)
+        full = len(_buffer) >= _setting('ARCHIVE_ACTIVITY_BATCH', 200)
+        if not full and _timer is None:
+            _timer = threading.Timer(_setting('ARCHIVE_ACTIVITY_FLUSH_SECONDS', 5), _flush_later)
+            _timer.daemon = True
+            _timer.start()
+    if full:
+        tasks.enqueue(flush)
+
+
+def _flush_later():
+    global _timer
+    with _lock:
+        _timer = None
+    tasks.enqueue(flush)
+
+
+def flush():
+    """Пишет накопленные записи. Возвращает их число."""
+    with _lock:
+        rows = _buffer[:]
+        del _buffer[:]
+    if rows:
+        write(rows)
+    return len(rows)
+
+
+def write(rows):
+    with transaction.atomic():
+        ActivityEvent.objects.bulk_create(rows, batch_size=500)
+        counts = Counter(
+            (timezone.localdate(row.created_at), row.actor_id, row.action, row.object_type)
+            for row in rows
+        )
+        for key, count in counts.items():
+            _add_daily(*key, count)
+
+
+def _add_daily(day, actor_id, action, object_type, count):
+    lookup = {'day': day, 'actor_id': actor_id, 'action': action, 'object_type': object_type}
+    if ActivityDaily.objects.filter(**lookup).update(count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            ActivityDaily.objects.create(**lookup, count=count)
+    except IntegrityError:
+        # Строку за этот день только что создал другой процесс
+        ActivityDaily.objects.filter(**lookup).update(count=F('count') + count)
+
+
+def rebuild_daily():
+    """Пересчитывает ActivityDaily по журналу. Возвращает число строк."""
+    flush()
+    totals = ActivityEvent.objects.annotate(day=TruncDate('created_at')).values(
+        'day', 'actor_id', 'action', 'object_type'
+    ).annotate(total=Count('id')).order_by()
+    rows = [
+        ActivityDaily(day=row['day'], actor_id=row['actor_id'], action=row['action'],
+                      object_type=row['object_type'], count=row['total'])
+        for row in totals
+    ]
+    with transaction.atomic():
+        ActivityDaily.objects.all().delete()
+        ActivityDaily.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Не удалось записать журнал действий при выходе')
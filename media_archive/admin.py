@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.models import Group, User
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
-from .models import YearAlbum, SchoolClass, EventAlbum, Photo
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo, ActivityEvent
+from . import covers
 
 # Убираем группы
 admin.site.unregister(Group)
@@ -65,23 +66,39 @@ class CustomUserAdmin(UserAdmin):
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
 
+# Обложка, выбранная в админке, считается ручной; очистка поля
+# возвращает альбом к автоматическому выбору
+class CoverAdminMixin:
+    raw_id_fields = ['cover_photo']
+    exclude = ['cover_is_manual']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'cover_photo' not in form.changed_data:
+            return
+        if obj.cover_photo is not None:
+            covers.set_manual_cover(obj, obj.cover_photo)
+        else:
+            type(obj).objects.filter(pk=obj.pk).update(cover_is_manual=False)
+            covers.schedule_refresh(obj)
+
 # Ваши модели
 @admin.register(YearAlbum)
-class YearAlbumAdmin(admin.ModelAdmin):
+class YearAlbumAdmin(CoverAdminMixin, admin.ModelAdmin):
     list_display = ['year', 'status', 'created_by', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['year']
     list_editable = ['status']
 
 @admin.register(SchoolClass)
-class SchoolClassAdmin(admin.ModelAdmin):
+class SchoolClassAdmin(CoverAdminMixin, admin.ModelAdmin):
     list_display = ['class_name', 'year_album', 'status', 'created_by', 'created_at']
     list_filter = ['status', 'year_album', 'created_at']
     search_fields = ['class_name']
     list_editable = ['status']
 
 @admin.register(EventAlbum)
-class EventAlbumAdmin(admin.ModelAdmin):
+class EventAlbumAdmin(CoverAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'school_class', 'status', 'created_by', 'created_at']
     list_filter = ['status', 'school_class', 'created_at']
     search_fields = ['title']
@@ -89,7 +106,25 @@ class EventAlbumAdmin(admin.ModelAdmin):
 
 @admin.register(Photo)
 class PhotoAdmin(admin.ModelAdmin):
-    list_display = ['id', 'event_album', 'status', 'uploaded_by', 'uploaded_at']
-    list_filter = ['status', 'uploaded_at', 'event_album']
+    list_display = ['id', 'event_album', 'status', 'uploaded_by', 'uploaded_at', 'taken_at']
+    list_filter = ['status', 'uploaded_at', 'has_exif_time', 'event_album']
     search_fields = ['event_album__title']
-    list_editable = ['status']
\ No newline at end of file
+    list_editable = ['status']
+
+# Журнал только для чтения: записи добавляет activity.record
+@admin.register(ActivityEvent)
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'actor', 'action', 'object_type', 'object_id']
+    list_filter = ['action', 'object_type', 'created_at']
+    search_fields = ['actor__username', 'object_id']
+    list_select_related = ['actor']
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,422 @@
+import asyncio
+import base64
+import binascii
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+try:
+    import orjson
+except ImportError:  # без orjson ответы сериализует стандартный json
+    orjson = None
+
+from . import covers, ingest, moderation, permissions, similarity, timeline
+from .resources import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RESOURCES, ApiError, embed, parse_includes, requested_fields
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo
+from .storage import photo_storage
+from .throttling import ingest_slot, rate_limit
+
+# Читающие JSON-эндпоинты написаны асинхронно и под ASGI не занимают поток
+# на время ожидания базы. Очередь модерации пишет в базу в транзакциях,
+# поэтому её эндпоинты обычные синхронные.
+
+SUGGEST_LIMIT = 10
+SIMILAR_LIMIT = 12
+MAX_SIMILAR_LIMIT = 50
+MAX_TIMELINE_BUCKETS = 120
+
+
+def _file_url(name, storage=default_storage):
+    return storage.url(name) if name else None
+
+
+def _photo_item(photo):
+    return {
+        'id': photo['id'],
+        'url': _file_url(photo['image'], photo_storage()),
+        'thumbnail_url': _file_url(photo['thumbnail']),
+        'width': photo['width'],
+        'height': photo['height'],
+        'taken_at': photo['taken_at'].isoformat() if photo['has_exif_time'] else None,
+        'uploaded_at': photo['uploaded_at'].isoformat(),
+    }
+
+
+async def event_photos(request, event_id):
+    event = await EventAlbum.objects.filter(
+        id=event_id, status='approved',
+        school_class__status='approved',
+        school_class__year_album__status='approved',
+    ).values('id', 'title', 'cache_version').afirst()
+    if event is None:
+        raise Http404('Событие не найдено')
+    # Загрузка, модерация и удаление фото и готовая миниатюра увеличивают
+    # cache_version события - без изменений отвечаем 304 без запроса фото
+    etag = quote_etag(f"event-{event_id}-{event.pop('cache_version')}")
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    photos = Photo.objects.filter(
+        event_album_id=event_id, status='approved'
+    ).order_by('taken_at', 'id').values(
+        'id', 'image', 'thumbnail', 'width', 'height',
+        'taken_at', 'has_exif_time', 'uploaded_at'
+    )
+    response = JsonResponse({
+        'event': event,
+        'photos': [_photo_item(photo) async for photo in photos],
+    })
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@rate_limit('search', methods=('GET',))
+async def suggest(request):
+    query = request.GET.get('q', '').strip()
+    if len(query) < 2:
+        return JsonResponse({'results': []})
+    results = []
+    years = YearAlbum.objects.filter(
+        status='approved', year__startswith=query
+    ).order_by('-year').values('id', 'year')[:SUGGEST_LIMIT]
+    async for year in years:
+        results.append({'type': 'year', 'id': year['id'], 'label': year['year']})
+    classes = SchoolClass.objects.filter(
+        status='approved', year_album__status='approved', class_name__istartswith=query
+    ).order_by('class_name').values('id', 'class_name', 'year_album__year')[:SUGGEST_LIMIT]
+    async for school_class in classes:
+        results.append({
+            'type': 'class',
+            'id': school_class['id'],
+            'label': f"{school_class['class_name']} ({school_class['year_album__year']})",
+        })
+    events = EventAlbum.objects.filter(
+        status='approved', school_class__status='approved',
+        school_class__year_album__status='approved', title__icontains=query
+    ).order_by('-created_at').values('id', 'title', 'school_class__class_name')[:SUGGEST_LIMIT]
+    async for event in events:
+        results.append({
+            'type': 'event',
+            'id': event['id'],
+            'label': f"{event['title']} ({event['school_class__class_name']})",
+        })
+    return JsonResponse({'results': results[:SUGGEST_LIMIT]})
+
+
+def json_response(data, status=200):
+    if orjson is None:
+        return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+    return HttpResponse(orjson.dumps(data), status=status, content_type='application/json')
+
+
+def _int_param(request, name, default, maximum):
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        raise ApiError(f'{name} должен быть числом')
+    return max(1, min(value, maximum))
+
+
+async def _resource_list(request, resource, **filters):
+    """Список ресурса: ?fields=, ?include=, ?ids=1,2,3 или ?limit=&after=."""
+    try:
+        names = requested_fields(request, resource)
+        tree = parse_includes(resource, request.GET.get('include'))
+        queryset = resource.queryset().filter(**filters)
+        ordering = [field.lstrip('-') for field in resource.ordering]
+        ids = request.GET.get('ids')
+        if ids:
+            try:
+                ids = [int(value) for value in ids.split(',') if value.strip()][:MAX_PAGE_SIZE]
+            except ValueError:
+                raise ApiError('ids должны быть числами')
+            queryset = resource.select(queryset.filter(id__in=ids), names)
+            found = {row['id']: row async for row in queryset}
+            rows = [found[pk] for pk in ids if pk in found]
+            next_cursor = None
+        else:
+            limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+            if request.GET.get('after'):
+                queryset = resource.after_cursor(queryset, request.GET['after'])
+            queryset = resource.order(resource.select(queryset, names, extra=ordering))
+            rows = [row async for row in queryset[:limit + 1]]
+            next_cursor = resource.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+            rows = rows[:limit]
+        items = [resource.render(row, names) for row in rows]
+        if tree:
+            await embed(request, resource, items, rows, tree)
+    except ApiError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    response = {'data': items}
+    if not ids:
+        response['next'] = next_cursor
+    else:
+        response['missing'] = [pk for pk in ids if pk not in found]
+    return json_response(response)
+
+
+async def _resource_detail(request, resource, object_id):
+    try:
+        names = requested_fields(request, resource)
+        tree = parse_includes(resource, request.GET.get('include'))
+        row = await resource.select(resource.queryset().filter(id=object_id), names).afirst()
+        if row is None:
+            return json_response({'error': 'Не найдено'}, status=404)
+        items = [resource.render(row, names)]
+        if tree:
+            await embed(request, resource, items, [row], tree)
+    except ApiError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    return json_response({'data': items[0]})
+
+
+async def years(request):
+    return await _resource_list(request, RESOURCES['year'])
+
+
+async def year(request, year_id):
+    return await _resource_detail(request, RESOURCES['year'], year_id)
+
+
+async def classes(request):
+    filters = {'year_album_id': request.GET['year']} if request.GET.get('year', '').isdigit() else {}
+    return await _resource_list(request, RESOURCES['class'], **filters)
+
+
+async def school_class(request, class_id):
+    return await _resource_detail(request, RESOURCES['class'], class_id)
+
+
+async def events(request):
+    filters = {'school_class_id': request.GET['class']} if request.GET.get('class', '').isdigit() else {}
+    return await _resource_list(request, RESOURCES['event'], **filters)
+
+
+async def event(request, event_id):
+    return await _resource_detail(request, RESOURCES['event'], event_id)
+
+
+async def photos(request):
+    filters = {'event_album_id': request.GET['event']} if request.GET.get('event', '').isdigit() else {}
+    return await _resource_list(request, RESOURCES['photo'], **filters)
+
+
+async def photo(request, photo_id):
+    return await _resource_detail(request, RESOURCES['photo'], photo_id)
+
+
+async def similar_photos(request, photo_id):
+    """Фото, похожие по цветам на photo_id, от самых похожих; в каждом
+    элементе поле score - сходство от 0 до 1."""
+    resource = RESOURCES['photo']
+    try:
+        names = requested_fields(request, resource)
+        limit = _int_param(request, 'limit', SIMILAR_LIMIT, MAX_SIMILAR_LIMIT)
+    except ApiError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    if not await resource.queryset().filter(id=photo_id).aexists():
+        return json_response({'error': 'Не найдено'}, status=404)
+    try:
+        # Поиск - вычисления numpy по memmap, их выносим из цикла событий.
+        # Берём с запасом: часть соседей может быть не одобрена или удалена
+        neighbours = await asyncio.to_thread(similarity.get_store().nearest, photo_id, limit * 3)
+    except ImproperlyConfigured as exc:
+        return json_response({'error': str(exc)}, status=503)
+    if neighbours is None:
+        return json_response({'error': 'Для фото ещё не посчитаны признаки'}, status=404)
+    scores = dict(neighbours)
+    queryset = resource.select(resource.queryset().filter(id__in=scores), names)
+    found = {row['id']: row async for row in queryset}
+    items = []
+    for pk, score in neighbours:
+        if pk in found:
+            items.append({**resource.render(found[pk], names), 'score': round(score, 4)})
+            if len(items) >= limit:
+                break
+    return json_response({'data': items})
+
+
+def _date_param(request, name, default):
+    value = request.GET.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f'{name} должен быть датой ГГГГ-ММ-ДД')
+
+
+async def timeline_buckets(request):
+    """Итоги ленты по периодам: ?unit=month|week&from=ГГГГ-ММ-ДД&to=ГГГГ-ММ-ДД."""
+    unit = request.GET.get('unit', 'month')
+    try:
+        if unit not in timeline.UNITS:
+            raise ApiError('unit должен быть month или week')
+        last = _date_param(request, 'to', timezone.localdate())
+        first = _date_param(request, 'from', last - datetime.timedelta(days=365))
+        if first > last:
+            raise ApiError('from позже to')
+        if len(timeline.bucket_starts(unit, first, last)) > MAX_TIMELINE_BUCKETS:
+            raise ApiError(f'Не больше {MAX_TIMELINE_BUCKETS} периодов за запрос')
+    except ApiError as exc:
+        return json_response({'error': str(exc)}, status=400)
+    buckets = await sync_to_async(timeline.buckets)(unit, first, last)
+    return json_response({
+        'unit': unit,
+        'data': [{**bucket, 'start': bucket['start'].isoformat()} for bucket in buckets],
+    })
+
+
+def _staff_only(view_func):
+    def wrapper(request, *args, **kwargs):
+        if not permissions.is_moderator(request.user):
+            return JsonResponse({'error': 'Нужны права модератора'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def _moderation_item(object_type, obj):
+    item = {'type': object_type, 'id': obj.id}
+    if object_type == 'year':
+        item.update(label=obj.year, created_by=obj.created_by.username)
+    elif object_type == 'class':
+        item.update(label=obj.class_name, year=obj.year_album.year,
+                    created_by=obj.created_by.username)
+    elif object_type == 'event':
+        item.update(label=obj.title, school_class=obj.school_class.class_name,
+                    created_by=obj.created_by.username)
+    else:
+        item.update(
+            label=f'Фото #{obj.id}',
+            event=obj.event_album.title,
+            url=obj.image.url,
+            thumbnail_url=_file_url(obj.thumbnail.name),
+            uploaded_by=obj.uploaded_by.username,
+            uploaded_at=obj.uploaded_at.isoformat(),
+        )
+    return item
+
+
+MODERATION_RELATED = {
+    'year': ('created_by',),
+    'class': ('created_by', 'year_album'),
+    'event': ('created_by', 'school_class'),
+    'photo': ('uploaded_by', 'event_album'),
+}
+
+
+@require_POST
+@_staff_only
+def moderation_claim(request):
+    object_type = request.POST.get('type', 'photo')
+    if object_type not in moderation.MODELS:
+        return JsonResponse({'error': 'Неизвестный тип объекта'}, status=400)
+    try:
+        limit = int(request.POST.get('limit', 20))
+    except ValueError:
+        return JsonResponse({'error': 'Неверный limit'}, status=400)
+    items, expires_at = moderation.claim(request.user, object_type, limit)
+    items = items.select_related(*MODERATION_RELATED[object_type])
+    return JsonResponse({
+        'expires_at': expires_at.isoformat(),
+        'items': [_moderation_item(object_type, obj) for obj in items],
+    })
+
+
+@require_POST
+@_staff_only
+def moderation_decide(request):
+    """Тело: {"decisions": [{"type": "photo", "id": 1, "action": "approve"}, ...]}"""
+    try:
+        payload = json.loads(request.body)
+        decisions = [
+            (str(entry['type']), int(entry['id']), str(entry['action']))
+            for entry in payload['decisions']
+        ]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'Неверный формат решений'}, status=400)
+    if len(decisions) > moderation.MAX_BATCH * len(moderation.MODELS):
+        return JsonResponse({'error': 'Слишком много решений за раз'}, status=400)
+    return JsonResponse({'results': moderation.decide(request.user, decisions)})
+
+
+@require_POST
+@_staff_only
+def moderation_release(request):
+    object_type = request.POST.get('type') or None
+    if object_type is not None and object_type not in moderation.MODELS:
+        return JsonResponse({'error': 'Неизвестный тип объекта'}, status=400)
+    return JsonResponse({'released': moderation.release(request.user, object_type)})
+
+
+def _api_user(request):
+    """Пользователь API: HTTP Basic для скриптов и станций загрузки или
+    сессия браузера. Для сессии CSRF проверяется как обычно, Basic от CSRF
+    не зависит: браузер не подставляет его в чужие запросы сам."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Basic '):
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode().partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+        return authenticate(request, username=username, password=password)
+    if not request.user.is_authenticated:
+        return None
+    if CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {}) is not None:
+        return None
+    return request.user
+
+
+@csrf_exempt
+@require_POST
+@rate_limit('upload')
+@ingest_slot
+def batch_upload(request):
+    """Загрузка пачки фото в одно событие: POST event=<id>, images=<файлы>.
+
+    Файлы проверяются и перекодируются параллельно, записи создаются одним
+    bulk_create; в ответе результат по каждому файлу в исходном порядке."""
+    user = _api_user(request)
+    if user is None:
+        return json_response({'error': 'Нужна авторизация'}, status=401)
+    event_id = request.POST.get('event', '')
+    event = EventAlbum.objects.filter(id=event_id, status='approved').first() if event_id.isdigit() else None
+    if event is None:
+        return json_response({'error': 'Событие не найдено'}, status=400)
+    images = request.FILES.getlist('images')
+    if not images:
+        return json_response({'error': 'Нет файлов в поле images'}, status=400)
+
+    status = 'approved' if permissions.is_moderator(user) else 'pending'
+    results = ingest.process_uploads(images)
+    photos = iter(ingest.create_photos(event, user, status, results))
+    if status == 'approved':
+        covers.schedule_event_refresh(event.id)
+
+    items = []
+    for result in results:
+        if result.ok:
+            items.append({'file': result.source_name, 'ok': True, 'id': next(photos).id})
+        else:
+            items.append({'file': result.source_name, 'ok': False, 'error': result.error})
+    created = sum(item['ok'] for item in items)
+    return json_response({
+        'event': event.id,
+        'status': status,
+        'created': created,
+        'failed': len(items) - created,
+        'results': items,
+    }, status=201 if created else 400)
@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 class MediaArchiveConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'media_archive'
\ No newline at end of file
+    name = 'media_archive'
+
+    def ready(self):
+        # Регистрирует проверки, обработчик connection_created для учёта
+        # SQL-запросов и сброс кэша пользователей при сохранении User
+        from . import auth, checks, metrics  # noqa: F401
@@ -0,0 +1,70 @@
+import functools
+import hashlib
+
+from django.contrib.staticfiles import finders
+
+# Сторонние CSS/JS/шрифты хранятся в static/media_archive/vendor и
+# коммитятся в репозиторий; страницы не ходят за ними на CDN. PhotoSwipe
+# кладёт туда команда fetch_vendor_assets из распакованного дистрибутива.
+# Каждый файл сверяется с SHA256: команда не запишет подменённый файл, а
+# проверка W002 сообщает о недостающих и изменённых файлах.
+
+VENDOR_DIR = 'media_archive/vendor'
+
+PHOTOSWIPE_VERSION = '4.1.3'
+PHOTOSWIPE_FILES = (
+    'photoswipe.min.css',
+    'photoswipe.min.js',
+    'photoswipe-ui-default.min.js',
+    'default-skin/default-skin.min.css',
+    'default-skin/default-skin.png',
+    'default-skin/default-skin.svg',
+    'default-skin/preloader.gif',
+)
+
+FONTS_CSS = f'{VENDOR_DIR}/roboto/roboto.css'
+FONTS_FILES = (
+    'roboto.css',
+    'roboto-400.woff2',
+    'roboto-500.woff2',
+    'roboto-700.woff2',
+    'LICENSE.txt',
+)
+
+# Путь внутри VENDOR_DIR -> SHA256 содержимого. Хэши PhotoSwipe вносятся
+# вместе с его файлами: fetch_vendor_assets --pin печатает строки сюда
+SHA256 = {
+    'roboto/roboto.css': '59e4c42ba3ce81d65355b0d2048951e0a4dded285ff3c8b393b470f1babd7509',
+    'roboto/roboto-400.woff2': '9182ca70f5ba61c71660281fb947bc4a1bb7c9ee34d351ff07de0ff5f3ad0411',
+    'roboto/roboto-500.woff2': '97d150e81e926e2d21dbe05bad6d613daecb3ff11171ee45bea9d54087a94840',
+    'roboto/roboto-700.woff2': '82ae44f04be7c731364995e6572ed2a40960fb205b090e39c934d7e5d1945b66',
+    'roboto/LICENSE.txt': 'c71d239df91726fc519c6eb72d318ec65820627232b2f796219e87dcf35d0ab4',
+}
+
+
+def photoswipe_names():
+    return [f'photoswipe/{name}' for name in PHOTOSWIPE_FILES]
+
+
+def fonts_names():
+    return [f'roboto/{name}' for name in FONTS_FILES]
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def verified(name):
+    """Файл VENDOR_DIR/name найден и совпадает с закреплённым хэшем."""
+    path = finders.find(f'{VENDOR_DIR}/{name}')
+    if not path or name not in SHA256:
+        return False
+    with open(path, 'rb') as source:
+        return sha256(source.read()) == SHA256[name]
+
+
+@functools.cache
+def vendored():
+    """Локальный PhotoSwipe на месте и не подменён."""
+    return all(verified(name) for name in photoswipe_names())
+
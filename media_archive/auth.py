@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Аутентификация без лишних запросов на каждой странице.
+#
+# Сессии лежат в кэше с записью в базу (cached_db), сообщения - в
+# подписанной cookie, поэтому анонимный просмотр не создаёт и не читает
+# строк django_session. Пользователя по id из сессии бэкенд берёт из кэша;
+# любое сохранение User (смена пароля, last_login при входе, is_active)
+# сбрасывает запись. С LocMemCache сброс виден только своему процессу:
+# заблокированный или сменивший пароль пользователь остаётся входящим в
+# остальных процессах, пока не истечёт запись. Поэтому с кэшем процесса
+# срок не больше ARCHIVE_AUTH_LOCAL_CACHE_SECONDS, а полный
+# ARCHIVE_AUTH_USER_CACHE_SECONDS - только с общим кэшем (Redis, Memcached,
+# DatabaseCache).
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def user_cache_seconds():
+    timeout = getattr(settings, 'ARCHIVE_AUTH_USER_CACHE_SECONDS', 300)
+    if isinstance(caches['default'], LocMemCache):
+        return min(timeout, getattr(settings, 'ARCHIVE_AUTH_LOCAL_CACHE_SECONDS', 5))
+    return timeout
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        timeout = user_cache_seconds()
+        if not timeout:
+            return super().get_user(user_id)
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, timeout)
+        return user if self.user_can_authenticate(user) else None
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _forget_user(sender, instance, **kwargs):
+    cache.delete(_user_key(instance.pk))
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """pbkdf2_sha256 с числом итераций из ARCHIVE_PASSWORD_ITERATIONS.
+
+    Старые хэши продолжают проверяться (число итераций записано в самом
+    хэше) и пересчитываются при следующем входе пользователя."""
+
+    @property
+    def iterations(self):
+        return getattr(
+            settings, 'ARCHIVE_PASSWORD_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations
+        )
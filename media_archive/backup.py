@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+
+from .storage import SHARDED_NAME_RE
+
+# Формат резервной копии:
+#   <dest>/objects/ab/<sha256>          - содержимое файлов, каждое один раз
+#   <dest>/snapshots/<время>/db.sqlite3 - копия базы на момент снимка
+#   <dest>/snapshots/<время>/manifest.json - путь -> [sha256, размер, mtime_ns]
+# Следующий снимок сверяет файлы с манифестом предыдущего по размеру и mtime
+# и читает только изменившиеся; объекты, которые уже есть в хранилище,
+# не копируются. Поэтому ночной снимок большого архива переносит только
+# новые фотографии.
+
+MANIFEST = 'manifest.json'
+DATABASE_FILE = 'db.sqlite3'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def media_roots():
+    """Каталоги, которые попадают в снимок: {метка: путь}."""
+    roots = {'media': str(settings.MEDIA_ROOT)}
+    originals = getattr(settings, 'ARCHIVE_ORIGINALS_ROOT', None)
+    if originals:
+        roots['originals'] = str(originals)
+    return roots
+
+
+def sqlite_path():
+    database = settings.DATABASES['default']
+    if database['ENGINE'] != 'django.db.backends.sqlite3':
+        return None
+    return str(database['NAME'])
+
+
+def object_path(dest, digest):
+    return os.path.join(dest, 'objects', digest[:2], digest)
+
+
+def snapshots_dir(dest):
+    return os.path.join(dest, 'snapshots')
+
+
+def list_snapshots(dest):
+    directory = snapshots_dir(dest)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, name, MANIFEST))
+    )
+
+
+def read_manifest(snapshot):
+    with open(os.path.join(snapshot, MANIFEST), encoding='utf-8') as source:
+        return json.load(source)
+
+
+def write_manifest(snapshot, manifest):
+    path = os.path.join(snapshot, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as output:
+        json.dump(manifest, output, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def known_hash(name):
+    """Фото в раскладке по хэшу уже носят sha256 в имени."""
+    if SHARDED_NAME_RE.search(name):
+        return os.path.splitext(os.path.basename(name))[0]
+    return None
+
+
+def walk(root):
+    """(относительное имя, stat) всех файлов под root."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.relpath(entry.path, root).replace(os.sep, '/'), entry.stat()
+
+
+def store_object(dest, path, digest):
+    """Кладёт файл в хранилище объектов. Возвращает True, если скопировал."""
+    target = object_path(dest, digest)
+    if os.path.exists(target):
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Запись во временный файл и переименование: оборванное копирование
+    # не оставит в хранилище объект с чужим содержимым
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as output, open(path, 'rb') as source:
+            shutil.copyfileobj(source, output, HASH_CHUNK_SIZE)
+        os.replace(temporary, target)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return True
+
+
+def backup_database(target):
+    """Согласованная копия SQLite через online backup API: сайт продолжает
+    писать в базу, а копия соответствует одному моменту времени."""
+    source = sqlite3.connect(sqlite_path())
+    try:
+        destination = sqlite3.connect(target)
+        try:
+            source.backup(destination, pages=1024)
+        finally:
+            destination.close()
+    finally:
+        source.close()
+
+
+def check_database(path):
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return connection.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        connection.close()
@@ -0,0 +1,47 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Tags, Warning, register
+
+from . import assets
+
+
+@register(Tags.files)
+def check_media_folders(app_configs, **kwargs):
+    """Создаёт папки для медиа-файлов при runserver, migrate и check.
+
+    Раньше это делалось при импорте settings.py - то есть в каждом
+    процессе, включая воркеры и короткие management-команды.
+    """
+    errors = []
+    for folder in (settings.MEDIA_ROOT, os.path.join(settings.MEDIA_ROOT, 'photos')):
+        try:
+            os.makedirs(folder, exist_ok=True)
+        except OSError as exc:
+            errors.append(Warning(
+                f'Не удалось создать папку {folder}: {exc}',
+                hint='Проверьте MEDIA_ROOT и права на запись.',
+                id='media_archive.W001',
+            ))
+    return errors
+
+
+@register(Tags.staticfiles)
+def check_vendor_assets(app_configs, **kwargs):
+    """Файлы в static/media_archive/vendor совпадают с assets.SHA256."""
+    errors = []
+    for name in assets.fonts_names() + assets.photoswipe_names():
+        if assets.verified(name):
+            continue
+        if finders.find(f'{assets.VENDOR_DIR}/{name}'):
+            problem = 'не совпадает с закреплённым SHA256'
+        else:
+            problem = 'не найден, галерея без него не откроется'
+        errors.append(Warning(
+            f'{assets.VENDOR_DIR}/{name} {problem}',
+            hint='Положите файлы командой fetch_vendor_assets и проверьте: '
+                 'python manage.py fetch_vendor_assets --check',
+            id='media_archive.W002',
+        ))
+    return errors
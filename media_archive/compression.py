@@ -0,0 +1,155 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.cache import has_vary_header, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # без brotli ответы сжимаются только gzip
+    brotli = None
+
+# Сжатие ответов с выбором br/gzip по Accept-Encoding. Сжатые тела
+# запоминаются по хэшу исходного: одинаковые ответы (кэшированные страницы,
+# JSON поиска и API) сжимаются один раз, а не на каждый запрос.
+#
+# Личные ответы - с Vary: Cookie или новой cookie CSRF - содержат секреты
+# (токен CSRF в формах) и у каждого запроса свои. Они сжимаются только
+# gzip со случайным заполнением против BREACH, без brotli, и не кладутся
+# в кэш: повторно такое тело всё равно не встретится.
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|xhtml\+xml|manifest\+json|ld\+json)|image/svg\+xml)'
+)
+MIN_COMPRESS_SIZE = 512
+BROTLI_QUALITY = 5
+_accept_re = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def _accepted_encodings(header):
+    accepted = {}
+    for part in header.split(','):
+        match = _accept_re.fullmatch(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    return accepted
+
+
+def choose_encoding(header, allow_brotli=True):
+    accepted = _accepted_encodings(header or '')
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and (brotli is None or not allow_brotli):
+            continue
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+class CompressedBodyCache:
+    """LRU сжатых тел, ограниченный суммарным размером."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def body_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompressedBodyCache(
+                getattr(settings, 'ARCHIVE_COMPRESSION_CACHE_BYTES', 16 * 1024 * 1024)
+            )
+        return _cache
+
+
+def is_personal(response):
+    return has_vary_header(response, 'Cookie') or settings.CSRF_COOKIE_NAME in response.cookies
+
+
+def compress(body, encoding, cached=True):
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    cache = body_cache()
+    compressed = cache.get(key) if cached else None
+    if compressed is None:
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            # Случайная длина имени файла в заголовке gzip - защита от BREACH,
+            # как в django.middleware.gzip
+            compressed = compress_string(body, max_random_bytes=100)
+        if cached:
+            cache.put(key, compressed)
+    return compressed
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Замена GZipMiddleware с brotli и кэшем сжатых тел.
+
+    Не трогает потоковые ответы (медиа и статика отдаются отдельно,
+    у статики есть заранее сжатые копии), маленькие ответы, уже сжатые
+    и несжимаемые типы (изображения, шрифты woff2 и т.п.)."""
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not COMPRESSIBLE_TYPES.match(content_type):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < MIN_COMPRESS_SIZE:
+            return response
+        personal = is_personal(response)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), allow_brotli=not personal)
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding, cached=not personal)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        if response.has_header('ETag'):
+            # Тело другое, поэтому сильный ETag становится слабым
+            response.headers['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        return response
@@ -0,0 +1,152 @@
+import logging
+
+from django.db.models import F
+
+from . import tasks, timeline
+from .imaging import COVER_SIZE, make_thumbnail
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo
+
+logger = logging.getLogger(__name__)
+
+# Обложки хранятся прямо в строке альбома (cover_photo + cover_thumbnail),
+# поэтому страницы со списками карточек не делают ни одного лишнего запроса.
+# Пересчёт идёт снизу вверх: событие -> класс -> учебный год. Верхние уровни
+# проверяются всегда, потому что ручная обложка года или класса могла
+# указывать на фото, которое только что отклонили или удалили; если обложка
+# не изменилась, проверка стоит пару лёгких запросов без работы с файлами.
+
+
+def _auto_cover_id(album):
+    if isinstance(album, EventAlbum):
+        candidates = Photo.objects.filter(
+            event_album_id=album.pk, status='approved'
+        ).order_by('taken_at', 'id').values_list('id', flat=True)
+    elif isinstance(album, SchoolClass):
+        candidates = EventAlbum.objects.filter(
+            school_class_id=album.pk, status='approved', cover_photo__isnull=False
+        ).order_by('created_at', 'id').values_list('cover_photo_id', flat=True)
+    else:
+        candidates = SchoolClass.objects.filter(
+            year_album_id=album.pk, status='approved', cover_photo__isnull=False
+        ).order_by('created_at', 'id').values_list('cover_photo_id', flat=True)
+    return candidates.first()
+
+
+def _manual_cover_is_valid(album):
+    photos = Photo.objects.filter(id=album.cover_photo_id, status='approved')
+    if isinstance(album, EventAlbum):
+        photos = photos.filter(event_album_id=album.pk)
+    elif isinstance(album, SchoolClass):
+        photos = photos.filter(
+            event_album__school_class_id=album.pk,
+            event_album__status='approved',
+        )
+    else:
+        photos = photos.filter(
+            event_album__school_class__year_album_id=album.pk,
+            event_album__school_class__status='approved',
+            event_album__status='approved',
+        )
+    return photos.exists()
+
+
+def _render_cover(album, photo_id):
+    photo = Photo.objects.only('image').get(pk=photo_id)
+    thumbnail = make_thumbnail(photo.image, COVER_SIZE)
+    name = f'{album._meta.model_name}_{album.pk}_{photo_id}.jpg'
+    field = album._meta.get_field('cover_thumbnail')
+    return field.storage.save(field.generate_filename(album, name), thumbnail)
+
+
+def refresh_cover(model, album_id):
+    """Пересчитывает обложку альбома. Возвращает True, если она изменилась."""
+    album = model.objects.filter(pk=album_id).only(
+        'cover_photo', 'cover_thumbnail', 'cover_is_manual'
+    ).first()
+    if album is None:
+        return False
+
+    is_manual = album.cover_is_manual and album.cover_photo_id is not None
+    if is_manual and _manual_cover_is_valid(album):
+        cover_id = album.cover_photo_id
+    else:
+        is_manual = False
+        cover_id = _auto_cover_id(album)
+
+    if cover_id == album.cover_photo_id and bool(album.cover_thumbnail) == (cover_id is not None):
+        if is_manual != album.cover_is_manual:
+            model.objects.filter(pk=album_id).update(cover_is_manual=is_manual)
+        return False
+
+    thumbnail_name = ''
+    if cover_id is not None:
+        try:
+            thumbnail_name = _render_cover(album, cover_id)
+        except (Photo.DoesNotExist, OSError, ValueError):
+            logger.exception('Не удалось построить обложку для %s #%s', model.__name__, album_id)
+
+    old_thumbnail = album.cover_thumbnail.name
+    model.objects.filter(pk=album_id).update(
+        cover_photo_id=cover_id,
+        cover_thumbnail=thumbnail_name,
+        cover_is_manual=is_manual,
+        cache_version=F('cache_version') + 1,
+    )
+    if old_thumbnail and old_thumbnail != thumbnail_name:
+        album.cover_thumbnail.storage.delete(old_thumbnail)
+    if model is EventAlbum:
+        # Лента показывает обложки событий
+        timeline.touch_objects('event', [album_id])
+    return True
+
+
+def refresh_year_cover(year_id):
+    refresh_cover(YearAlbum, year_id)
+
+
+def refresh_class_cover(class_id):
+    refresh_cover(SchoolClass, class_id)
+    year_id = SchoolClass.objects.filter(pk=class_id).values_list('year_album_id', flat=True).first()
+    if year_id is not None:
+        refresh_year_cover(year_id)
+
+
+def refresh_event_cover(event_id):
+    refresh_cover(EventAlbum, event_id)
+    class_id = EventAlbum.objects.filter(pk=event_id).values_list('school_class_id', flat=True).first()
+    if class_id is not None:
+        refresh_class_cover(class_id)
+
+
+def schedule_event_refresh(event_id):
+    tasks.enqueue(refresh_event_cover, event_id)
+
+
+def schedule_class_refresh(class_id):
+    tasks.enqueue(refresh_class_cover, class_id)
+
+
+def schedule_year_refresh(year_id):
+    tasks.enqueue(refresh_year_cover, year_id)
+
+
+def schedule_refresh(album):
+    if isinstance(album, EventAlbum):
+        schedule_event_refresh(album.pk)
+    elif isinstance(album, SchoolClass):
+        schedule_class_refresh(album.pk)
+    else:
+        schedule_year_refresh(album.pk)
+
+
+def set_manual_cover(album, photo):
+    """Закрепляет фото как обложку альбома; миниатюра строится в фоне."""
+    model = type(album)
+    old_thumbnail = album.cover_thumbnail.name
+    model.objects.filter(pk=album.pk).update(
+        cover_photo_id=photo.pk, cover_thumbnail='', cover_is_manual=True,
+        cache_version=F('cache_version') + 1,
+    )
+    if old_thumbnail:
+        album.cover_thumbnail.storage.delete(old_thumbnail)
+    schedule_refresh(album)
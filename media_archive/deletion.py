@@ -0,0 +1,210 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+
+from . import covers, stats, tasks, timeline
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo, bump_cache_version
+
+logger = logging.getLogger(__name__)
+
+# Удаление альбомов в два шага. Сначала альбом и всё вложенное получают
+# статус 'deleted' - это пара UPDATE, и со страниц альбом исчезает сразу.
+# Затем фоновая задача удаляет фотографии пачками по id одним
+# DELETE ... WHERE id IN (...) без каскадного сборщика Django, который
+# загружает в память каждую строку, и параллельно удаляет файлы.
+# Если процесс упал посреди удаления, sweep_orphans доделает его.
+#
+# Файлы фото общие для одинаковых загрузок, поэтому проверка ссылок и
+# удаление файла идут под file_lock() в одной транзакции. Загрузка берёт ту
+# же блокировку перед созданием записей и дописывает файл, если его успели
+# удалить: иначе загрузка между проверкой и удалением оставила бы запись
+# без файла.
+
+ALBUM_MODELS = (EventAlbum, SchoolClass, YearAlbum)
+ALBUM_TYPES = {EventAlbum: 'event', SchoolClass: 'class', YearAlbum: 'year'}
+
+_purge_lock = threading.Lock()
+
+# Ключ pg_advisory_xact_lock для file_lock()
+FILES_LOCK_KEY = 0x6d617266
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def soft_delete(album):
+    """Прячет альбом вместе с вложенными и ставит в очередь их удаление."""
+    with transaction.atomic():
+        timeline.touch_objects(ALBUM_TYPES[type(album)], [album.pk])
+        if isinstance(album, YearAlbum):
+            SchoolClass.objects.filter(year_album=album).update(status='deleted')
+            EventAlbum.objects.filter(school_class__year_album=album).update(status='deleted')
+        elif isinstance(album, SchoolClass):
+            EventAlbum.objects.filter(school_class=album).update(status='deleted')
+        type(album).objects.filter(pk=album.pk).update(
+            status='deleted', claimed_by=None, claim_expires_at=None
+        )
+        tasks.enqueue(purge_deleted)
+        # Фото удалённого альбома уходят из итогов статистики пересчётом
+        stats.schedule_recompute()
+
+
+def _raw_delete(model, ids):
+    table = connection.ops.quote_name(model._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+
+
+def _detach_covers(photo_ids):
+    """Снимает удаляемые фото с обложек и пересчитывает уцелевшие альбомы."""
+    for model in ALBUM_MODELS:
+        albums = model.objects.filter(cover_photo_id__in=photo_ids)
+        live_ids = list(albums.exclude(status='deleted').values_list('id', flat=True))
+        albums.update(cover_photo=None, cover_is_manual=False)
+        for album_id in live_ids:
+            covers.schedule_refresh(model(pk=album_id))
+
+
+def file_lock():
+    """Блокировка до конца текущей транзакции, общая для удаления файлов
+    фото и загрузок, которые переиспользуют файл с тем же содержимым."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [FILES_LOCK_KEY])
+        elif connection.vendor == 'sqlite':
+            # У SQLite одна блокировка записи на базу; пустой UPDATE берёт её
+            table = connection.ops.quote_name(Photo._meta.db_table)
+            cursor.execute(f'UPDATE {table} SET id = id WHERE 0')
+
+
+def originals_storage():
+    root = _setting('ARCHIVE_ORIGINALS_ROOT', None)
+    return FileSystemStorage(location=root) if root else None
+
+
+def delete_file(storage, name):
+    try:
+        storage.delete(name)
+    except OSError:
+        logger.exception('Не удалось удалить файл %s', name)
+
+
+def photo_files(rows):
+    """Файлы удалённых фото: [(storage, name), ...] по строкам
+    (image, thumbnail, original_name). Изображения и оригиналы хранятся
+    по хэшу содержимого и общие для одинаковых загрузок, поэтому файл
+    удаляется, только если на него больше никто не ссылается."""
+    images, thumbnails, originals = (
+        {name for name in names if name} for names in zip(*rows)
+    ) if rows else (set(), set(), set())
+    # Миниатюра может совпадать с самим изображением (seed_archive)
+    thumbnails -= images
+    images -= set(Photo.objects.filter(image__in=images).values_list('image', flat=True))
+    files = [(Photo._meta.get_field('image').storage, name) for name in images]
+    thumbnail_storage = Photo._meta.get_field('thumbnail').storage
+    files.extend((thumbnail_storage, name) for name in thumbnails)
+    storage = originals_storage()
+    if originals and storage is not None:
+        originals -= set(
+            Photo.objects.filter(original_name__in=originals).values_list('original_name', flat=True)
+        )
+        files.extend((storage, name) for name in originals)
+    return files
+
+
+def delete_files(files):
+    if not files:
+        return
+    workers = _setting('ARCHIVE_DELETE_FILE_WORKERS', 8)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='archive-delete') as pool:
+        for storage, name in files:
+            pool.submit(delete_file, storage, name)
+
+
+def schedule_photo_files_removal(rows):
+    """Удаляет файлы уже удалённых фото в фоне после коммита."""
+    if rows:
+        tasks.enqueue(remove_photo_files, tuple(rows))
+
+
+def remove_photo_files(rows):
+    with transaction.atomic():
+        file_lock()
+        delete_files(photo_files(rows))
+
+
+def delete_unreferenced(files):
+    """Удаляет файлы [(storage, name), ...], на которые под file_lock()
+    по-прежнему не ссылается ни одно фото."""
+    chunk_size = _setting('ARCHIVE_DELETE_CHUNK_SIZE', 500)
+    for start in range(0, len(files), chunk_size):
+        chunk = files[start:start + chunk_size]
+        names = {name for _, name in chunk}
+        with transaction.atomic():
+            file_lock()
+            referenced = set(Photo.objects.filter(image__in=names).values_list('image', flat=True))
+            referenced.update(
+                Photo.objects.filter(original_name__in=names).values_list('original_name', flat=True)
+            )
+            delete_files([(storage, name) for storage, name in chunk if name not in referenced])
+
+
+def purge_deleted():
+    """Удаляет всё со статусом 'deleted': фото пачками, затем сами альбомы.
+
+    Возвращает число удалённых фотографий."""
+    with _purge_lock:
+        return _purge_deleted()
+
+
+def _purge_deleted():
+    chunk_size = _setting('ARCHIVE_DELETE_CHUNK_SIZE', 500)
+    deleted = 0
+    last_id = 0
+    while True:
+        rows = list(
+            Photo.objects.filter(event_album__status='deleted', id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'image', 'thumbnail', 'original_name')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        ids = [row[0] for row in rows]
+        with transaction.atomic():
+            file_lock()
+            _detach_covers(ids)
+            _raw_delete(Photo, ids)
+            # Файлы удаляются до коммита, пока ни одна загрузка не может
+            # сослаться на них между проверкой и удалением
+            delete_files(photo_files([row[1:] for row in rows]))
+        deleted += len(ids)
+
+    # Карточки родителей показывают число вложенных альбомов
+    parents = {
+        YearAlbum: set(SchoolClass.objects.filter(status='deleted').values_list('year_album_id', flat=True)),
+        SchoolClass: set(EventAlbum.objects.filter(status='deleted').values_list('school_class_id', flat=True)),
+    }
+    # Альбомов немного, и фото в них уже нет, поэтому обычный delete()
+    # здесь дешёвый; он же подберёт то, что успели создать после пометки
+    thumbnails = []
+    for model in ALBUM_MODELS:
+        albums = model.objects.filter(status='deleted')
+        storage = model._meta.get_field('cover_thumbnail').storage
+        thumbnails.extend(
+            (storage, name) for name in albums.values_list('cover_thumbnail', flat=True) if name
+        )
+        albums.delete()
+    for model, ids in parents.items():
+        for pk in ids:
+            bump_cache_version(model, pk)
+    delete_files(thumbnails)
+    if deleted:
+        logger.info('Удалено фотографий: %s', deleted)
+    return deleted
@@ -1,6 +1,7 @@
 from django import forms
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from .models import YearAlbum, SchoolClass, EventAlbum, Photo
+from .imaging import configure_pillow
 import re
 
 class YearAlbumForm(forms.ModelForm):
@@ -156,6 +157,8 @@ class MultipleImageField(forms.ImageField):
         super().__init__(*args, **kwargs)
 
     def clean(self, data, initial=None):
+        # Лимит пикселей должен действовать уже при проверке формы
+        configure_pillow()
         single_file_clean = super().clean
         if isinstance(data, (list, tuple)):
             result = [single_file_clean(d, initial) for d in data]
@@ -0,0 +1,128 @@
+import functools
+from datetime import datetime
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+# Pillow импортируется внутри функций: модуль подтягивают views и
+# фоновые задачи, а сам Pillow нужен только при работе с изображениями
+
+COVER_SIZE = (480, 320)
+THUMBNAIL_SIZE = (480, 480)
+THUMBNAIL_QUALITY = 82
+
+# Ориентации 5-8 означают поворот на 90/270 градусов: ширина и высота
+# на экране меняются местами
+_ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+@functools.cache
+def configure_pillow():
+    """Импортирует Pillow и один раз выставляет лимит пикселей."""
+    from PIL import Image
+
+    # Pillow сам отказывается декодировать изображения больше 2 * MAX_IMAGE_PIXELS;
+    # выставляем порог по нашему лимиту, чтобы бомбы отсекались до декодирования
+    Image.MAX_IMAGE_PIXELS = getattr(settings, 'ARCHIVE_MAX_IMAGE_PIXELS', 80_000_000)
+    return Image
+
+
+def _clean_text(value, max_length=64):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'ignore')
+    return str(value or '').replace('\x00', '').strip()[:max_length]
+
+
+def _parse_exif_datetime(value, offset=None):
+    value = _clean_text(value)
+    try:
+        parsed = datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+    offset = _clean_text(offset)
+    if offset:
+        try:
+            return datetime.strptime(f'{value}{offset}', '%Y:%m:%d %H:%M:%S%z')
+        except ValueError:
+            pass
+    # Камеры обычно пишут местное время без зоны - считаем его временем школы
+    return timezone.make_aware(parsed)
+
+
+def empty_metadata(size):
+    return {
+        'taken_at': None,
+        'orientation': 1,
+        'camera_make': '',
+        'camera_model': '',
+        'width': size[0],
+        'height': size[1],
+    }
+
+
+def read_metadata(source):
+    """Извлекает из файла время съёмки, ориентацию, камеру и размеры.
+
+    Координаты GPS намеренно не читаются и нигде не сохраняются.
+    """
+    from PIL import ExifTags
+
+    Image = configure_pillow()
+    position = source.tell() if hasattr(source, 'tell') else None
+    try:
+        with Image.open(source) as image:
+            exif = image.getexif()
+            width, height = image.size
+    finally:
+        if position is not None:
+            source.seek(position)
+
+    exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+    orientation = exif.get(ExifTags.Base.Orientation, 1)
+    if orientation not in range(1, 9):
+        orientation = 1
+    if orientation in _ROTATED_ORIENTATIONS:
+        width, height = height, width
+
+    taken_at = _parse_exif_datetime(
+        exif_ifd.get(ExifTags.Base.DateTimeOriginal),
+        exif_ifd.get(ExifTags.Base.OffsetTimeOriginal),
+    ) or _parse_exif_datetime(exif.get(ExifTags.Base.DateTime))
+
+    return {
+        'taken_at': taken_at,
+        'orientation': orientation,
+        'camera_make': _clean_text(exif.get(ExifTags.Base.Make)),
+        'camera_model': _clean_text(exif.get(ExifTags.Base.Model)),
+        'width': width,
+        'height': height,
+    }
+
+
+def make_thumbnail(source, size, quality=THUMBNAIL_QUALITY, crop=True):
+    """Возвращает JPEG-миниатюру изображения.
+
+    Ориентация из EXIF применяется здесь, поэтому миниатюры всегда
+    повёрнуты правильно. При crop=True изображение обрезается точно до size,
+    иначе вписывается в него с сохранением пропорций.
+    """
+    from PIL import ImageOps
+
+    Image = configure_pillow()
+    source.open('rb')
+    try:
+        with Image.open(source) as image:
+            image.draft('RGB', (size[0] * 2, size[1] * 2))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            if crop:
+                thumbnail = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+            else:
+                image.thumbnail(size, Image.Resampling.LANCZOS)
+                thumbnail = image
+    finally:
+        source.close()
+    buffer = BytesIO()
+    thumbnail.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
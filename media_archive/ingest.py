@@ -0,0 +1,254 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from . import activity, deletion, imaging, renditions, stats, timeline
+from .models import EventAlbum, Photo, bump_cache_version
+
+# Все загрузки проходят через этот модуль: проверка лимитов, удаление
+# метаданных (EXIF с GPS, XMP, комментарии) и перекодирование в JPEG/WebP
+# с ограниченным качеством. Оригинал при желании откладывается в холодное
+# хранилище ARCHIVE_ORIGINALS_ROOT.
+
+ALLOWED_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF', 'BMP', 'TIFF'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def max_upload_bytes():
+    return _setting('ARCHIVE_MAX_UPLOAD_BYTES', 50 * 1024 * 1024)
+
+
+def max_image_pixels():
+    return _setting('ARCHIVE_MAX_IMAGE_PIXELS', 80_000_000)
+
+
+@dataclass
+class IngestResult:
+    source_name: str
+    content: ContentFile = None
+    metadata: dict = None
+    file_size: int = 0
+    original_name: str = ''
+    error: str = ''
+
+    @property
+    def ok(self):
+        return not self.error
+
+
+def _read_limited(uploaded):
+    limit = max_upload_bytes()
+    if uploaded.size is not None and uploaded.size > limit:
+        raise ValidationError(f'Файл больше {limit // (1024 * 1024)} МБ')
+    uploaded.seek(0)
+    data = uploaded.read(limit + 1)
+    if len(data) > limit:
+        raise ValidationError(f'Файл больше {limit // (1024 * 1024)} МБ')
+    return data
+
+
+def _open_checked(data):
+    Image = imaging.configure_pillow()
+    try:
+        image = Image.open(BytesIO(data))
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError('Изображение слишком большое')
+    except (OSError, ValueError, SyntaxError):
+        raise ValidationError('Файл не является изображением')
+    if image.format not in ALLOWED_FORMATS:
+        image.close()
+        raise ValidationError('Неподдерживаемый формат изображения')
+    # Размеры читаются из заголовка, пиксели ещё не декодированы
+    width, height = image.size
+    if width * height > max_image_pixels():
+        image.close()
+        raise ValidationError(f'Изображение больше {max_image_pixels() // 1_000_000} мегапикселей')
+    return image
+
+
+def _flatten(image, output_format):
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        if output_format == 'WEBP':
+            return image
+        Image = imaging.configure_pillow()
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, output_format, icc_profile):
+    max_bytes = _setting('ARCHIVE_MAX_STORED_BYTES', 4 * 1024 * 1024)
+    quality = _setting('ARCHIVE_INGEST_QUALITY', 88)
+    min_quality = _setting('ARCHIVE_INGEST_MIN_QUALITY', 70)
+    # Pillow дописывает в файл comment, exif и xmp из image.info исходника
+    image.info = {}
+    while True:
+        buffer = BytesIO()
+        options = {'quality': quality}
+        if icc_profile:
+            # Цветовой профиль не содержит личных данных и нужен для цветов
+            options['icc_profile'] = icc_profile
+        if output_format == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options.update(method=4)
+        image.save(buffer, format=output_format, **options)
+        if buffer.tell() <= max_bytes or quality <= min_quality:
+            break
+        quality = max(min_quality, quality - 6)
+    if buffer.tell() > max_bytes:
+        # Даже минимальное качество не помещается в лимит - уменьшаем картинку
+        Image = imaging.configure_pillow()
+        image = image.resize(
+            (max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)),
+            Image.Resampling.LANCZOS,
+        )
+        return _encode(image, output_format, icc_profile)
+    return buffer.getvalue(), image.size
+
+
+def _store_original(data, extension):
+    root = _setting('ARCHIVE_ORIGINALS_ROOT', None)
+    if not root:
+        return ''
+    digest = hashlib.sha256(data).hexdigest()
+    name = f'{digest[:2]}/{digest}{extension}'
+    storage = FileSystemStorage(location=root)
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))
+    return name
+
+
+def process_upload(uploaded):
+    """Проверяет и перекодирует один загруженный файл."""
+    from PIL import ImageOps
+
+    Image = imaging.configure_pillow()
+    source_name = os.path.basename(uploaded.name or 'photo')
+    result = IngestResult(source_name=source_name)
+    try:
+        data = _read_limited(uploaded)
+        image = _open_checked(data)
+        with image:
+            try:
+                metadata = imaging.read_metadata(BytesIO(data))
+            except (OSError, ValueError, SyntaxError):
+                # Повреждённый EXIF не должен мешать загрузке самого фото
+                metadata = imaging.empty_metadata(image.size)
+            output_format = _setting('ARCHIVE_INGEST_FORMAT', 'JPEG').upper()
+            max_side = _setting('ARCHIVE_MAX_STORED_SIDE', 3840)
+            icc_profile = image.info.get('icc_profile')
+            # Для JPEG draft() декодирует сразу в уменьшенном масштабе
+            image.draft('RGB', (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image = _flatten(image, output_format)
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            encoded, (width, height) = _encode(image, output_format, icc_profile)
+    except ValidationError as exc:
+        result.error = exc.messages[0]
+        return result
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        result.error = 'Не удалось обработать изображение'
+        return result
+
+    extension = '.webp' if output_format == 'WEBP' else '.jpg'
+    stem = os.path.splitext(source_name)[0] or 'photo'
+    metadata.update(width=width, height=height)
+    result.content = ContentFile(encoded, name=f'{stem}{extension}')
+    result.metadata = metadata
+    result.file_size = len(encoded)
+    result.original_name = _store_original(data, os.path.splitext(source_name)[1].lower())
+    return result
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_setting('ARCHIVE_INGEST_WORKERS', 4),
+                thread_name_prefix='archive-ingest',
+            )
+        return _executor
+
+
+def process_uploads(files):
+    """Обрабатывает файлы параллельно, сохраняя исходный порядок.
+
+    Pillow отпускает GIL на время декодирования и кодирования, поэтому
+    пула потоков достаточно и файлы не нужно копировать в другие процессы.
+    """
+    files = list(files)
+    if len(files) <= 1:
+        return [process_upload(f) for f in files]
+    return list(_get_executor().map(process_upload, files))
+
+
+def _store_image(result):
+    field = Photo._meta.get_field('image')
+    return field.storage.save(field.generate_filename(None, result.content.name), result.content)
+
+
+def _restore_missing(photos, results):
+    """Под deletion.file_lock(): файл, который save() переиспользовал,
+    могли удалить вместе с последним ссылавшимся на него фото. Изображение
+    пишется заново; оригинала в памяти уже нет, и фото остаётся без него."""
+    image_storage = Photo._meta.get_field('image').storage
+    originals = deletion.originals_storage()
+    for photo, result in zip(photos, results):
+        if not image_storage.exists(photo.image.name):
+            photo.image = _store_image(result)
+        if photo.original_name and (originals is None or not originals.exists(photo.original_name)):
+            photo.original_name = ''
+
+
+def create_photos(event_album, user, status, results):
+    """Сохраняет удачно обработанные загрузки: файлы пишутся параллельно,
+    записи создаются одним bulk_create в одной транзакции.
+
+    Возвращает созданные фото в порядке удачных результатов."""
+    results = [result for result in results if result.ok]
+    if not results:
+        return []
+    if len(results) == 1:
+        names = [_store_image(results[0])]
+    else:
+        names = list(_get_executor().map(_store_image, results))
+    photos = []
+    for result, name in zip(results, names):
+        photo = Photo(
+            event_album=event_album,
+            image=name,
+            uploaded_by=user,
+            status=status,
+            file_size=result.file_size,
+            original_name=result.original_name,
+        )
+        photo.apply_metadata(result.metadata)
+        photos.append(photo)
+    with transaction.atomic():
+        deletion.file_lock()
+        _restore_missing(photos, results)
+        Photo.objects.bulk_create(photos)
+        bump_cache_version(EventAlbum, event_album.id)
+        renditions.schedule_thumbnails([photo.id for photo in photos])
+        activity.record(user, 'upload', 'photo', [photo.id for photo in photos])
+        stats.photos_uploaded([photo.id for photo in photos])
+        timeline.touch([photo.taken_at for photo in photos if photo.status == 'approved'])
+    return photos
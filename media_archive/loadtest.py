@@ -0,0 +1,200 @@
+import asyncio
+import io
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Генератор нагрузки по замкнутой модели: N клиентов, каждый отправляет
+# следующий запрос сразу после ответа на предыдущий. Запросы можно
+# отправлять в WSGI- и ASGI-приложение прямо в процессе (без сети, чтобы
+# сравнивать именно обработчики) или по HTTP в настоящий сервер.
+
+LOCAL_HOST = 'localhost'
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(label, latencies, statuses, errors, elapsed, response_bytes=0):
+    ordered = sorted(latencies)
+    completed = len(ordered)
+    return {
+        'label': label,
+        'requests': completed + errors,
+        'errors': errors,
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(completed / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(ordered, 50) * 1000, 2),
+            'p90': round(percentile(ordered, 90) * 1000, 2),
+            'p99': round(percentile(ordered, 99) * 1000, 2),
+            'max': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        },
+        'avg_response_bytes': round(response_bytes / completed) if completed else 0,
+    }
+
+
+async def run_load(label, send_one, requests, concurrency):
+    """Выполняет requests запросов силами concurrency одновременных клиентов."""
+    latencies = []
+    statuses = Counter()
+    errors = 0
+    response_bytes = 0
+    remaining = requests
+
+    async def client():
+        nonlocal remaining, errors, response_bytes
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                status, size = await send_one()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+            response_bytes += size
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(label, latencies, statuses, errors, elapsed, response_bytes)
+
+
+def _split_target(target):
+    parts = urlsplit(target)
+    return parts.path or '/', parts.query
+
+
+def asgi_sender(app, target, headers=()):
+    path, query = _split_target(target)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', LOCAL_HOST.encode())] + [
+            (name.lower().encode(), value.encode()) for name, value in headers
+        ],
+        'client': ('127.0.0.1', 50000),
+        'server': (LOCAL_HOST, 80),
+    }
+
+    async def send_one():
+        finished = asyncio.Event()
+        request_sent = False
+        status = None
+        size = 0
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+                if not message.get('more_body'):
+                    finished.set()
+
+        await app(dict(scope), receive, send)
+        return status, size
+
+    return send_one
+
+
+def wsgi_sender(app, target, headers=(), threads=8):
+    """Вызывает WSGI-приложение в пуле из threads потоков - как воркер
+    gunicorn/uwsgi с тем же числом потоков."""
+    path, query = _split_target(target)
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi-load')
+    base_environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': LOCAL_HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': LOCAL_HOST,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers:
+        base_environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    def call():
+        environ = dict(base_environ, **{'wsgi.input': io.BytesIO(b'')})
+        status_line = []
+
+        def start_response(status, response_headers, exc_info=None):
+            status_line.append(status)
+
+        result = app(environ, start_response)
+        try:
+            size = sum(len(chunk) for chunk in result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return int(status_line[0].split()[0]), size
+
+    async def send_one():
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+    send_one.executor = executor
+    return send_one
+
+
+def http_sender(url, headers=()):
+    parts = urlsplit(url)
+    host = parts.hostname or LOCAL_HOST
+    port = parts.port or 80
+    target = parts.path or '/'
+    if parts.query:
+        target += '?' + parts.query
+    request = (
+        f'GET {target} HTTP/1.1\r\n'
+        f'Host: {parts.netloc}\r\n'
+        'Connection: close\r\n'
+        + ''.join(f'{name}: {value}\r\n' for name, value in headers)
+        + '\r\n'
+    ).encode()
+
+    async def send_one():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            rest = await reader.read()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+        body = rest.split(b'\r\n\r\n', 1)
+        return int(status_line.split()[1]), len(body[1]) if len(body) == 2 else 0
+
+    return send_one
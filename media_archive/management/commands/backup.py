@@ -0,0 +1,120 @@
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from media_archive import backup
+
+
+class Command(BaseCommand):
+    help = (
+        'Делает снимок архива: копию SQLite через online backup и '
+        'инкрементальную копию медиа с дедупликацией по хэшу содержимого'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dest', help='Каталог резервных копий')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Потоков для чтения и копирования файлов')
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать хэши всех файлов, не доверяя прошлому манифесту')
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Оставить столько последних снимков, остальные удалить')
+
+    def handle(self, *args, **options):
+        dest = os.path.abspath(options['dest'])
+        if backup.sqlite_path() is None:
+            raise CommandError('Команда поддерживает только базу SQLite')
+        for root in backup.media_roots().values():
+            if os.path.commonpath([dest, os.path.abspath(root)]) == os.path.abspath(root):
+                raise CommandError(f'Каталог копий не может лежать внутри {root}')
+        started = time.perf_counter()
+
+        previous = {}
+        snapshots = backup.list_snapshots(dest)
+        if snapshots and not options['full']:
+            previous = backup.read_manifest(
+                os.path.join(backup.snapshots_dir(dest), snapshots[-1])
+            )['files']
+
+        name = timezone.now().strftime('%Y%m%d-%H%M%S')
+        snapshot = os.path.join(backup.snapshots_dir(dest), name)
+        if os.path.exists(snapshot):
+            raise CommandError(f'Снимок {name} уже существует')
+        os.makedirs(snapshot)
+
+        # Сначала база: файлы, загруженные во время копирования медиа,
+        # попадут в снимок лишними, но ни одна запись не останется без файла
+        database_path = os.path.join(snapshot, backup.DATABASE_FILE)
+        backup.backup_database(database_path)
+
+        files = {}
+        copied = copied_bytes = reused = 0
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='archive-backup') as pool:
+            jobs = []
+            for label, root in backup.media_roots().items():
+                for relative, stat in backup.walk(root):
+                    key = f'{label}/{relative}'
+                    entry = previous.get(key)
+                    if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+                        files[key] = entry
+                        reused += 1
+                        continue
+                    jobs.append((key, pool.submit(
+                        self._store, dest, os.path.join(root, relative), relative, stat
+                    )))
+            for key, job in jobs:
+                try:
+                    entry, was_copied = job.result()
+                except OSError as exc:
+                    # Файл удалили во время снимка - его и не должно быть в копии
+                    self.stderr.write(f'{key}: {exc}')
+                    continue
+                files[key] = entry
+                if was_copied:
+                    copied += 1
+                    copied_bytes += entry[1]
+
+        backup.write_manifest(snapshot, {
+            'created_at': timezone.now().isoformat(),
+            'database': {
+                'file': backup.DATABASE_FILE,
+                'sha256': backup.hash_file(database_path),
+                'size': os.path.getsize(database_path),
+            },
+            'files': files,
+        })
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок {snapshot}: файлов {len(files)}, без изменений {reused}, '
+            f'скопировано {copied} ({copied_bytes / 1024 / 1024:.1f} МБ) '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
+        if options['keep']:
+            self._prune(dest, options['keep'])
+
+    def _store(self, dest, path, relative, stat):
+        digest = backup.known_hash(relative) or backup.hash_file(path)
+        return [digest, stat.st_size, stat.st_mtime_ns], backup.store_object(dest, path, digest)
+
+    def _prune(self, dest, keep):
+        """Удаляет старые снимки и объекты, на которые не ссылается ни один
+        оставшийся снимок."""
+        snapshots = backup.list_snapshots(dest)
+        for name in snapshots[:-keep]:
+            shutil.rmtree(os.path.join(backup.snapshots_dir(dest), name))
+        referenced = set()
+        for name in snapshots[-keep:]:
+            manifest = backup.read_manifest(os.path.join(backup.snapshots_dir(dest), name))
+            referenced.update(entry[0] for entry in manifest['files'].values())
+        removed = 0
+        for relative, _ in backup.walk(os.path.join(dest, 'objects')):
+            if os.path.basename(relative) not in referenced:
+                os.remove(os.path.join(dest, 'objects', relative))
+                removed += 1
+        self.stdout.write(
+            f'Удалено снимков: {max(0, len(snapshots) - keep)}, объектов: {removed}'
+        )
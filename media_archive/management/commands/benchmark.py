@@ -0,0 +1,202 @@
+import asyncio
+import json
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+
+from media_archive import loadtest
+from media_archive.models import YearAlbum, SchoolClass, EventAlbum, Photo
+
+# Маршруты, которые меняют состояние при GET или бессмысленны для замеров
+SKIPPED_ROUTES = {'logout'}
+
+AJAX_ROUTES = {'search_years'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все маршруты media_archive через тестовый клиент и (по желанию) '
+        'через HTTP-нагрузку, печатает JSON с запросами к БД, задержками, '
+        'пропускной способностью и памятью по каждому представлению'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--as', dest='role', choices=['anonymous', 'user', 'staff'],
+                            default='staff')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Имя маршрута; можно указывать несколько раз')
+        parser.add_argument('--url', help='Базовый URL запущенного сервера для HTTP-нагрузки')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--load-requests', type=int, default=500)
+        parser.add_argument('--output', help='Файл для JSON-результата (по умолчанию stdout)')
+        parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        # Замеряется сама страница, а не ограничитель частоты запросов
+        with override_settings(ARCHIVE_RATE_LIMITS={}):
+            self._run(options)
+
+    def _run(self, options):
+        kwargs_pool = self._sample_kwargs()
+        client = Client(HTTP_HOST=self._host())
+        user = self._user(options['role'])
+        if user is not None:
+            client.force_login(user)
+
+        routes = []
+        for pattern in get_resolver('media_archive.urls').url_patterns:
+            if not isinstance(pattern, URLPattern) or pattern.name in SKIPPED_ROUTES:
+                continue
+            if options['only'] and pattern.name not in options['only']:
+                continue
+            try:
+                url = reverse(pattern.name, kwargs={
+                    name: kwargs_pool[name] for name in pattern.pattern.converters
+                })
+            except KeyError as exc:
+                self.stderr.write(f'{pattern.name}: нет данных для параметра {exc}, пропускаю')
+                continue
+            routes.append((pattern.name, url))
+
+        report = {
+            'commit': self._commit(),
+            'role': options['role'],
+            'iterations': options['iterations'],
+            'views': {},
+        }
+        for name, url in routes:
+            extra = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if name in AJAX_ROUTES else {}
+            if name == 'search_years':
+                url += '?q=20'
+            result = self._measure(client, url, options['iterations'], extra)
+            if options['url']:
+                headers = [('X-Requested-With', 'XMLHttpRequest')] if extra else []
+                if user is not None:
+                    headers.append(('Cookie', f"{settings.SESSION_COOKIE_NAME}={client.session.session_key}"))
+                result['load'] = asyncio.run(loadtest.run_load(
+                    name,
+                    loadtest.http_sender(options['url'].rstrip('/') + url, headers),
+                    options['load_requests'],
+                    options['concurrency'],
+                ))
+            report['views'][name] = result
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous:
+                self._print_comparison(json.load(previous), report)
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(output)
+        else:
+            self.stdout.write(output)
+
+    def _host(self):
+        for host in settings.ALLOWED_HOSTS:
+            if host != '*' and not host.startswith('.'):
+                return host
+        return 'localhost'
+
+    def _user(self, role):
+        if role == 'anonymous':
+            return None
+        users = User.objects.filter(is_active=True, is_staff=(role == 'staff'))
+        user = users.order_by('id').first()
+        if user is None:
+            raise CommandError(f'Нет пользователя для роли {role}; запустите seed_archive')
+        return user
+
+    def _sample_kwargs(self):
+        year = YearAlbum.objects.filter(status='approved').order_by('id').first()
+        school_class = SchoolClass.objects.filter(status='approved').order_by('id').first()
+        event = EventAlbum.objects.filter(status='approved').order_by('id').first()
+        photo = Photo.objects.filter(status='approved').order_by('id').first()
+        if not (year and school_class and event and photo):
+            raise CommandError('Архив пуст; сначала запустите seed_archive')
+        return {
+            'year_id': year.id,
+            'class_id': school_class.id,
+            'event_id': event.id,
+            'photo_id': photo.id,
+            'object_id': photo.id,
+            'object_type': 'photo',
+            'action': 'approve',
+        }
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _measure(self, client, url, iterations, extra):
+        latencies = []
+        queries = []
+        query_time = []
+        statuses = set()
+        # Анонимная страница не должна ставить cookie сессии
+        cookies = set()
+        size = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url, **extra)
+                body = b''.join(response) if response.streaming else response.content
+                latencies.append(time.perf_counter() - started)
+            statuses.add(response.status_code)
+            cookies.update(response.cookies)
+            queries.append(len(captured))
+            query_time.append(sum(float(q['time']) for q in captured.captured_queries))
+            size = len(body)
+
+        # Память меряется отдельным запросом: tracemalloc сильно искажает время
+        tracemalloc.start()
+        response = client.get(url, **extra)
+        if response.streaming:
+            b''.join(response)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        ordered = sorted(latencies)
+        total = sum(latencies)
+        return {
+            'url': url,
+            'statuses': sorted(statuses),
+            'cookies': sorted(cookies),
+            'queries': max(queries),
+            'query_time_ms': round(max(query_time) * 1000, 2),
+            'latency_ms': {
+                'p50': round(loadtest.percentile(ordered, 50) * 1000, 2),
+                'p90': round(loadtest.percentile(ordered, 90) * 1000, 2),
+                'p99': round(loadtest.percentile(ordered, 99) * 1000, 2),
+                'max': round(ordered[-1] * 1000, 2),
+            },
+            'throughput_rps': round(iterations / total, 1) if total else 0.0,
+            'response_bytes': size,
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def _print_comparison(self, previous, current):
+        self.stderr.write(f"Сравнение {previous.get('commit')} -> {current.get('commit')}")
+        for name, result in current['views'].items():
+            before = previous.get('views', {}).get(name)
+            if before is None:
+                continue
+            self.stderr.write(
+                f"{name:<28} запросы {before['queries']:>4} -> {result['queries']:<4} "
+                f"p50 {before['latency_ms']['p50']:>8} -> {result['latency_ms']['p50']:<8} мс  "
+                f"размер {before['response_bytes']:>8} -> {result['response_bytes']}"
+            )
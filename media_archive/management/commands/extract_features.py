@@ -0,0 +1,101 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from media_archive import similarity
+from media_archive.models import Photo
+
+
+class Command(BaseCommand):
+    help = (
+        'Извлекает векторы признаков для поиска похожих фотографий. '
+        'Дописывает только фото, которых ещё нет в хранилище; '
+        'запускайте по расписанию после загрузок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Построить хранилище заново и подменить старое')
+
+    def handle(self, *args, **options):
+        store = similarity.get_store()
+        target = store
+        if options['rebuild']:
+            target = similarity.FeatureStore(store.directory + '.new')
+            if os.path.exists(target.path):
+                os.remove(target.path)
+
+        self.image_storage = Photo._meta.get_field('image').storage
+        self.thumbnail_storage = Photo._meta.get_field('thumbnail').storage
+        # Сверяем со всеми id, а не с последним в хранилище: фото, которое
+        # не удалось прочитать, получит вектор при следующем запуске
+        stored = set(target.load()[0].tolist())
+        missing = [
+            photo_id
+            for photo_id in Photo.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=5000)
+            if photo_id not in stored
+        ]
+        last_id = target.last_id()
+
+        started = time.perf_counter()
+        extracted = failed = 0
+        # Векторы для id меньше last_id вставляются одной перезаписью в конце
+        gaps = []
+        max_pixels = getattr(settings, 'ARCHIVE_MAX_IMAGE_PIXELS', 80_000_000)
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=similarity.init_worker,
+            initargs=(max_pixels,),
+        ) as pool:
+            batch_size = options['batch_size']
+            for start in range(0, len(missing), batch_size):
+                batch = Photo.objects.filter(id__in=missing[start:start + batch_size]).order_by('id')
+                results, errors = self._extract(pool, list(batch.values_list('id', 'image', 'thumbnail')))
+                gaps.extend(result for result in results if result[0] < last_id)
+                results = [result for result in results if result[0] > last_id]
+                target.append([photo_id for photo_id, _ in results], [vector for _, vector in results])
+                extracted, failed = extracted + len(results), failed + errors
+        target.insert([photo_id for photo_id, _ in gaps], [vector for _, vector in gaps])
+        extracted += len(gaps)
+
+        if options['rebuild']:
+            store.replace_with(target)
+            if os.path.isdir(target.directory):
+                os.rmdir(target.directory)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Векторов добавлено: {extracted}, не удалось прочитать: {failed} за {elapsed:.1f} с'
+        ))
+
+    def _source(self, image, thumbnail):
+        # Для признаков хватает миниатюры. С локального диска процесс пула
+        # читает файл сам, из облака байты скачивает основной процесс
+        name, storage = (thumbnail, self.thumbnail_storage) if thumbnail else (image, self.image_storage)
+        if isinstance(storage, FileSystemStorage):
+            return storage.path(name)
+        with storage.open(name, 'rb') as source:
+            return BytesIO(source.read())
+
+    def _extract(self, pool, batch):
+        """([(id, байты вектора), ...], число неудач) для пачки фото."""
+        ids, sources = [], []
+        for photo_id, image, thumbnail in batch:
+            try:
+                sources.append(self._source(image, thumbnail))
+            except OSError as exc:
+                self.stderr.write(f'Фото #{photo_id}: {exc}')
+                continue
+            ids.append(photo_id)
+        results = [
+            (photo_id, vector)
+            for photo_id, vector in pool.map(similarity.extract_bytes, ids, sources)
+            if vector is not None
+        ]
+        return results, len(batch) - len(results)
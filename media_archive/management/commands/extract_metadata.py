@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from media_archive import imaging, renditions
+from media_archive.models import EventAlbum, Photo, bump_cache_version
+
+METADATA_FIELDS = [
+    'taken_at', 'has_exif_time', 'orientation',
+    'camera_make', 'camera_model', 'width', 'height',
+]
+
+
+class Command(BaseCommand):
+    help = 'Извлекает EXIF и строит миниатюры для уже загруженных фотографий'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Обработать все фото, а не только те, у которых нет размеров',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.only('id', 'image', 'taken_at', 'thumbnail', 'event_album_id')
+        if not options['all']:
+            photos = photos.filter(width__isnull=True)
+
+        batch = []
+        processed = 0
+        for photo in photos.iterator(chunk_size=options['batch_size']):
+            try:
+                with photo.image.open('rb') as source:
+                    photo.apply_metadata(imaging.read_metadata(source))
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'Фото #{photo.id}: {exc}')
+                continue
+            batch.append(photo)
+            if len(batch) >= options['batch_size']:
+                processed += self._flush(batch)
+                batch = []
+        processed += self._flush(batch)
+        self.stdout.write(self.style.SUCCESS(f'Обработано фотографий: {processed}'))
+
+    def _flush(self, batch):
+        if not batch:
+            return 0
+        Photo.objects.bulk_update(batch, METADATA_FIELDS)
+        for event_id in {photo.event_album_id for photo in batch}:
+            bump_cache_version(EventAlbum, event_id)
+        renditions.build_thumbnails([photo.id for photo in batch if not photo.thumbnail])
+        return len(batch)
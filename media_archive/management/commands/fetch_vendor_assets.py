@@ -0,0 +1,90 @@
+import os
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from media_archive import assets
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует PhotoSwipe из распакованного дистрибутива в '
+        'static/media_archive/vendor и сверяет все файлы vendor с хэшами из assets.SHA256'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?',
+                            help=f'Каталог с файлами PhotoSwipe {assets.PHOTOSWIPE_VERSION}: '
+                                 'photoswipe.min.js, default-skin/ и т.д.')
+        parser.add_argument('--pin', action='store_true',
+                            help='Записать файлы без закреплённого хэша и напечатать '
+                                 'строки для assets.SHA256')
+        parser.add_argument('--check', action='store_true',
+                            help='Ничего не копировать, только сверить файлы на диске')
+
+    def handle(self, *args, **options):
+        static_root = os.path.join(apps.get_app_config('media_archive').path, 'static')
+        self.vendor_root = os.path.join(static_root, *assets.VENDOR_DIR.split('/'))
+
+        if options['check']:
+            self._check(assets.fonts_names() + assets.photoswipe_names())
+            return
+
+        if not options['source']:
+            raise CommandError('Укажите каталог с файлами PhotoSwipe или --check')
+        self._check(assets.fonts_names())
+        copied = {
+            name: self._read(os.path.join(options['source'], *name.split('/')[1:]))
+            for name in assets.photoswipe_names()
+        }
+        # Сначала сверяем всё, потом пишем: при подмене на диске не
+        # останется половины новых файлов рядом с половиной старых
+        unpinned = []
+        for name, data in copied.items():
+            expected = assets.SHA256.get(name)
+            if expected is None:
+                unpinned.append(name)
+            elif assets.sha256(data) != expected:
+                raise CommandError(f'{name}: SHA256 не совпадает с assets.SHA256, файл не записан')
+        if unpinned and not options['pin']:
+            raise CommandError(
+                f"Нет закреплённых хэшей для {', '.join(unpinned)}. "
+                'Проверьте файлы и запустите команду с --pin'
+            )
+        for name, data in copied.items():
+            self._write(name, data)
+
+        if unpinned:
+            self.stdout.write('Добавьте в assets.SHA256:')
+            for name in unpinned:
+                self.stdout.write(f"    '{name}': '{assets.sha256(copied[name])}',")
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {self.vendor_root}. Закоммитьте каталог и выполните collectstatic'
+        ))
+
+    def _check(self, names):
+        broken = [name for name in names if not os.path.exists(self._path(name)) or not self._matches(name)]
+        if broken:
+            raise CommandError(f"Не найдены или не совпадают с assets.SHA256: {', '.join(broken)}")
+        self.stdout.write(f'Файлов сверено: {len(names)}')
+
+    def _matches(self, name):
+        with open(self._path(name), 'rb') as source:
+            return assets.sha256(source.read()) == assets.SHA256.get(name)
+
+    def _path(self, name):
+        return os.path.join(self.vendor_root, *name.split('/'))
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as source:
+                return source.read()
+        except OSError as exc:
+            raise CommandError(f'Не удалось прочитать {path}: {exc}')
+
+    def _write(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as output:
+            output.write(data)
+        self.stdout.write(f'  {path} ({len(data)} байт)')
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from media_archive import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: сравнивает пропускную способность и p99 задержки '
+        'WSGI и ASGI обработчиков на одном URL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', default='/search/?q=20',
+                            help='Путь с query string или полный URL для режима http')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both', 'http'], default='both')
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help='Число одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Общее число запросов на каждый прогон')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Число потоков WSGI-сервера')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('-H', '--header', action='append', default=[],
+                            help='Заголовок "Имя: значение", можно указывать несколько раз')
+        parser.add_argument('--json', dest='json_path',
+                            help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        headers = []
+        for header in options['header']:
+            name, sep, value = header.partition(':')
+            if not sep:
+                raise CommandError(f'Неверный заголовок: {header}')
+            headers.append((name.strip(), value.strip()))
+
+        senders = []
+        target = options['target']
+        if options['mode'] == 'http':
+            if not target.startswith('http'):
+                raise CommandError('В режиме http нужен полный URL')
+            senders.append(('http', loadtest.http_sender(target, headers)))
+        if options['mode'] in ('wsgi', 'both'):
+            senders.append((
+                f"wsgi x{options['threads']} потоков",
+                loadtest.wsgi_sender(WSGIHandler(), target, headers, options['threads']),
+            ))
+        if options['mode'] in ('asgi', 'both'):
+            senders.append(('asgi', loadtest.asgi_sender(ASGIHandler(), target, headers)))
+
+        results = []
+        for label, send_one in senders:
+            asyncio.run(loadtest.run_load(label, send_one, options['warmup'], 1))
+            result = asyncio.run(loadtest.run_load(
+                label, send_one, options['requests'], options['concurrency']
+            ))
+            results.append(result)
+            if hasattr(send_one, 'executor'):
+                send_one.executor.shutdown()
+            self._print_result(result)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as output:
+                json.dump({
+                    'target': target,
+                    'concurrency': options['concurrency'],
+                    'results': results,
+                }, output, ensure_ascii=False, indent=2)
+
+    def _print_result(self, result):
+        latency = result['latency_ms']
+        self.stdout.write(
+            f"{result['label']:<20} {result['throughput_rps']:>9} rps  "
+            f"p50 {latency['p50']:>8} мс  p99 {latency['p99']:>8} мс  "
+            f"max {latency['max']:>8} мс  ошибок {result['errors']}  "
+            f"статусы {result['statuses']}"
+        )
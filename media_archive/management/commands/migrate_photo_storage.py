@@ -0,0 +1,103 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, InvalidStorageError, storages
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from media_archive import deletion
+from media_archive.models import Photo
+from media_archive.storage import SHARDED_NAME_RE, content_hash, photo_storage, sharded_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит фотографии из плоского каталога photos/ в раскладку по хэшу '
+        'содержимого (photos/ab/cd/<sha256>.jpg) и переписывает Photo.image'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='default',
+                            help='Псевдоним хранилища в STORAGES, где лежат старые файлы')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Не удалять старые файлы после переноса')
+
+    def handle(self, *args, **options):
+        try:
+            self.source = storages[options['source']]
+        except InvalidStorageError as exc:
+            raise CommandError(f"Неизвестное хранилище {options['source']}: {exc}")
+        self.target = photo_storage()
+        # Оба хранилища локальные: файл не копируется, а получает жёсткую
+        # ссылку под новым именем, старое имя удаляется после коммита
+        self.local = isinstance(self.source, FileSystemStorage) and isinstance(self.target, FileSystemStorage)
+
+        moved = failed = 0
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='archive-migrate') as pool:
+            while True:
+                rows = list(
+                    Photo.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'image', 'thumbnail')[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                rows = [row for row in rows if row[1] and not SHARDED_NAME_RE.search(row[1])]
+                if not rows:
+                    continue
+
+                names = {row[1] for row in rows}
+                renamed = dict(zip(names, pool.map(self._move, names)))
+                photos = []
+                for photo_id, image, thumbnail in rows:
+                    if renamed[image] is None:
+                        failed += 1
+                        continue
+                    photos.append(Photo(id=photo_id, image=renamed[image]))
+                with transaction.atomic():
+                    Photo.objects.bulk_update(photos, ['image'], batch_size=options['batch_size'])
+                moved += len(photos)
+
+                if not options['keep_old']:
+                    # seed_archive использует изображение и как миниатюру
+                    keep = {thumbnail for _, _, thumbnail in rows}
+                    old_names = [name for name, new in renamed.items() if new and name not in keep]
+                    list(pool.map(self._delete_old, old_names))
+                self.stdout.write(f'  перенесено {moved}')
+
+        self.stdout.write(self.style.SUCCESS(f'Перенесено фото: {moved}, с ошибками: {failed}'))
+
+    def _move(self, name):
+        try:
+            if self.local:
+                return self._link(name)
+            with self.source.open(name, 'rb') as source:
+                return self.target.save(name, source)
+        except OSError as exc:
+            self.stderr.write(f'{name}: {exc}')
+            return None
+
+    def _link(self, name):
+        source_path = self.source.path(name)
+        with open(source_path, 'rb') as source:
+            new_name = sharded_name(name, content_hash(File(source)))
+        target_path = self.target.path(new_name)
+        if not os.path.exists(target_path):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            try:
+                os.link(source_path, target_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                # Разные файловые системы или ФС без жёстких ссылок
+                shutil.copyfile(source_path, target_path)
+        return new_name
+
+    def _delete_old(self, name):
+        deletion.delete_file(self.source, name)
+
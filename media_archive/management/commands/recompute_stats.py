@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from media_archive import activity, stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает итоги статистики архива и дневные итоги журнала '
+        'действий с нуля. Запускайте раз в сутки: поправляет расхождения '
+        'после удаления альбомов и правок в админке'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        daily = activity.rebuild_daily()
+        rollups = stats.recompute()
+        self.stdout.write(self.style.SUCCESS(
+            f'Итогов статистики: {rollups}, дневных итогов журнала: {daily} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from media_archive import covers
+from media_archive.models import YearAlbum, SchoolClass, EventAlbum
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает обложки всех событий, классов и учебных годов'
+
+    def handle(self, *args, **options):
+        changed = 0
+        # Порядок важен: обложка класса берётся из обложек событий,
+        # а обложка года - из обложек классов
+        for model in (EventAlbum, SchoolClass, YearAlbum):
+            for album_id in model.objects.values_list('id', flat=True).iterator():
+                if covers.refresh_cover(model, album_id):
+                    changed += 1
+        self.stdout.write(self.style.SUCCESS(f'Обложек обновлено: {changed}'))
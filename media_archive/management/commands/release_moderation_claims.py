@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from media_archive import moderation
+
+
+class Command(BaseCommand):
+    help = 'Возвращает в очередь модерации объекты с истёкшей арендой'
+
+    def handle(self, *args, **options):
+        released = moderation.release_expired()
+        self.stdout.write(self.style.SUCCESS(f'Возвращено в очередь: {released}'))
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from media_archive import backup
+
+
+def _copy(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.restore-')
+    os.close(handle)
+    try:
+        shutil.copyfile(source, temporary)
+        os.replace(temporary, target)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def _restore(source, target, digest, size):
+    """Копирует объект source в target, если там не то же содержимое.
+    Размер отсеивает явно другие файлы, остальные сверяются по SHA256:
+    совпадение размера и mtime не значит, что файл не повреждён.
+
+    Возвращает True, если файл скопирован."""
+    if os.path.isfile(target) and os.path.getsize(target) == size and backup.hash_file(target) == digest:
+        return False
+    _copy(source, target)
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет снимок, сделанный командой backup, и восстанавливает '
+        'из него базу и медиа'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dest', help='Каталог резервных копий')
+        parser.add_argument('--snapshot', help='Имя снимка; по умолчанию последний')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--verify-only', action='store_true',
+                            help='Только проверить целостность снимка')
+        parser.add_argument('--force', action='store_true',
+                            help='Перезаписать существующую базу')
+
+    def handle(self, *args, **options):
+        dest = os.path.abspath(options['dest'])
+        snapshots = backup.list_snapshots(dest)
+        if not snapshots:
+            raise CommandError(f'В {dest} нет снимков')
+        name = options['snapshot'] or snapshots[-1]
+        if name not in snapshots:
+            raise CommandError(f"Снимок {name} не найден; есть: {', '.join(snapshots)}")
+        snapshot = os.path.join(backup.snapshots_dir(dest), name)
+        manifest = backup.read_manifest(snapshot)
+
+        self._verify(dest, snapshot, manifest, options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'Снимок {name} цел: файлов {len(manifest["files"])}'))
+        if options['verify_only']:
+            return
+
+        database_path = backup.sqlite_path()
+        if database_path is None:
+            raise CommandError('Команда поддерживает только базу SQLite')
+        if os.path.exists(database_path) and not options['force']:
+            raise CommandError(f'{database_path} уже существует; добавьте --force, чтобы заменить')
+        connections.close_all()
+        _copy(os.path.join(snapshot, manifest['database']['file']), database_path)
+
+        roots = backup.media_roots()
+        restored = 0
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='archive-restore') as pool:
+            jobs = []
+            for key, (digest, size, _) in manifest['files'].items():
+                label, relative = key.split('/', 1)
+                if label not in roots:
+                    self.stderr.write(f'{key}: каталог {label} не настроен, пропущен')
+                    continue
+                target = os.path.join(roots[label], *relative.split('/'))
+                jobs.append(pool.submit(_restore, backup.object_path(dest, digest), target, digest, size))
+            for job in jobs:
+                restored += job.result()
+        self.stdout.write(self.style.SUCCESS(
+            f'Восстановлена база {database_path} и файлов: {restored}'
+        ))
+
+    def _verify(self, dest, snapshot, manifest, workers):
+        database = os.path.join(snapshot, manifest['database']['file'])
+        if backup.hash_file(database) != manifest['database']['sha256']:
+            raise CommandError('Копия базы повреждена: хэш не совпадает')
+        result = backup.check_database(database)
+        if result != 'ok':
+            raise CommandError(f'PRAGMA integrity_check: {result}')
+
+        digests = {entry[0] for entry in manifest['files'].values()}
+
+        def check(digest):
+            path = backup.object_path(dest, digest)
+            if not os.path.isfile(path):
+                return f'{digest}: объект отсутствует'
+            if backup.hash_file(path) != digest:
+                return f'{digest}: содержимое не совпадает с хэшем'
+            return None
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='archive-verify') as pool:
+            problems = [problem for problem in pool.map(check, digests) if problem]
+        for problem in problems[:20]:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f'Повреждённых или отсутствующих объектов: {len(problems)}')
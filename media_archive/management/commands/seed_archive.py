@@ -0,0 +1,156 @@
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from media_archive.models import YearAlbum, SchoolClass, EventAlbum, Photo
+
+CLASS_LETTERS = 'АБВГДЕЖИКЛМН'
+SEED_DIR = 'photos/seed'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетический архив для нагрузочных тестов, например: '
+        'seed_archive --years 20 --classes 30 --events 50 --photos 200'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=3)
+        parser.add_argument('--classes', type=int, default=4, help='Классов в каждом году')
+        parser.add_argument('--events', type=int, default=5, help='Событий в каждом классе')
+        parser.add_argument('--photos', type=int, default=20, help='Фото в каждом событии')
+        parser.add_argument('--start-year', type=int, default=timezone.now().year - 1,
+                            help='Первый (самый поздний) учебный год')
+        parser.add_argument('--pending-ratio', type=float, default=0.05,
+                            help='Доля объектов, оставленных на модерации')
+        parser.add_argument('--image-size', default='64x48')
+        parser.add_argument('--uploaders', type=int, default=10)
+        parser.add_argument('--workers', type=int, default=8, help='Потоков для записи файлов')
+        parser.add_argument('--seed', type=int, default=2086)
+        parser.add_argument('--covers', action='store_true',
+                            help='Сразу построить обложки альбомов')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        try:
+            width, height = (int(side) for side in options['image_size'].split('x'))
+        except ValueError:
+            raise CommandError('--image-size задаётся как ШИРИНАxВЫСОТА, например 64x48')
+        if options['classes'] > 11 * len(CLASS_LETTERS):
+            raise CommandError(f'Не больше {11 * len(CLASS_LETTERS)} классов в году')
+
+        staff, _ = User.objects.get_or_create(
+            username='seed_admin', defaults={'is_staff': True, 'is_superuser': True}
+        )
+        uploaders = [staff] + [
+            User.objects.get_or_create(username=f'seed_parent_{n}')[0]
+            for n in range(options['uploaders'])
+        ]
+        self.pending_ratio = options['pending_ratio']
+        images = [self._make_image(width, height, n) for n in range(16)]
+
+        existing = set(YearAlbum.objects.values_list('year', flat=True))
+        years = []
+        for n in range(options['years']):
+            start = options['start_year'] - n
+            name = f'{start}-{start + 1}'
+            if name in existing:
+                self.stdout.write(self.style.WARNING(f'Учебный год {name} уже есть, пропускаю'))
+                continue
+            years.append(YearAlbum(year=name, status='approved', created_by=staff))
+        years = YearAlbum.objects.bulk_create(years)
+
+        classes = SchoolClass.objects.bulk_create([
+            SchoolClass(
+                class_name=f'{n % 11 + 1}{CLASS_LETTERS[n // 11]}',
+                year_album=year,
+                status=self._status(),
+                created_by=self.random.choice(uploaders),
+            )
+            for year in years
+            for n in range(options['classes'])
+        ])
+
+        events = EventAlbum.objects.bulk_create([
+            EventAlbum(
+                title=f'Событие {n + 1}',
+                school_class=school_class,
+                status=self._status(),
+                created_by=self.random.choice(uploaders),
+            )
+            for school_class in classes
+            for n in range(options['events'])
+        ], batch_size=1000)
+
+        year_start = {year.pk: int(year.year[:4]) for year in years}
+        class_year = {school_class.pk: school_class.year_album_id for school_class in classes}
+        total = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for event in events:
+                total += self._seed_photos(
+                    pool, event, options['photos'], images, uploaders,
+                    year_start[class_year[event.school_class_id]], (width, height),
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(years)} годов, {len(classes)} классов, '
+            f'{len(events)} событий, {total} фото'
+        ))
+        if options['covers']:
+            call_command('refresh_covers', stdout=self.stdout)
+        # Фото созданы bulk_create в обход stats.photos_uploaded
+        call_command('recompute_stats', stdout=self.stdout)
+
+    def _status(self):
+        return 'pending' if self.random.random() < self.pending_ratio else 'approved'
+
+    def _make_image(self, width, height, n):
+        hue = n * 360 // 16
+        image = Image.new('RGB', (width, height), f'hsl({hue}, 60%, 55%)')
+        draw = ImageDraw.Draw(image)
+        draw.ellipse((width // 4, height // 4, width * 3 // 4, height * 3 // 4),
+                     fill=f'hsl({(hue + 180) % 360}, 60%, 45%)')
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=80)
+        return buffer.getvalue()
+
+    def _seed_photos(self, pool, event, count, images, uploaders, start_year, size):
+        directory = os.path.join(SEED_DIR, str(event.pk))
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, directory), exist_ok=True)
+        school_year_start = timezone.make_aware(datetime(start_year, 9, 1))
+        event_day = school_year_start + timedelta(days=self.random.randrange(300))
+        photos = []
+        writes = []
+        for n in range(count):
+            name = f'{directory}/{n}.jpg'
+            data = images[self.random.randrange(len(images))]
+            writes.append((os.path.join(settings.MEDIA_ROOT, name), data))
+            photos.append(Photo(
+                event_album=event,
+                image=name,
+                thumbnail=name,
+                status=self._status(),
+                uploaded_by=self.random.choice(uploaders),
+                taken_at=event_day + timedelta(seconds=self.random.randrange(4 * 3600)),
+                has_exif_time=True,
+                width=size[0],
+                height=size[1],
+                file_size=len(data),
+            ))
+        list(pool.map(_write_file, writes))
+        Photo.objects.bulk_create(photos, batch_size=1000)
+        return count
+
+
+def _write_file(item):
+    path, data = item
+    with open(path, 'wb') as output:
+        output.write(data)
@@ -0,0 +1,64 @@
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from media_archive import similarity
+from media_archive.loadtest import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет поиск похожих фото на синтетическом хранилище векторов '
+        'заданного размера во временном каталоге'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=500_000, help='Число векторов')
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--limit', type=int, default=36)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        numpy = similarity._numpy()
+        generator = numpy.random.default_rng(options['seed'])
+        with tempfile.TemporaryDirectory() as directory:
+            store = similarity.FeatureStore(directory)
+            started = time.perf_counter()
+            chunk = 65536
+            for start in range(0, options['size'], chunk):
+                count = min(chunk, options['size'] - start)
+                # Как у настоящих гистограмм: неотрицательные, единичной длины
+                vectors = generator.random((count, similarity.DIMENSIONS), dtype=numpy.float32) ** 4
+                vectors /= numpy.linalg.norm(vectors, axis=1, keepdims=True)
+                store.append(
+                    list(range(start + 1, start + count + 1)),
+                    [vectors.tobytes()],
+                )
+            written = time.perf_counter() - started
+
+            started = time.perf_counter()
+            store.load()
+            loaded = time.perf_counter() - started
+
+            sample = random.Random(options['seed'])
+            latencies = []
+            for _ in range(options['queries']):
+                photo_id = sample.randint(1, options['size'])
+                started = time.perf_counter()
+                store.nearest(photo_id, options['limit'])
+                latencies.append(time.perf_counter() - started)
+            size = store._stat()[0] * similarity.RECORD_BYTES
+
+        latencies.sort()
+        self.stdout.write(
+            f"Векторов: {options['size']}, файл {size / 1024 / 1024:.0f} МБ, "
+            f"запись {written:.1f} с, открытие {loaded * 1000:.1f} мс"
+        )
+        self.stdout.write(
+            f"Запрос ({options['queries']} шт., top-{options['limit']}), мс: "
+            f"p50 {percentile(latencies, 50) * 1000:.1f}, "
+            f"p90 {percentile(latencies, 90) * 1000:.1f}, "
+            f"p99 {percentile(latencies, 99) * 1000:.1f}"
+        )
@@ -0,0 +1,82 @@
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# То, что делает каждый процесс при старте: настройка Django, загрузка
+# приложений и URLconf (а с ним и всех представлений)
+STARTUP_CODE = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+# Модули, которые не должны загружаться при старте
+LAZY_MODULES = ('PIL', 'numpy')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время старта проекта через python -X importtime в отдельных '
+        'процессах и падает, если медиана превышает бюджет'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--budget-ms', type=float,
+                            default=getattr(settings, 'ARCHIVE_STARTUP_BUDGET_MS', 600),
+                            help='Допустимая медиана суммарного времени импорта, мс')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Сколько самых медленных модулей показать')
+
+    def handle(self, *args, **options):
+        totals = []
+        modules = None
+        for _ in range(options['runs']):
+            total, modules = self._measure()
+            totals.append(total)
+
+        median = statistics.median(totals)
+        self.stdout.write(f"Время импорта, мс: медиана {median:.0f}, "
+                          f"мин {min(totals):.0f}, макс {max(totals):.0f} ({options['runs']} запусков)")
+        self.stdout.write('Самые медленные модули (собственное время, мс):')
+        for name, self_us in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:options['top']]:
+            self.stdout.write(f'  {self_us / 1000:8.1f}  {name}')
+
+        eager = [
+            lazy for lazy in LAZY_MODULES
+            if any(name == lazy or name.startswith(lazy + '.') for name in modules)
+        ]
+        if eager:
+            raise CommandError(f"При старте импортируются тяжёлые модули: {', '.join(eager)}")
+        if median > options['budget_ms']:
+            raise CommandError(
+                f"Старт занимает {median:.0f} мс, бюджет {options['budget_ms']:.0f} мс"
+            )
+        self.stdout.write(self.style.SUCCESS('Старт укладывается в бюджет'))
+
+    def _measure(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'school_archive.settings'
+        ))
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if process.returncode != 0:
+            raise CommandError(f'Процесс завершился с ошибкой:\n{process.stderr[-2000:]}')
+
+        # Строки вида "import time:   self [us] |  cumulative | package";
+        # суммарное время - сумма собственного времени всех модулей
+        modules = {}
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            parts = line[len('import time:'):].split('|')
+            if len(parts) != 3 or not parts[0].strip().isdigit():
+                continue
+            modules[parts[2].strip()] = int(parts[0])
+        return sum(modules.values()) / 1000, modules
@@ -0,0 +1,131 @@
+import os
+import posixpath
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from media_archive import deletion
+from media_archive.models import YearAlbum, SchoolClass, EventAlbum, Photo
+
+# Файловые поля и каталоги, в которые они пишут
+FILE_FIELDS = (
+    (Photo, 'image'),
+    (Photo, 'thumbnail'),
+    (EventAlbum, 'cover_thumbnail'),
+    (SchoolClass, 'cover_thumbnail'),
+    (YearAlbum, 'cover_thumbnail'),
+)
+
+
+def _walk(root):
+    """Имена файлов под root относительно root, через scandir без stat
+    для каждого файла; возраст проверяется только у кандидатов в сироты."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.relpath(entry.path, root).replace(os.sep, '/'), entry
+
+
+def _list_files(storage, prefix):
+    """(имя, функция времени изменения) для всех файлов под prefix."""
+    try:
+        root = storage.path(prefix)
+    except NotImplementedError:
+        # Удалённое хранилище (S3): обходим через listdir
+        stack = [prefix]
+        while stack:
+            directory = stack.pop()
+            directories, files = storage.listdir(directory)
+            stack.extend(posixpath.join(directory, name) for name in directories)
+            for file_name in files:
+                name = posixpath.join(directory, file_name)
+                yield name, lambda name=name: storage.get_modified_time(name).timestamp()
+        return
+    for relative, entry in _walk(root):
+        name = f'{prefix}/{relative}' if prefix else relative
+        yield name, lambda entry=entry: entry.stat().st_mtime
+
+
+class Command(BaseCommand):
+    help = (
+        'Доделывает прерванные удаления альбомов и удаляет файлы в MEDIA_ROOT '
+        'и хранилище оригиналов, на которые не ссылается ни одна запись'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать сирот, ничего не удаляя')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд '
+                                 '(загрузки, чья запись ещё не закоммичена)')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if not dry_run:
+            purged = deletion.purge_deleted()
+            if purged:
+                self.stdout.write(f'Доудалено фотографий из удалённых альбомов: {purged}')
+
+        cutoff = time.time() - options['min_age']
+        orphans = []
+        for storage, prefixes, referenced in self._sources():
+            for prefix in prefixes:
+                for name, modified in _list_files(storage, prefix):
+                    if name in referenced:
+                        continue
+                    try:
+                        if modified() > cutoff:
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    orphans.append((storage, name))
+
+        size = 0
+        for storage, name in orphans:
+            try:
+                size += storage.size(name)
+            except OSError:
+                pass
+            if dry_run or options['verbosity'] > 1:
+                self.stdout.write(f'  {name}')
+        if dry_run:
+            self.stdout.write(f'Сирот: {len(orphans)}, {size / 1024 / 1024:.1f} МБ (ничего не удалено)')
+            return
+        deletion.delete_unreferenced(orphans)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов-сирот: {len(orphans)}, {size / 1024 / 1024:.1f} МБ'
+        ))
+
+    def _sources(self):
+        """(хранилище, каталоги, имена из базы) для каждого хранилища."""
+        by_storage = {}
+        for model, field_name in FILE_FIELDS:
+            field = model._meta.get_field(field_name)
+            # Локальные хранилища с общим корнем (default и photos) сверяются
+            # вместе: миниатюра может ссылаться на файл в каталоге фото
+            key = field.storage.location if isinstance(field.storage, FileSystemStorage) else id(field.storage)
+            prefixes, referenced = by_storage.setdefault(key, (field.storage, set(), set()))[1:]
+            prefixes.add(str(field.upload_to).strip('/'))
+            referenced.update(
+                name for name in model.objects.values_list(field_name, flat=True).iterator(chunk_size=5000)
+                if name
+            )
+        yield from by_storage.values()
+
+        originals = deletion.originals_storage()
+        if originals is not None:
+            referenced = set(
+                Photo.objects.exclude(original_name='')
+                .values_list('original_name', flat=True).iterator(chunk_size=5000)
+            )
+            yield originals, [''], referenced
@@ -0,0 +1,175 @@
+import bisect
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+# Метрики запросов собираются в памяти процесса и отдаются на /metrics
+# в текстовом формате Prometheus. У каждого воркера свои счётчики -
+# Prometheus опрашивает их по отдельности и суммирует сам.
+
+# Границы корзин гистограмм: секунды для времени, штуки для запросов к БД,
+# байты для размера ответа
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    'archive_request_duration_seconds': ('Время обработки запроса', TIME_BUCKETS),
+    'archive_db_queries': ('Число запросов к БД за HTTP-запрос', COUNT_BUCKETS),
+    'archive_db_duration_seconds': ('Суммарное время запросов к БД', TIME_BUCKETS),
+    'archive_template_duration_seconds': ('Суммарное время рендеринга шаблонов', TIME_BUCKETS),
+    'archive_response_bytes': ('Размер тела ответа', SIZE_BUCKETS),
+}
+
+# SQL сохраняется только для журнала медленных запросов и не больше этого числа
+MAX_CAPTURED_SQL = 50
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class RequestStats:
+    """Счётчики одного HTTP-запроса; живут в ContextVar, поэтому
+    доходят и до потоков sync_to_async у асинхронных представлений."""
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.capture_sql = capture_sql
+        self.sql = []
+
+
+_current = contextvars.ContextVar('archive_request_stats', default=None)
+_lock = threading.Lock()
+_histograms = {}
+_responses = {}
+
+
+def start_request(capture_sql=False):
+    stats = RequestStats(capture_sql)
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record(view, method, status, duration, stats, size):
+    values = {
+        'archive_request_duration_seconds': duration,
+        'archive_db_queries': stats.queries,
+        'archive_db_duration_seconds': stats.db_time,
+        'archive_template_duration_seconds': stats.template_time,
+        'archive_response_bytes': size,
+    }
+    with _lock:
+        for name, value in values.items():
+            key = (name, view)
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = Histogram(METRICS[name][1])
+            histogram.observe(value)
+        key = (view, method, str(status))
+        _responses[key] = _responses.get(key, 0) + 1
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _responses.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    with _lock:
+        histograms = {
+            key: (list(h.counts), h.total, h.buckets) for key, h in _histograms.items()
+        }
+        responses = dict(_responses)
+
+    lines = [
+        '# HELP archive_responses_total Число ответов по представлению, методу и статусу',
+        '# TYPE archive_responses_total counter',
+    ]
+    for (view, method, status), count in sorted(responses.items()):
+        lines.append(
+            f'archive_responses_total{{view="{_label(view)}",method="{method}",'
+            f'status="{status}"}} {count}'
+        )
+    for name, (description, _) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, view), (counts, total, buckets) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            view = _label(view)
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{view="{view}"}} {total:.6f}')
+            lines.append(f'{name}_count{{view="{view}"}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.capture_sql and len(stats.sql) < MAX_CAPTURED_SQL:
+            stats.sql.append((elapsed, sql))
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if getattr(settings, 'ARCHIVE_METRICS_ENABLED', True):
+        connection.execute_wrappers.append(_record_query)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Шаблонный бэкенд Django, который засекает время рендеринга."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
@@ -0,0 +1,71 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+slow_logger = logging.getLogger('media_archive.slow_requests')
+
+
+class RequestMetricsMiddleware:
+    """Собирает время, число и длительность SQL-запросов, время шаблонов
+    и размер ответа по каждому представлению для /metrics.
+
+    Запросы дольше ARCHIVE_SLOW_REQUEST_MS пишутся в журнал
+    media_archive.slow_requests вместе с выполненным SQL."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'ARCHIVE_METRICS_ENABLED', True)
+        self.slow_ms = getattr(settings, 'ARCHIVE_SLOW_REQUEST_MS', None)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        stats, token = metrics.start_request(capture_sql=self.slow_ms is not None)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        stats, token = metrics.start_request(capture_sql=self.slow_ms is not None)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def _finish(self, request, response, stats, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        metrics.record(view, request.method, response.status_code, duration, stats, size)
+
+        if self.slow_ms is not None and duration * 1000 >= self.slow_ms:
+            slow_logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL %d шт. за %.0f мс, шаблоны %.0f мс\n%s',
+                request.method, request.get_full_path(), view, duration * 1000,
+                stats.queries, stats.db_time * 1000, stats.template_time * 1000,
+                '\n'.join(f'  [{elapsed * 1000:.1f} мс] {sql}' for elapsed, sql in stats.sql),
+            )
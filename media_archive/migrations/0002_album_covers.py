@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='CustomUser',
+        ),
+        migrations.AddField(
+            model_name='eventalbum',
+            name='cover_is_manual',
+            field=models.BooleanField(default=False, verbose_name='Обложка выбрана вручную'),
+        ),
+        migrations.AddField(
+            model_name='eventalbum',
+            name='cover_photo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='media_archive.photo', verbose_name='Обложка'),
+        ),
+        migrations.AddField(
+            model_name='eventalbum',
+            name='cover_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='covers/', verbose_name='Миниатюра обложки'),
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='cover_is_manual',
+            field=models.BooleanField(default=False, verbose_name='Обложка выбрана вручную'),
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='cover_photo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='media_archive.photo', verbose_name='Обложка'),
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='cover_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='covers/', verbose_name='Миниатюра обложки'),
+        ),
+        migrations.AddField(
+            model_name='yearalbum',
+            name='cover_is_manual',
+            field=models.BooleanField(default=False, verbose_name='Обложка выбрана вручную'),
+        ),
+        migrations.AddField(
+            model_name='yearalbum',
+            name='cover_photo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='media_archive.photo', verbose_name='Обложка'),
+        ),
+        migrations.AddField(
+            model_name='yearalbum',
+            name='cover_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='covers/', verbose_name='Миниатюра обложки'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:23
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_uploaded_at(apps, schema_editor):
+    # До извлечения EXIF лучшее, что известно о времени съёмки, - время загрузки
+    Photo = apps.get_model('media_archive', 'Photo')
+    Photo.objects.update(taken_at=models.F('uploaded_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0002_album_covers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='camera_make',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Производитель камеры'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='camera_model',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Модель камеры'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='has_exif_time',
+            field=models.BooleanField(default=False, verbose_name='Время съёмки из EXIF'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='orientation',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Ориентация EXIF'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='taken_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата съёмки'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='thumbnails/', verbose_name='Миниатюра'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['event_album', 'status', 'taken_at'], name='photo_gallery_idx'),
+        ),
+        migrations.RunPython(copy_uploaded_at, migrations.RunPython.noop),
+    ]
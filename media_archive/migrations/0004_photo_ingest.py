@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0003_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='file_size',
+            field=models.PositiveIntegerField(default=0, verbose_name='Размер файла, байт'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='original_name',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Оригинал в холодном хранилище'),
+        ),
+    ]
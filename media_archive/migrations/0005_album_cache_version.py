@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0004_photo_ingest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventalbum',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия карточки'),
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия карточки'),
+        ),
+        migrations.AddField(
+            model_name='yearalbum',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия карточки'),
+        ),
+    ]
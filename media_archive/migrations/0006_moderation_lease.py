@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0005_album_cache_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventalbum',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Аренда до'),
+        ),
+        migrations.AddField(
+            model_name='eventalbum',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Взят модератором'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Аренда до'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Взят модератором'),
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Аренда до'),
+        ),
+        migrations.AddField(
+            model_name='schoolclass',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Взят модератором'),
+        ),
+        migrations.AddField(
+            model_name='yearalbum',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Аренда до'),
+        ),
+        migrations.AddField(
+            model_name='yearalbum',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Взят модератором'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['status', 'claim_expires_at'], name='photo_moderation_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0006_moderation_lease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventalbum',
+            name='status',
+            field=models.CharField(choices=[('pending', 'На модерации'), ('approved', 'Одобрено'), ('rejected', 'Отклонено'), ('deleted', 'Удаляется')], default='pending', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='schoolclass',
+            name='status',
+            field=models.CharField(choices=[('pending', 'На модерации'), ('approved', 'Одобрено'), ('rejected', 'Отклонено'), ('deleted', 'Удаляется')], default='pending', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='yearalbum',
+            name='status',
+            field=models.CharField(choices=[('pending', 'На модерации'), ('approved', 'Одобрено'), ('rejected', 'Отклонено'), ('deleted', 'Удаляется')], default='pending', max_length=20, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:47
+
+import media_archive.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0007_album_deleted_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photo',
+            name='image',
+            field=models.ImageField(db_index=True, storage=media_archive.storage.photo_storage, upload_to='photos/', verbose_name='Фотография'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0008_photo_sharded_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('action', models.CharField(choices=[('create', 'Создание'), ('upload', 'Загрузка'), ('approve', 'Одобрение'), ('reject', 'Отклонение'), ('delete', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('object_type', models.CharField(choices=[('year', 'Учебный год'), ('class', 'Класс'), ('event', 'Событие'), ('photo', 'Фотография')], max_length=10, verbose_name='Тип объекта')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Действия за день',
+                'verbose_name_plural': 'Действия по дням',
+                'constraints': [models.UniqueConstraint(fields=('day', 'actor', 'action', 'object_type'), name='activity_daily_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('create', 'Создание'), ('upload', 'Загрузка'), ('approve', 'Одобрение'), ('reject', 'Отклонение'), ('delete', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('object_type', models.CharField(choices=[('year', 'Учебный год'), ('class', 'Класс'), ('event', 'Событие'), ('photo', 'Фотография')], max_length=10, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Действие',
+                'verbose_name_plural': 'Журнал действий',
+                'indexes': [models.Index(fields=['actor', 'created_at'], name='activity_actor_idx'), models.Index(fields=['object_type', 'object_id', 'created_at'], name='activity_object_idx'), models.Index(fields=['created_at'], name='activity_time_idx')],
+            },
+        ),
+    ]
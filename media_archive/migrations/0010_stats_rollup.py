@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0009_activity_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('year', 'Учебный год'), ('event', 'Событие'), ('uploader', 'Пользователь'), ('pending', 'На модерации'), ('latency', 'Время модерации')], max_length=10, verbose_name='Вид')),
+                ('key', models.PositiveBigIntegerField(verbose_name='Ключ')),
+                ('label', models.CharField(blank=True, max_length=255, verbose_name='Название')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество')),
+                ('bytes', models.BigIntegerField(default=0, verbose_name='Объём, байт')),
+                ('seconds', models.FloatField(default=0, verbose_name='Секунд всего')),
+            ],
+            options={
+                'verbose_name': 'Итог статистики',
+                'verbose_name_plural': 'Итоги статистики',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='stats_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media_archive', '0010_stats_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['status', 'taken_at'], name='photo_timeline_idx'),
+        ),
+    ]
@@ -1,15 +1,56 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
+from .storage import photo_storage
+
+
+def bump_cache_version(model, pk):
+    """Увеличивает версию карточки альбома: фрагменты шаблонов кэшируются
+    по (id, cache_version), поэтому старые копии просто перестают читаться."""
+    model.objects.filter(pk=pk).update(cache_version=models.F('cache_version') + 1)
+
+
+class ModerationLease(models.Model):
+    """Аренда объекта модератором: пока она не истекла, объект не выдаётся
+    другим модераторам из очереди (см. moderation.claim)."""
+
+    claimed_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name='Взят модератором'
+    )
+    claim_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Аренда до'
+    )
+
+    class Meta:
+        abstract = True
+
+    def is_claimed_by_other(self, user):
+        return (
+            self.claimed_by_id is not None
+            and self.claimed_by_id != user.id
+            and self.claim_expires_at is not None
+            and self.claim_expires_at > timezone.now()
+        )
 
 
 # Остальные модели без изменений...
-class YearAlbum(models.Model):
+class YearAlbum(ModerationLease):
     STATUS_CHOICES = [
         ('pending', 'На модерации'),
         ('approved', 'Одобрено'),
         ('rejected', 'Отклонено'),
+        ('deleted', 'Удаляется'),
     ]
 
     year = models.CharField(max_length=9, verbose_name='Учебный год')
@@ -28,6 +69,29 @@ class YearAlbum(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания'
     )
+    cover_photo = models.ForeignKey(
+        'Photo',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Обложка'
+    )
+    cover_thumbnail = models.ImageField(
+        upload_to='covers/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра обложки'
+    )
+    cover_is_manual = models.BooleanField(
+        default=False,
+        verbose_name='Обложка выбрана вручную'
+    )
+    cache_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия карточки'
+    )
 
     class Meta:
         verbose_name = 'Учебный год'
@@ -52,6 +116,7 @@ class YearAlbum(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.cache_version += 1
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -61,11 +126,12 @@ class YearAlbum(models.Model):
     def approved_classes_count(self):
         return self.classes.filter(status='approved').count()
 
-class SchoolClass(models.Model):
+class SchoolClass(ModerationLease):
     STATUS_CHOICES = [
         ('pending', 'На модерации'),
         ('approved', 'Одобрено'),
         ('rejected', 'Отклонено'),
+        ('deleted', 'Удаляется'),
     ]
 
     class_name = models.CharField(max_length=50, verbose_name='Название класса')
@@ -90,6 +156,29 @@ class SchoolClass(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания'
     )
+    cover_photo = models.ForeignKey(
+        'Photo',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Обложка'
+    )
+    cover_thumbnail = models.ImageField(
+        upload_to='covers/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра обложки'
+    )
+    cover_is_manual = models.BooleanField(
+        default=False,
+        verbose_name='Обложка выбрана вручную'
+    )
+    cache_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия карточки'
+    )
 
     class Meta:
         verbose_name = 'Класс'
@@ -117,7 +206,10 @@ class SchoolClass(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.cache_version += 1
         super().save(*args, **kwargs)
+        # Карточка года показывает число классов
+        bump_cache_version(YearAlbum, self.year_album_id)
 
     def __str__(self):
         return f"{self.class_name} ({self.year_album.year})"
@@ -126,11 +218,12 @@ class SchoolClass(models.Model):
     def approved_events_count(self):
         return self.events.filter(status='approved').count()
 
-class EventAlbum(models.Model):
+class EventAlbum(ModerationLease):
     STATUS_CHOICES = [
         ('pending', 'На модерации'),
         ('approved', 'Одобрено'),
         ('rejected', 'Отклонено'),
+        ('deleted', 'Удаляется'),
     ]
 
     title = models.CharField(
@@ -158,6 +251,29 @@ class EventAlbum(models.Model):
         auto_now_add=True,
         verbose_name='Дата создания'
     )
+    cover_photo = models.ForeignKey(
+        'Photo',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Обложка'
+    )
+    cover_thumbnail = models.ImageField(
+        upload_to='covers/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра обложки'
+    )
+    cover_is_manual = models.BooleanField(
+        default=False,
+        verbose_name='Обложка выбрана вручную'
+    )
+    cache_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия карточки'
+    )
 
     class Meta:
         verbose_name = 'Событие'
@@ -185,7 +301,10 @@ class EventAlbum(models.Model):
 
     def save(self, *args, **kwargs):
         self.clean()
+        self.cache_version += 1
         super().save(*args, **kwargs)
+        # Карточка класса показывает число событий
+        bump_cache_version(SchoolClass, self.school_class_id)
 
     def __str__(self):
         return self.title
@@ -194,7 +313,7 @@ class EventAlbum(models.Model):
     def approved_photos_count(self):
         return self.photos.filter(status='approved').count()
 
-class Photo(models.Model):
+class Photo(ModerationLease):
     STATUS_CHOICES = [
         ('pending', 'На модерации'),
         ('approved', 'Одобрено'),
@@ -207,8 +326,13 @@ class Photo(models.Model):
         related_name='photos',
         verbose_name='Событие'
     )
+    # Имя файла - хэш содержимого (см. storage.photo_storage), одинаковые
+    # загрузки делят один файл; индекс нужен, чтобы при удалении быстро
+    # проверить, ссылается ли на файл кто-то ещё
     image = models.ImageField(
         upload_to='photos/',
+        storage=photo_storage,
+        db_index=True,
         verbose_name='Фотография'
     )
     status = models.CharField(
@@ -226,11 +350,78 @@ class Photo(models.Model):
         auto_now_add=True,
         verbose_name='Дата загрузки'
     )
+    # Метаданные извлекаются из EXIF один раз при загрузке.
+    # Если камера не записала время съёмки, используется время загрузки
+    taken_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата съёмки'
+    )
+    has_exif_time = models.BooleanField(
+        default=False,
+        verbose_name='Время съёмки из EXIF'
+    )
+    orientation = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='Ориентация EXIF'
+    )
+    camera_make = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Производитель камеры'
+    )
+    camera_model = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Модель камеры'
+    )
+    width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Ширина'
+    )
+    height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Высота'
+    )
+    thumbnail = models.ImageField(
+        upload_to='thumbnails/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра'
+    )
+    file_size = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Размер файла, байт'
+    )
+    # Путь к нетронутому оригиналу в ARCHIVE_ORIGINALS_ROOT, если он сохранялся
+    original_name = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Оригинал в холодном хранилище'
+    )
 
     class Meta:
         verbose_name = 'Фотография'
         verbose_name_plural = 'Фотографии'
         ordering = ['uploaded_at']
+        indexes = [
+            models.Index(
+                fields=['event_album', 'status', 'taken_at'],
+                name='photo_gallery_idx'
+            ),
+            # Выборка свободных объектов для очереди модерации
+            models.Index(
+                fields=['status', 'claim_expires_at'],
+                name='photo_moderation_idx'
+            ),
+            # Лента архива: одобренные фото в диапазоне дат съёмки
+            models.Index(
+                fields=['status', 'taken_at'],
+                name='photo_timeline_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Фото {self.id} - {self.event_album.title}"
@@ -241,4 +432,113 @@ class Photo(models.Model):
 
     @property
     def is_pending(self):
-        return self.status == 'pending'
\ No newline at end of file
+        return self.status == 'pending'
+
+    def apply_metadata(self, metadata):
+        self.has_exif_time = metadata['taken_at'] is not None
+        if self.has_exif_time:
+            self.taken_at = metadata['taken_at']
+        self.orientation = metadata['orientation']
+        self.camera_make = metadata['camera_make']
+        self.camera_model = metadata['camera_model']
+        self.width = metadata['width']
+        self.height = metadata['height']
+
+class ActivityEvent(models.Model):
+    """Запись журнала действий. Журнал только пополняется: записи не
+    меняются и переживают удаление объекта, о котором рассказывают."""
+
+    ACTION_CHOICES = [
+        ('create', 'Создание'),
+        ('upload', 'Загрузка'),
+        ('approve', 'Одобрение'),
+        ('reject', 'Отклонение'),
+        ('delete', 'Удаление'),
+    ]
+    OBJECT_CHOICES = [
+        ('year', 'Учебный год'),
+        ('class', 'Класс'),
+        ('event', 'Событие'),
+        ('photo', 'Фотография'),
+    ]
+
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name='Действие')
+    object_type = models.CharField(max_length=10, choices=OBJECT_CHOICES, verbose_name='Тип объекта')
+    # Без внешнего ключа: запись остаётся и после удаления объекта
+    object_id = models.PositiveBigIntegerField(verbose_name='ID объекта')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Время')
+
+    class Meta:
+        verbose_name = 'Действие'
+        verbose_name_plural = 'Журнал действий'
+        indexes = [
+            models.Index(fields=['actor', 'created_at'], name='activity_actor_idx'),
+            models.Index(fields=['object_type', 'object_id', 'created_at'], name='activity_object_idx'),
+            models.Index(fields=['created_at'], name='activity_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_action_display()} {self.object_type} #{self.object_id}'
+
+
+class ActivityDaily(models.Model):
+    """Число действий за день по пользователю, действию и типу объекта.
+    Пополняется вместе с журналом (activity.write)."""
+
+    day = models.DateField(verbose_name='День')
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    action = models.CharField(max_length=10, choices=ActivityEvent.ACTION_CHOICES, verbose_name='Действие')
+    object_type = models.CharField(max_length=10, choices=ActivityEvent.OBJECT_CHOICES, verbose_name='Тип объекта')
+    count = models.PositiveIntegerField(default=0, verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Действия за день'
+        verbose_name_plural = 'Действия по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'actor', 'action', 'object_type'],
+                name='activity_daily_unique'
+            ),
+        ]
+
+
+class StatsRollup(models.Model):
+    """Готовый итог для статистики архива (см. stats.py): одобренные фото
+    и их объём по году, событию и загрузившему, очередь модерации и время
+    ожидания решения по типам объектов."""
+
+    KIND_CHOICES = [
+        ('year', 'Учебный год'),
+        ('event', 'Событие'),
+        ('uploader', 'Пользователь'),
+        ('pending', 'На модерации'),
+        ('latency', 'Время модерации'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='Вид')
+    # id года, события или пользователя; для pending и latency - номер типа объекта
+    key = models.PositiveBigIntegerField(verbose_name='Ключ')
+    label = models.CharField(max_length=255, blank=True, verbose_name='Название')
+    count = models.BigIntegerField(default=0, verbose_name='Количество')
+    bytes = models.BigIntegerField(default=0, verbose_name='Объём, байт')
+    seconds = models.FloatField(default=0, verbose_name='Секунд всего')
+
+    class Meta:
+        verbose_name = 'Итог статистики'
+        verbose_name_plural = 'Итоги статистики'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='stats_rollup_unique'),
+        ]
@@ -0,0 +1,236 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import activity, covers, stats, timeline
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo, bump_cache_version
+
+# Очередь модерации. Модератор берёт пачку объектов на ограниченное время
+# (аренду), и пока аренда не истекла, эти объекты не выдаются другим.
+# Захват - один UPDATE ... WHERE с повторной проверкой свободности, поэтому
+# два модератора, пришедшие одновременно, получают непересекающиеся пачки.
+# Решения применяются пачкой: один UPDATE на тип объекта и действие, причём
+# только для объектов, которые всё ещё арендованы этим модератором.
+# Истёкшие аренды сами возвращаются в очередь: claim считает их свободными,
+# а release_expired просто подчищает поля.
+
+MODELS = {
+    'year': YearAlbum,
+    'class': SchoolClass,
+    'event': EventAlbum,
+    'photo': Photo,
+}
+
+# Родительский альбом, чья карточка и обложка зависят от объекта
+PARENTS = {
+    'year': (None, None, None),
+    'class': ('year_album_id', YearAlbum, covers.schedule_year_refresh),
+    'event': ('school_class_id', SchoolClass, covers.schedule_class_refresh),
+    'photo': ('event_album_id', EventAlbum, covers.schedule_event_refresh),
+}
+
+ACTIONS = {
+    'approve': 'approved',
+    'reject': 'rejected',
+}
+
+MAX_BATCH = 100
+
+
+def lease_seconds():
+    return getattr(settings, 'ARCHIVE_MODERATION_LEASE_SECONDS', 300)
+
+
+def _available(now):
+    return Q(claimed_by__isnull=True) | Q(claim_expires_at__lt=now)
+
+
+def _held_by(user, now):
+    return Q(claimed_by=user, claim_expires_at__gte=now)
+
+
+def pending(model):
+    qs = model.objects.filter(status='pending')
+    if model is Photo:
+        # Фото удаляемых событий ждут фоновой очистки, модерировать их незачем
+        qs = qs.exclude(event_album__status='deleted')
+    return qs
+
+
+def visible_to(user):
+    """Объекты, которые user может модерировать прямо сейчас."""
+    return _available(timezone.now()) | Q(claimed_by=user)
+
+
+def claim(user, object_type, limit, lease=None):
+    """Выдаёт модератору до limit объектов на модерацию.
+
+    Уже взятые и не истёкшие объекты засчитываются в пачку, добирается
+    только недостающее. Возвращает queryset объектов модератора и время
+    окончания аренды."""
+    model = MODELS[object_type]
+    limit = max(1, min(limit, MAX_BATCH))
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=lease or lease_seconds())
+    queue = pending(model)
+
+    held = queue.filter(_held_by(user, now))
+    # Продлеваем аренду уже взятого, чтобы вся пачка истекала одновременно
+    held_count = held.update(claim_expires_at=expires_at)
+    if held_count < limit:
+        candidates = queue.filter(_available(now)).order_by('id').values('id')[:limit - held_count]
+        # Условие свободности повторяется во внешнем WHERE: строку, которую
+        # успел захватить другой модератор, этот UPDATE уже не тронет
+        queue.filter(_available(now), id__in=candidates).update(
+            claimed_by=user, claim_expires_at=expires_at
+        )
+    return queue.filter(_held_by(user, now)).order_by('id'), expires_at
+
+
+def release(user, object_type=None):
+    """Возвращает в очередь всё, что взял модератор."""
+    types = [object_type] if object_type else MODELS
+    released = 0
+    for name in types:
+        released += MODELS[name].objects.filter(claimed_by=user).update(
+            claimed_by=None, claim_expires_at=None
+        )
+    return released
+
+
+def release_expired():
+    now = timezone.now()
+    released = 0
+    for model in MODELS.values():
+        released += model.objects.filter(claim_expires_at__lt=now).update(
+            claimed_by=None, claim_expires_at=None
+        )
+    return released
+
+
+def _updates(model, status):
+    updates = {'status': status, 'claimed_by': None, 'claim_expires_at': None}
+    if model is not Photo:
+        updates['cache_version'] = F('cache_version') + 1
+    return updates
+
+
+def _decided(user, object_type, status, applied, parent_ids, now):
+    """Последствия решения: журнал, итоги, лента и карточки родителей."""
+    activity.record(user, 'approve' if status == 'approved' else 'reject', object_type, applied)
+    stats.decided(object_type, status, applied, now)
+    timeline.decided(object_type, status, applied)
+    _, parent_model, schedule_refresh = PARENTS[object_type]
+    for parent_id in parent_ids:
+        bump_cache_version(parent_model, parent_id)
+        schedule_refresh(parent_id)
+
+
+def _apply(user, object_type, status, ids, now):
+    """Применяет решение к объектам, которые всё ещё арендованы user.
+
+    Возвращает (применённые id, {id: ошибка})."""
+    model = MODELS[object_type]
+    parent_field = PARENTS[object_type][0]
+    values = ['id', parent_field] if parent_field else ['id']
+    rows = list(
+        model.objects.filter(_held_by(user, now), id__in=ids, status='pending')
+        .select_for_update().values_list(*values)
+    )
+    held_ids = [row[0] for row in rows]
+    updates = _updates(model, status)
+
+    errors = {}
+    try:
+        with transaction.atomic():
+            model.objects.filter(id__in=held_ids).update(**updates)
+        applied = held_ids
+    except IntegrityError:
+        # Одобрение дубликата (год, класс или событие с тем же названием)
+        # нарушает уникальность - разбираем пачку поштучно
+        applied = []
+        for pk in held_ids:
+            try:
+                with transaction.atomic():
+                    model.objects.filter(id=pk).update(**updates)
+                applied.append(pk)
+            except IntegrityError:
+                errors[pk] = 'Такой объект уже одобрен'
+
+    applied_set = set(applied)
+    parent_ids = {row[1] for row in rows if row[0] in applied_set} if parent_field else set()
+    _decided(user, object_type, status, applied, parent_ids, now)
+    return applied, errors
+
+
+def decide_one(user, object_type, object_id, status):
+    """Решение по одному объекту со страницы модерации, без аренды.
+
+    Объект должен быть на модерации и не взят другим модератором; это
+    проверяет сам UPDATE, поэтому из одновременных решений применяется
+    одно, и только оно пишется в журнал и итоги. UPDATE не трогает
+    остальные поля, например обложку, которую пишет фоновая задача.
+    Возвращает None или текст ошибки."""
+    model = MODELS[object_type]
+    parent_field = PARENTS[object_type][0]
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            updated = model.objects.filter(
+                visible_to(user), id=object_id, status='pending'
+            ).update(**_updates(model, status))
+            if updated:
+                parent_ids = (
+                    model.objects.filter(id=object_id).values_list(parent_field, flat=True)
+                    if parent_field else []
+                )
+                _decided(user, object_type, status, [object_id], parent_ids, now)
+    except IntegrityError:
+        return 'Такой объект уже одобрен'
+    if updated:
+        return None
+    if model.objects.filter(id=object_id, status='pending').exists():
+        return 'Этот объект сейчас проверяет другой модератор'
+    return 'Этот объект уже обработан другим модератором'
+
+
+def decide(user, decisions):
+    """Применяет пачку решений [(object_type, id, action), ...].
+
+    Решение принимается только по объекту, который модератор взял и чья
+    аренда не истекла; остальные возвращаются с ошибкой, а не применяются
+    повторно. Возвращает список результатов в порядке решений."""
+    now = timezone.now()
+    groups = {}
+    for object_type, object_id, action in decisions:
+        if object_type in MODELS and action in ACTIONS:
+            groups.setdefault((object_type, ACTIONS[action]), []).append(object_id)
+
+    outcome = {}
+    with transaction.atomic():
+        for (object_type, status), ids in groups.items():
+            applied, errors = _apply(user, object_type, status, ids, now)
+            for pk in applied:
+                outcome[object_type, pk, status] = None
+            for pk, error in errors.items():
+                outcome[object_type, pk, status] = error
+
+    results = []
+    for object_type, object_id, action in decisions:
+        if object_type not in MODELS:
+            error = 'Неизвестный тип объекта'
+        elif action not in ACTIONS:
+            error = 'Неизвестное действие'
+        else:
+            error = outcome.get((object_type, object_id, ACTIONS[action]), 'Объект не взят вами или аренда истекла')
+        results.append({
+            'type': object_type,
+            'id': object_id,
+            'action': action,
+            'ok': error is None,
+            'error': error,
+        })
+    return results
@@ -0,0 +1,40 @@
+from django.http import Http404
+
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo
+
+# Проверки прав без загрузки пользователей и связанных объектов.
+# Владелец сравнивается по колонке *_id, которая уже есть в строке:
+# `user == photo.uploaded_by` в шаблоне делает запрос за User на каждую
+# карточку, а `photo.uploaded_by_id == user.pk` - ни одного.
+
+OWNER_FIELDS = {
+    YearAlbum: 'created_by_id',
+    SchoolClass: 'created_by_id',
+    EventAlbum: 'created_by_id',
+    Photo: 'uploaded_by_id',
+}
+
+
+def is_moderator(user):
+    return user.is_authenticated and (user.is_staff or user.is_superuser)
+
+
+def is_owner(user, obj):
+    return user.is_authenticated and getattr(obj, OWNER_FIELDS[type(obj)]) == user.pk
+
+
+def can_delete(user, obj):
+    return is_moderator(user) or is_owner(user, obj)
+
+
+def check_delete(user, queryset, object_id, *fields):
+    """Права на удаление одним запросом по первичному ключу.
+
+    Возвращает (разрешено, строка с полями fields); Http404, если объекта
+    нет в queryset. Сам объект и его связи загружать не нужно."""
+    owner_field = OWNER_FIELDS[queryset.model]
+    row = queryset.filter(pk=object_id).values(owner_field, *fields).first()
+    if row is None:
+        raise Http404('Объект не найден')
+    allowed = is_moderator(user) or (user.is_authenticated and row[owner_field] == user.pk)
+    return allowed, row
@@ -0,0 +1,227 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Профилирование отдельных запросов на живых данных. Включается флагом
+# ARCHIVE_PROFILING_ENABLED; запрос профилируется, если staff добавил к URL
+# ?_profile=1 или если он попал в случайную выборку ARCHIVE_PROFILE_SAMPLE_RATE.
+# Результат - файл pstats (открывается snakeviz, gprof2dot, pstats) и
+# JSON с описанием запроса; хранятся последние ARCHIVE_PROFILE_KEEP штук.
+
+PROFILE_PARAM = '_profile'
+PROFILED_MODULE = 'media_archive.views'
+TOP_FUNCTIONS = 15
+
+# cProfile - один на поток и не допускает вложенного включения; чтобы не
+# мешать соседним запросам, одновременно профилируется только один
+_busy = threading.Lock()
+_name_re = re.compile(r'^[\w.-]+$')
+
+
+def profile_dir():
+    return str(getattr(settings, 'ARCHIVE_PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def _wants_profile(request, user):
+    if PROFILE_PARAM in request.GET:
+        return bool(user and user.is_staff)
+    rate = getattr(settings, 'ARCHIVE_PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def _resolve_view(request):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if match.func.__module__ != PROFILED_MODULE:
+        return None
+    return match
+
+
+class ProfilingMiddleware:
+    """Оборачивает выбранные запросы к представлениям media_archive.views
+    в cProfile. Должен стоять после AuthenticationMiddleware и
+    CsrfViewMiddleware.
+
+    cProfile записывает только поток, в котором включён. Под ASGI
+    синхронное представление выполняется в потоке sync_to_async, поэтому
+    его профилирует process_view: Django вызывает его в том же потоке,
+    и он сам вызывает представление."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'ARCHIVE_PROFILING_ENABLED', False)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _select(self, request, user):
+        if not self.enabled or not _wants_profile(request, user):
+            return None
+        match = _resolve_view(request)
+        if match is None or not _busy.acquire(blocking=False):
+            return None
+        return match
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        user = getattr(request, 'user', None)
+        match = self._select(request, user)
+        if match is None:
+            return self.get_response(request)
+        view = match.view_name
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            _save(profiler, request, user, view, time.perf_counter() - started, response.status_code)
+        finally:
+            _busy.release()
+        return response
+
+    async def __acall__(self, request):
+        # Ленивый request.user в корутине обращается к базе синхронно
+        user = None
+        if self.enabled and hasattr(request, 'auser'):
+            user = await request.auser()
+        match = self._select(request, user)
+        if match is None:
+            return await self.get_response(request)
+        view = match.view_name
+        if not iscoroutinefunction(match.func):
+            request._archive_profile = (view, user)
+            try:
+                return await self.get_response(request)
+            finally:
+                _busy.release()
+        # Для асинхронных представлений профиль включает и работу соседних
+        # корутин в том же цикле событий - учитывайте это при чтении
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+            _save(profiler, request, user, view, time.perf_counter() - started, response.status_code)
+        finally:
+            _busy.release()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Только синхронное представление, выбранное в __acall__
+        selected = request.__dict__.pop('_archive_profile', None)
+        if selected is None:
+            return None
+        view, user = selected
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+        finally:
+            profiler.disable()
+        _save(profiler, request, user, view, time.perf_counter() - started, response.status_code)
+        return response
+
+
+def _save(profiler, request, user, view, duration, status):
+    directory = profile_dir()
+    name = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{view}"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, name + '.prof'))
+        with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as output:
+            json.dump({
+                'view': view,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': status,
+                'duration_ms': round(duration * 1000, 1),
+                'user': user.username if user and user.is_authenticated else None,
+                'created_at': timezone.now().isoformat(),
+            }, output, ensure_ascii=False)
+        _rotate(directory)
+    except OSError:
+        logger.exception('Не удалось сохранить профиль %s', name)
+
+
+def _rotate(directory):
+    keep = getattr(settings, 'ARCHIVE_PROFILE_KEEP', 50)
+    names = sorted(
+        (entry.name[:-len('.prof')] for entry in os.scandir(directory) if entry.name.endswith('.prof')),
+        reverse=True,
+    )
+    for name in names[keep:]:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def top_functions(path, limit=TOP_FUNCTIONS):
+    """Самые дорогие функции профиля по суммарному времени (cumtime)."""
+    stats = pstats.Stats(path, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f'{function} ({os.path.basename(filename)}:{line})',
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 2),
+            'cumtime_ms': round(cumtime * 1000, 2),
+        })
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def recent_profiles(limit=20):
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        (entry.name[:-len('.prof')] for entry in os.scandir(directory) if entry.name.endswith('.prof')),
+        reverse=True,
+    )[:limit]
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name + '.json'), encoding='utf-8') as source:
+                info = json.load(source)
+        except (OSError, ValueError):
+            info = {}
+        info['name'] = name
+        profiles.append(info)
+    return profiles
+
+
+def profile_path(name):
+    """Путь к файлу профиля по имени из списка; None для чужих имён."""
+    if not _name_re.match(name):
+        return None
+    path = os.path.join(profile_dir(), name + '.prof')
+    return path if os.path.isfile(path) else None
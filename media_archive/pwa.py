@@ -0,0 +1,92 @@
+import functools
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.templatetags.static import static
+from django.urls import reverse
+
+from . import assets
+
+# Сайт как PWA: манифест и сервис-воркер /sw.js (шаблон
+# templates/media_archive/sw.js). Воркер:
+# - при установке кладёт в кэш оболочку - страницу «нет сети» и статику
+#   из SHELL_STATIC; имена статики с хэшем, поэтому новая сборка меняет
+#   версию кэша, а старый удаляется при активации;
+# - миниатюры, обложки и открытые фото берёт из кэша, а при промахе
+#   скачивает и кладёт туда; имена файлов не меняются при изменении
+#   содержимого, поэтому перепроверять их не нужно. Размер кэша ограничен
+#   ARCHIVE_OFFLINE_IMAGE_CACHE_MB, вытесняются давно открытые (учёт в
+#   IndexedDB);
+# - страницы альбомов запрашивает из сети, а если сеть не ответила за
+#   ARCHIVE_OFFLINE_PAGE_TIMEOUT_MS или её нет, показывает сохранённую
+#   копию (последние ARCHIVE_OFFLINE_PAGES страниц);
+# - JSON галереи события перепроверяет по ETag: без изменений сервер
+#   отвечает 304 без тела.
+
+SHELL_STATIC = (
+    'media_archive/css/base.css',
+    'media_archive/css/home.css',
+    'media_archive/css/year_detail.css',
+    'media_archive/css/class_detail.css',
+    'media_archive/css/event_detail.css',
+    'media_archive/js/base.js',
+    'media_archive/js/event_detail.js',
+    'media_archive/js/home.js',
+    'media_archive/js/pwa.js',
+    'media_archive/img/icon.svg',
+)
+
+# Страницы, копии которых доступны без сети; у *_detail в адресе id
+OFFLINE_PAGES = ('home', 'timeline', 'year_detail', 'class_detail', 'event_detail')
+SAMPLE_ID = 987654321
+
+
+def _url_pattern(name):
+    """Регулярное выражение для JavaScript, под которое подходит адрес name."""
+    args = [SAMPLE_ID] if name.endswith(('_detail', '_photos')) else []
+    return '^' + re.escape(reverse(name, args=args)).replace(str(SAMPLE_ID), r'\d+') + '$'
+
+
+def _shell_static():
+    names = [*SHELL_STATIC, assets.FONTS_CSS]
+    if assets.vendored():
+        names.extend(f'{assets.VENDOR_DIR}/{name}' for name in assets.photoswipe_names())
+    return [static(name) for name in names]
+
+
+@functools.cache
+def worker_config():
+    """Настройки воркера; версия меняется вместе с оболочкой и настройками."""
+    config = {
+        'shell': [reverse('offline'), *_shell_static()],
+        'offline': reverse('offline'),
+        'static': settings.STATIC_URL,
+        'media': settings.MEDIA_URL,
+        'pages': [_url_pattern(name) for name in OFFLINE_PAGES],
+        'gallery': _url_pattern('api_event_photos'),
+        'imageBytes': getattr(settings, 'ARCHIVE_OFFLINE_IMAGE_CACHE_MB', 150) * 1024 * 1024,
+        'pageLimit': getattr(settings, 'ARCHIVE_OFFLINE_PAGES', 60),
+        'pageTimeout': getattr(settings, 'ARCHIVE_OFFLINE_PAGE_TIMEOUT_MS', 2500),
+    }
+    config['version'] = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+    return config
+
+
+def manifest():
+    icon = static('media_archive/img/icon.svg')
+    return {
+        'name': 'Фотоархив школы №2086',
+        'short_name': 'Фотоархив',
+        'lang': 'ru',
+        'start_url': reverse('home'),
+        'scope': '/',
+        'display': 'standalone',
+        'background_color': '#ffffff',
+        'theme_color': '#cb5603',
+        'icons': [
+            {'src': icon, 'sizes': 'any', 'type': 'image/svg+xml', 'purpose': 'any'},
+            {'src': icon, 'sizes': 'any', 'type': 'image/svg+xml', 'purpose': 'maskable'},
+        ],
+    }
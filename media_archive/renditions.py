@@ -0,0 +1,36 @@
+import logging
+
+from . import tasks
+from .imaging import THUMBNAIL_SIZE, make_thumbnail
+from .models import EventAlbum, Photo, bump_cache_version
+
+logger = logging.getLogger(__name__)
+
+
+def build_thumbnail(photo_id):
+    photo = Photo.objects.filter(pk=photo_id).only('image', 'thumbnail', 'event_album_id').first()
+    if photo is None or not photo.image:
+        return
+    try:
+        rendition = make_thumbnail(photo.image, THUMBNAIL_SIZE, crop=False)
+    except (OSError, ValueError):
+        logger.exception('Не удалось построить миниатюру для фото #%s', photo_id)
+        return
+    field = photo._meta.get_field('thumbnail')
+    name = field.storage.save(field.generate_filename(photo, f'{photo_id}.jpg'), rendition)
+    old_thumbnail = photo.thumbnail.name
+    Photo.objects.filter(pk=photo_id).update(thumbnail=name)
+    # Галерея события отдаёт адреса миниатюр (ETag по cache_version)
+    bump_cache_version(EventAlbum, photo.event_album_id)
+    if old_thumbnail and old_thumbnail != name:
+        photo.thumbnail.storage.delete(old_thumbnail)
+
+
+def build_thumbnails(photo_ids):
+    for photo_id in photo_ids:
+        build_thumbnail(photo_id)
+
+
+def schedule_thumbnails(photo_ids):
+    if photo_ids:
+        tasks.enqueue(build_thumbnails, tuple(photo_ids))
@@ -0,0 +1,235 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.files.storage import default_storage
+from django.db.models import Count, Q
+
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo
+from .storage import photo_storage
+
+# Описание ресурсов API v1 (/api/v1/years/, classes/, events/, photos/).
+# Каждое поле - либо колонка, либо аннотация, либо колонка с преобразованием;
+# в запрос попадает только то, что клиент перечислил в fields=, поэтому
+# счётчики (JOIN + GROUP BY) считаются, только когда их действительно просят.
+# Вложенные ресурсы из include= загружаются одним запросом на уровень
+# (WHERE parent_id IN (...)), независимо от размера страницы.
+
+MAX_PAGE_SIZE = 200
+DEFAULT_PAGE_SIZE = 50
+
+
+class ApiError(Exception):
+    pass
+
+
+def _cover_url(name):
+    return default_storage.url(name) if name else None
+
+
+def _photo_url(name):
+    return photo_storage().url(name) if name else None
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+class Resource:
+    def __init__(self, name, model, fields, ordering, parent_field=None, children=None, ancestors=()):
+        self.name = name
+        self.model = model
+        # имя в API -> колонка | (колонка, преобразование) | аннотация
+        self.fields = fields
+        # Ключ сортировки для keyset-пагинации; последним всегда идёт id
+        self.ordering = ordering
+        self.parent_field = parent_field
+        # имя вложения в include= -> имя дочернего ресурса
+        self.children = children or {}
+        # Связи с альбомами выше по иерархии: объект виден в API, только
+        # если одобрены и они - иначе через API видны фото удаляемых или
+        # отклонённых событий
+        self.ancestors = ancestors
+
+    def queryset(self):
+        return self.model.objects.filter(
+            status='approved', **{f'{ancestor}__status': 'approved' for ancestor in self.ancestors}
+        )
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Неизвестные поля {self.name}: {', '.join(unknown)}")
+        return names
+
+    def select(self, queryset, names, extra=()):
+        """values() только с нужными колонками и аннотациями."""
+        columns = {'id'} | set(extra)
+        annotations = {}
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, str):
+                columns.add(spec)
+            elif isinstance(spec, tuple):
+                columns.add(spec[0])
+            else:
+                annotations[name] = spec
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.values(*columns, *annotations)
+
+    def render(self, row, names):
+        item = {}
+        for name in names:
+            spec = self.fields[name]
+            if isinstance(spec, str):
+                item[name] = row[spec]
+            elif isinstance(spec, tuple):
+                item[name] = spec[1](row[spec[0]])
+            else:
+                item[name] = row[name]
+        return item
+
+    def order(self, queryset):
+        return queryset.order_by(*self.ordering, 'id' if not self.ordering[0].startswith('-') else '-id')
+
+    def encode_cursor(self, row):
+        values = [_cursor_value(row[field.lstrip('-')]) for field in self.ordering] + [row['id']]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def after_cursor(self, queryset, cursor):
+        """Строки строго после курсора в порядке self.ordering."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            *keys, last_id = values
+            if len(keys) != len(self.ordering):
+                raise ValueError
+            keys = [
+                self._parse_key(field.lstrip('-'), value)
+                for field, value in zip(self.ordering, keys)
+            ]
+        except (ValueError, TypeError):
+            raise ApiError('Неверный курсор')
+        descending = self.ordering[0].startswith('-')
+        op = 'lt' if descending else 'gt'
+        fields = [field.lstrip('-') for field in self.ordering] + ['id']
+        keys.append(int(last_id))
+        # (a, b, id) > (x, y, z) раскрывается в a > x OR (a = x AND b > y) OR ...
+        condition = Q()
+        for index, field in enumerate(fields):
+            equal = {fields[i]: keys[i] for i in range(index)}
+            condition |= Q(**equal, **{f'{field}__{op}': keys[index]})
+        return queryset.filter(condition)
+
+    def _parse_key(self, field, value):
+        if self.model._meta.get_field(field).get_internal_type() == 'DateTimeField':
+            return datetime.fromisoformat(value)
+        return value
+
+
+def _cursor_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+RESOURCES = {
+    'year': Resource(
+        'year', YearAlbum,
+        {
+            'id': 'id',
+            'year': 'year',
+            'cover_url': ('cover_thumbnail', _cover_url),
+            'classes_count': Count('classes', filter=Q(classes__status='approved')),
+        },
+        ordering=['-year'],
+        children={'classes': 'class'},
+    ),
+    'class': Resource(
+        'class', SchoolClass,
+        {
+            'id': 'id',
+            'class_name': 'class_name',
+            'year_id': 'year_album_id',
+            'cover_url': ('cover_thumbnail', _cover_url),
+            'events_count': Count('events', filter=Q(events__status='approved')),
+        },
+        ordering=['class_name'],
+        parent_field='year_album_id',
+        children={'events': 'event'},
+        ancestors=('year_album',),
+    ),
+    'event': Resource(
+        'event', EventAlbum,
+        {
+            'id': 'id',
+            'title': 'title',
+            'class_id': 'school_class_id',
+            'created_at': ('created_at', _isoformat),
+            'cover_url': ('cover_thumbnail', _cover_url),
+            'photos_count': Count('photos', filter=Q(photos__status='approved')),
+        },
+        ordering=['created_at'],
+        parent_field='school_class_id',
+        children={'photos': 'photo'},
+        ancestors=('school_class', 'school_class__year_album'),
+    ),
+    'photo': Resource(
+        'photo', Photo,
+        {
+            'id': 'id',
+            'event_id': 'event_album_id',
+            'url': ('image', _photo_url),
+            'thumbnail_url': ('thumbnail', _cover_url),
+            'width': 'width',
+            'height': 'height',
+            'taken_at': ('taken_at', _isoformat),
+            'uploaded_at': ('uploaded_at', _isoformat),
+            'camera_make': 'camera_make',
+            'camera_model': 'camera_model',
+        },
+        ordering=['taken_at'],
+        parent_field='event_album_id',
+        ancestors=('event_album', 'event_album__school_class', 'event_album__school_class__year_album'),
+    ),
+}
+
+
+def parse_includes(resource, value):
+    """'classes.events,classes' -> {'classes': {'events': {}}}"""
+    tree = {}
+    for path in filter(None, (part.strip() for part in (value or '').split(','))):
+        node, current = tree, resource
+        for segment in path.split('.'):
+            if segment not in current.children:
+                raise ApiError(f'{current.name} не содержит {segment}')
+            node = node.setdefault(segment, {})
+            current = RESOURCES[current.children[segment]]
+    return tree
+
+
+def requested_fields(request, resource):
+    """fields= для основного ресурса, fields[<ресурс>]= для вложенных."""
+    return resource.parse_fields(request.GET.get(f'fields[{resource.name}]') or request.GET.get('fields'))
+
+
+async def embed(request, resource, items, rows, tree):
+    """Добавляет в items вложенные ресурсы из дерева include."""
+    parent_ids = [row['id'] for row in rows]
+    for key, subtree in tree.items():
+        child = RESOURCES[resource.children[key]]
+        names = child.parse_fields(request.GET.get(f'fields[{child.name}]'))
+        queryset = child.order(child.select(
+            child.queryset().filter(**{f'{child.parent_field}__in': parent_ids}),
+            names, extra=[child.parent_field],
+        ))
+        child_rows = [row async for row in queryset]
+        child_items = [child.render(row, names) for row in child_rows]
+        if subtree:
+            await embed(request, child, child_items, child_rows, subtree)
+        grouped = {parent_id: [] for parent_id in parent_ids}
+        for row, item in zip(child_rows, child_items):
+            grouped[row[child.parent_field]].append(item)
+        for row, item in zip(rows, items):
+            item[key] = grouped[row['id']]
@@ -0,0 +1,85 @@
+document.addEventListener('DOMContentLoaded', function() {
+    setTimeout(function() {
+        const alerts = document.querySelectorAll('.alert');
+        alerts.forEach(function(alert) {
+            alert.style.opacity = '0';
+            alert.style.transition = 'opacity 0.5s';
+            setTimeout(function() {
+                alert.remove();
+            }, 500);
+        });
+    }, 5000);
+
+    const modal = document.getElementById('confirmationModal');
+    const modalConfirm = document.getElementById('modalConfirm');
+    const modalCancel = document.getElementById('modalCancel');
+
+    modalCancel.addEventListener('click', function() {
+        modal.style.display = 'none';
+    });
+
+    modal.addEventListener('click', function(e) {
+        if (e.target === modal) {
+            modal.style.display = 'none';
+        }
+    });
+
+    document.addEventListener('keydown', function(e) {
+        if (e.key === 'Escape' && modal.style.display === 'flex') {
+            modal.style.display = 'none';
+        }
+    });
+
+    const cards = document.querySelectorAll('.year-card, .class-card, .event-card, .photo-thumbnail');
+
+    cards.forEach(function(card) {
+        card.addEventListener('mouseenter', function() {
+            if (card.classList.contains('year-card') || card.classList.contains('class-card') || card.classList.contains('event-card')) {
+                this.style.transform = 'translateY(-5px)';
+                this.style.boxShadow = '0 8px 20px rgba(0,0,0,0.15)';
+            } else {
+                this.style.transform = 'translateY(-2px)';
+                this.style.boxShadow = '0 4px 12px rgba(0,0,0,0.15)';
+            }
+
+            var deleteBtn = this.querySelector('.delete-btn');
+            if (deleteBtn) {
+                deleteBtn.style.opacity = '1';
+            }
+        });
+
+        card.addEventListener('mouseleave', function() {
+            if (card.classList.contains('year-card') || card.classList.contains('class-card') || card.classList.contains('event-card')) {
+                this.style.transform = 'translateY(0)';
+                this.style.boxShadow = '0 4px 15px rgba(0,0,0,0.08)';
+            } else {
+                this.style.transform = 'translateY(0)';
+                this.style.boxShadow = '0 2px 8px rgba(0,0,0,0.1)';
+            }
+
+            var deleteBtn = this.querySelector('.delete-btn');
+            if (deleteBtn) {
+                deleteBtn.style.opacity = '0';
+            }
+        });
+    });
+});
+
+function showConfirmationModal(title, message, icon, onConfirm) {
+    const modal = document.getElementById('confirmationModal');
+    const modalTitle = document.getElementById('modalTitle');
+    const modalMessage = document.getElementById('modalMessage');
+    const modalIcon = document.getElementById('modalIcon');
+    const modalConfirm = document.getElementById('modalConfirm');
+
+    modalTitle.textContent = title;
+    modalMessage.textContent = message;
+    modalIcon.textContent = icon;
+
+    modalConfirm.onclick = function() {
+        modal.style.display = 'none';
+        if (onConfirm) onConfirm();
+    };
+
+    modal.style.display = 'flex';
+}
@@ -0,0 +1,59 @@
+// Функция для получения реальных размеров изображения
+function getImageSize(src) {
+    return new Promise(function(resolve, reject) {
+        var img = new Image();
+        img.onload = function() {
+            resolve({
+                width: this.naturalWidth,
+                height: this.naturalHeight
+            });
+        };
+        img.onerror = reject;
+        img.src = src;
+    });
+}
+
+function openPhotoPreview() {
+    var pswpElement = document.querySelectorAll('.pswp')[0];
+
+    var options = {
+        index: 0,
+        bgOpacity: 0.9,
+        showHideOpacity: true,
+        closeOnScroll: false,
+        history: false,
+        shareEl: false,
+        fullscreenEl: true,
+        zoomEl: true,
+        maxSpreadZoom: 3,
+        getDoubleTapZoom: function(isMouseClick, item) {
+            return item.initialZoomLevel < 0.7 ? 1 : 1.5;
+        },
+        imageClickAction: 'zoom',
+        tapToToggleControls: true,
+        pinchToClose: false,
+        addCaptionHTMLFn: function(item, captionEl) {
+            return false;
+        }
+    };
+
+    var gallery = new PhotoSwipe(pswpElement, PhotoSwipeUI_Default, moderationConfirmPhotoSwipeItems, options);
+
+    gallery.listen('gettingData', function(index, item) {
+        if (item.w < 1 || item.h < 1) {
+            getImageSize(item.src).then(function(size) {
+                item.w = size.width;
+                item.h = size.height;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            }).catch(function() {
+                item.w = 1200;
+                item.h = 800;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            });
+        }
+    });
+
+    gallery.init();
+}
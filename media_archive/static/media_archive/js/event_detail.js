@@ -0,0 +1,145 @@
+function openPhotoSwipe(index) {
+    var pswpElement = document.querySelectorAll('.pswp')[0];
+
+    var options = {
+        index: parseInt(index),
+        bgOpacity: 0.9,
+        showHideOpacity: true,
+        closeOnScroll: false,
+        history: false,
+        shareEl: false,
+        fullscreenEl: true,
+        zoomEl: true,
+        maxSpreadZoom: 3,
+        getDoubleTapZoom: function(isMouseClick, item) {
+            return item.initialZoomLevel < 0.7 ? 1 : 1.5;
+        },
+        imageClickAction: 'zoom',
+        tapToToggleControls: true,
+        pinchToClose: false
+    };
+
+    var gallery = new PhotoSwipe(pswpElement, PhotoSwipeUI_Default, photoSwipeItems, options);
+
+    gallery.listen('gettingData', function(index, item) {
+        if (item.w < 1 || item.h < 1) {
+            var img = new Image();
+            img.onload = function() {
+                item.w = this.naturalWidth;
+                item.h = this.naturalHeight;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            };
+            img.onerror = function() {
+                item.w = 1200;
+                item.h = 800;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            };
+            img.src = item.src;
+        }
+    });
+
+    gallery.listen('afterInit', function() {
+        document.addEventListener('keydown', function(e) {
+            if (e.key === 'd' || e.key === 'D') {
+                e.preventDefault();
+                downloadCurrentImage(gallery);
+            }
+        });
+    });
+
+    gallery.init();
+}
+
+function downloadCurrentImage(gallery) {
+    if (!gallery) return;
+
+    var item = gallery.currItem;
+    var currentIndex = gallery.getCurrentIndex();
+    var link = document.createElement('a');
+    link.href = item.src;
+    link.download = 'photo_' + (currentIndex + 1) + '.jpg';
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+
+    showDownloadNotification(gallery);
+}
+
+function showDownloadNotification(gallery) {
+    var counterEl = gallery.ui.element.querySelector('.pswp__counter');
+    if (counterEl) {
+        var originalText = counterEl.textContent;
+        counterEl.textContent = 'Скачивание...';
+        counterEl.style.color = '#4CAF50';
+
+        setTimeout(function() {
+            counterEl.textContent = originalText;
+            counterEl.style.color = '';
+        }, 800);
+    }
+}
+
+// Обработчики для миниатюр
+document.addEventListener('DOMContentLoaded', function() {
+    var thumbnails = document.querySelectorAll('.photo-thumbnail');
+    thumbnails.forEach(function(thumb) {
+        thumb.addEventListener('mouseenter', function() {
+            this.style.transform = 'translateY(-5px)';
+            this.style.boxShadow = '0 8px 20px rgba(0,0,0,0.15)';
+            this.style.background = '#fff !important';
+
+            var deleteBtn = this.querySelector('.delete-btn');
+            if (deleteBtn) {
+                deleteBtn.style.opacity = '1';
+            }
+        });
+
+        thumb.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(0)';
+            this.style.boxShadow = '0 4px 6px rgba(0,0,0,0.05)';
+            this.style.background = '#f8f9fa !important';
+
+            var deleteBtn = this.querySelector('.delete-btn');
+            if (deleteBtn) {
+                deleteBtn.style.opacity = '0';
+            }
+        });
+    });
+
+    var addPhotoCard = document.querySelector('.add-photo-card');
+    if (addPhotoCard) {
+        addPhotoCard.addEventListener('mouseenter', function() {
+            this.style.transform = 'translateY(-5px)';
+            this.style.boxShadow = '0 8px 20px rgba(0,0,0,0.15)';
+            this.style.background = '#fff !important';
+        });
+
+        addPhotoCard.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(0)';
+            this.style.boxShadow = '0 4px 6px rgba(0,0,0,0.05)';
+            this.style.background = '#f8f9fa !important';
+        });
+    }
+});
+
+// Страница могла прийти из кэша сервис-воркера: сверяем её с галереей
+// события (сервер отвечает 304, если ничего не менялось)
+document.addEventListener('DOMContentLoaded', function() {
+    var notice = document.getElementById('galleryUpdated');
+    if (!notice || !navigator.onLine) return;
+
+    fetch(notice.dataset.galleryUrl, {credentials: 'same-origin'})
+        .then(function(response) {
+            return response.ok ? response.json() : null;
+        })
+        .then(function(data) {
+            if (!data) return;
+            var ids = data.photos.map(function(photo) { return photo.id; }).join(',');
+            if (ids !== notice.dataset.photoIds) {
+                notice.style.display = 'block';
+            }
+        })
+        .catch(function() {});
+});
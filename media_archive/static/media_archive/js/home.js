@@ -0,0 +1,195 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const searchInput = document.getElementById('searchInput');
+    const searchButton = document.getElementById('searchButton');
+    const yearsContainer = document.getElementById('yearsContainer');
+    const loadingIndicator = document.getElementById('loadingIndicator');
+    const noResults = document.getElementById('noResults');
+    // Адрес создания года есть только у вошедших пользователей
+    const createYearUrl = yearsContainer.dataset.createYearUrl;
+
+    function performSearch() {
+        const searchTerm = searchInput.value.trim();
+
+        if (searchTerm === '') {
+            location.reload();
+            return;
+        }
+
+        loadingIndicator.style.display = 'block';
+
+        fetch(`/search/?q=${encodeURIComponent(searchTerm)}`, {
+            headers: {
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+        })
+        .then(response => response.json())
+        .then(data => {
+            updateSearchResults(data.results);
+        })
+        .catch(error => {
+            console.error('Ошибка поиска:', error);
+            performClientSideSearch(searchTerm);
+        })
+        .finally(() => {
+            loadingIndicator.style.display = 'none';
+        });
+    }
+
+    function updateSearchResults(results) {
+        yearsContainer.innerHTML = '';
+
+        if (results.length === 0) {
+            noResults.style.display = 'block';
+            return;
+        }
+
+        noResults.style.display = 'none';
+
+
+        for (let i = 0; i < results.length; i += 3) {
+            const row = document.createElement('div');
+            row.className = 'years-row';
+
+
+            for (let j = i; j < i + 3 && j < results.length; j++) {
+                const year = results[j];
+                const card = document.createElement('div');
+                card.className = 'year-card highlight';
+                card.setAttribute('data-year', year.year);
+                card.style.cssText = 'position: relative; cursor: pointer; background: #f8f9fa; padding: 50px 30px; border-radius: 8px; text-align: center; transition: all 0.3s ease; border: 1px solid #e0e0e0; width: 30%; box-shadow: 0 4px 6px rgba(0,0,0,0.05);';
+                card.onclick = function() {
+                    window.location.href = `/year/${year.id}/`;
+                };
+                card.innerHTML = `
+                    ${year.cover_url ? `<img class="card-cover" src="${year.cover_url}" alt="" loading="lazy" width="480" height="320">` : ''}
+                    <div class="year-title" style="font-size: 26px; font-weight: 700; color: #000;">${year.year}</div>
+                    <div style="margin-top: 10px; font-size: 14px; color: #666;">
+                        ${year.classes_count || 0} классов
+                    </div>
+                `;
+                row.appendChild(card);
+            }
+
+
+            const remaining = 3 - (results.length - i);
+            for (let k = 0; k < remaining && k < 3; k++) {
+                const emptyCard = document.createElement('div');
+                emptyCard.style.cssText = 'width: 30%; visibility: hidden;';
+                row.appendChild(emptyCard);
+            }
+
+            yearsContainer.appendChild(row);
+
+
+            if (i + 3 < results.length) {
+                const line = document.createElement('div');
+                line.style.cssText = 'position: relative;';
+                line.innerHTML = '<div style="position: absolute; bottom: -20px; left: 5%; width: 90%; height: 2px; background: #cb5603;"></div>';
+                yearsContainer.appendChild(line);
+            }
+        }
+
+        if (createYearUrl && results.length > 0) {
+            const lastRow = yearsContainer.lastElementChild;
+            const cardsInLastRow = lastRow.querySelectorAll('.year-card').length;
+
+            if (cardsInLastRow < 3) {
+
+                const addCard = document.createElement('div');
+                addCard.className = 'add-year-card';
+                addCard.onclick = function() {
+                    window.location.href = createYearUrl;
+                };
+                addCard.innerHTML = `
+                    <div class="add-card-content">
+                        <span class="add-card-icon">+</span>
+                        <span class="add-card-text">Добавить год</span>
+                    </div>
+                `;
+                lastRow.appendChild(addCard);
+
+
+                const remaining = 2 - cardsInLastRow;
+                for (let k = 0; k < remaining; k++) {
+                    const emptyCard = document.createElement('div');
+                    emptyCard.style.cssText = 'width: 30%; visibility: hidden;';
+                    lastRow.appendChild(emptyCard);
+                }
+            } else {
+
+                const addRow = document.createElement('div');
+                addRow.className = 'years-row';
+                addRow.innerHTML = `
+                    <div class="add-year-card" onclick="location.href='${createYearUrl}'">
+                        <div class="add-card-content">
+                            <span class="add-card-icon">+</span>
+                            <span class="add-card-text">Добавить год</span>
+                        </div>
+                    </div>
+                    <div style="width: 30%; visibility: hidden;"></div>
+                    <div style="width: 30%; visibility: hidden;"></div>
+                `;
+                yearsContainer.appendChild(addRow);
+            }
+        }
+    }
+
+    function performClientSideSearch(searchTerm) {
+        const yearCards = document.querySelectorAll('.year-card');
+        const addCards = document.querySelectorAll('.add-year-card');
+        let found = false;
+
+
+        addCards.forEach(card => {
+            card.style.display = 'none';
+        });
+
+        yearCards.forEach(card => {
+            card.classList.remove('highlight');
+            const year = card.getAttribute('data-year');
+
+            if (year.includes(searchTerm)) {
+                card.style.display = 'block';
+                card.classList.add('highlight');
+                found = true;
+            } else {
+                card.style.display = 'none';
+            }
+        });
+
+        if (!found) {
+            noResults.style.display = 'block';
+        } else {
+            noResults.style.display = 'none';
+        }
+    }
+
+    searchButton.addEventListener('click', performSearch);
+
+    searchInput.addEventListener('keyup', function(event) {
+        if (event.key === 'Enter') {
+            performSearch();
+        }
+    });
+
+    document.addEventListener('click', function(event) {
+        if (event.target.closest('.logo') || 
+            (event.target.tagName === 'A' && event.target.getAttribute('href') === '/')) {
+            if (searchInput.value.trim() !== '') {
+                searchInput.value = '';
+                setTimeout(() => {
+                    if (searchInput.value === '') {
+                        location.reload();
+                    }
+                }, 100);
+            }
+        }
+    });
+
+    window.addEventListener('resize', function() {
+        const currentSearch = searchInput.value.trim();
+        if (currentSearch !== '') {
+            performClientSideSearch(currentSearch);
+        }
+    });
+});
@@ -0,0 +1,150 @@
+function getImageSize(src) {
+    return new Promise(function(resolve, reject) {
+        var img = new Image();
+        img.onload = function() {
+            resolve({
+                width: this.naturalWidth,
+                height: this.naturalHeight
+            });
+        };
+        img.onerror = reject;
+        img.src = src;
+    });
+}
+
+
+function openModerationPhoto(index) {
+    var pswpElement = document.querySelectorAll('.pswp')[0];
+
+    var options = {
+        index: parseInt(index),
+        bgOpacity: 0.9,
+        showHideOpacity: true,
+        closeOnScroll: false,
+        history: false,
+        shareEl: false,
+        fullscreenEl: true,
+        zoomEl: true,
+        maxSpreadZoom: 3,
+        getDoubleTapZoom: function(isMouseClick, item) {
+            return item.initialZoomLevel < 0.7 ? 1 : 1.5;
+        },
+        imageClickAction: 'zoom',
+        tapToToggleControls: true,
+        pinchToClose: false,
+
+        addCaptionHTMLFn: function(item, captionEl) {
+            return false; 
+        }
+    };
+
+    var gallery = new PhotoSwipe(pswpElement, PhotoSwipeUI_Default, moderationPhotoSwipeItems, options);
+
+    gallery.listen('gettingData', function(index, item) {
+        if (item.w < 1 || item.h < 1) {
+            getImageSize(item.src).then(function(size) {
+                item.w = size.width;
+                item.h = size.height;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            }).catch(function() {
+                item.w = 1200;
+                item.h = 800;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            });
+        }
+    });
+
+
+    gallery.listen('afterInit', function() {
+        document.addEventListener('keydown', function(e) {
+            if (e.key === 'd' || e.key === 'D') {
+                e.preventDefault();
+                downloadModerationImage(gallery);
+            }
+        });
+    });
+
+
+    gallery.listen('mouseUsed', function() {
+        var frame = gallery.currItem.holder;
+        if (frame) {
+            frame.addEventListener('wheel', function(e) {
+                e.preventDefault();
+                if (e.ctrlKey) {
+                    var delta = e.deltaY > 0 ? -0.2 : 0.2;
+                    var newZoom = Math.max(0.5, Math.min(3, gallery.currItem.initialZoomLevel + delta));
+                    gallery.zoomTo(newZoom, {x: e.clientX, y: e.clientY}, 200);
+                } else {
+                    if (gallery.currItem.initialZoomLevel > 1) {
+                        var currentPanY = gallery.currItem.pan.y;
+                        gallery.currItem.pan.y = currentPanY - e.deltaY * 0.5;
+                        gallery.updateCurrItem();
+                    }
+                }
+            }, { passive: false });
+        }
+    });
+
+    gallery.init();
+}
+
+
+function downloadModerationImage(gallery) {
+    if (!gallery) return;
+
+    var item = gallery.currItem;
+    var currentIndex = gallery.getCurrentIndex();
+    var link = document.createElement('a');
+    link.href = item.src;
+    link.download = 'moderation_photo_' + (currentIndex + 1) + '.jpg';
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+
+    showModerationDownloadNotification(gallery);
+}
+
+
+function showModerationDownloadNotification(gallery) {
+    var counterEl = gallery.ui.element.querySelector('.pswp__counter');
+    if (counterEl) {
+        var originalText = counterEl.textContent;
+        counterEl.textContent = 'Скачивание...';
+        counterEl.style.color = '#4CAF50';
+
+        setTimeout(function() {
+            counterEl.textContent = originalText;
+            counterEl.style.color = '';
+        }, 800);
+    }
+}
+
+
+document.addEventListener('DOMContentLoaded', function() {
+    const approveButtons = document.querySelectorAll('a[href*="approve"]');
+    const rejectButtons = document.querySelectorAll('a[href*="reject"]');
+
+    approveButtons.forEach(button => {
+        button.addEventListener('mouseenter', function() {
+            this.style.transform = 'scale(1.05)';
+            this.style.boxShadow = '0 2px 8px rgba(40, 167, 69, 0.3)';
+        });
+        button.addEventListener('mouseleave', function() {
+            this.style.transform = 'scale(1)';
+            this.style.boxShadow = 'none';
+        });
+    });
+
+    rejectButtons.forEach(button => {
+        button.addEventListener('mouseenter', function() {
+            this.style.transform = 'scale(1.05)';
+            this.style.boxShadow = '0 2px 8px rgba(220, 53, 69, 0.3)';
+        });
+        button.addEventListener('mouseleave', function() {
+            this.style.transform = 'scale(1)';
+            this.style.boxShadow = 'none';
+        });
+    });
+});
@@ -0,0 +1,22 @@
+// Регистрация сервис-воркера (см. media_archive/pwa.py)
+(function() {
+    if (!('serviceWorker' in navigator)) {
+        return;
+    }
+    var body = document.body;
+
+    window.addEventListener('load', function() {
+        navigator.serviceWorker.register(body.dataset.serviceWorker);
+    });
+
+    // После входа или выхода сохранённые страницы показывают чужое меню и
+    // устаревшие формы - просим воркер их забыть
+    var user = body.dataset.user || '';
+    var previous = localStorage.getItem('archive-user');
+    if (previous !== null && previous !== user) {
+        navigator.serviceWorker.ready.then(function(registration) {
+            registration.active.postMessage({type: 'reset-pages'});
+        });
+    }
+    localStorage.setItem('archive-user', user);
+})();
@@ -0,0 +1,178 @@
+let previewPhotoSwipeItems = [];
+
+function previewImages(input) {
+    const previewContainer = document.getElementById('previewContainer');
+    const previewContainerWrapper = document.getElementById('imagesPreview');
+    const fileCount = document.getElementById('fileCount');
+    const countSpan = document.getElementById('count');
+
+    previewContainer.innerHTML = '';
+    previewPhotoSwipeItems = [];
+    
+    if (input.files && input.files.length > 0) {
+        countSpan.textContent = input.files.length;
+        fileCount.style.display = 'block';
+        previewContainerWrapper.style.display = 'block';
+
+        for (let i = 0; i < input.files.length; i++) {
+            const file = input.files[i];
+            const reader = new FileReader();
+
+            reader.onload = function(e) {
+                const previewItem = document.createElement('div');
+                previewItem.style.position = 'relative';
+                previewItem.style.textAlign = 'center';
+                
+                const img = document.createElement('img');
+                img.src = e.target.result;
+                img.style.width = '100%';
+                img.style.height = '80px';
+                img.style.objectFit = 'cover';
+                img.style.borderRadius = '4px';
+                img.style.marginBottom = '5px';
+                img.style.cursor = 'pointer';
+                img.className = 'preview-image';
+                img.onclick = function() {
+                    openPreviewPhoto(i);
+                };
+                
+                const fileName = document.createElement('div');
+                fileName.style.fontSize = '10px';
+                fileName.style.color = '#666';
+                fileName.style.overflow = 'hidden';
+                fileName.style.textOverflow = 'ellipsis';
+                fileName.style.whiteSpace = 'nowrap';
+                fileName.textContent = `Фото ${i + 1}`;
+                
+                previewItem.appendChild(img);
+                previewItem.appendChild(fileName);
+                previewContainer.appendChild(previewItem);
+
+                // Добавляем в массив для PhotoSwipe
+                previewPhotoSwipeItems.push({
+                    src: e.target.result,
+                    w: 0,
+                    h: 0,
+                    title: `Фото ${i + 1}`
+                });
+            }
+
+            reader.readAsDataURL(file);
+        }
+    } else {
+        fileCount.style.display = 'none';
+        previewContainerWrapper.style.display = 'none';
+    }
+}
+
+function openPreviewPhoto(index) {
+    if (previewPhotoSwipeItems.length === 0) return;
+
+    var pswpElement = document.querySelectorAll('.pswp')[0];
+
+    var options = {
+        index: parseInt(index),
+        bgOpacity: 0.9,
+        showHideOpacity: true,
+        closeOnScroll: false,
+        history: false,
+        shareEl: false,
+        fullscreenEl: true,
+        zoomEl: true,
+        maxSpreadZoom: 3,
+        getDoubleTapZoom: function(isMouseClick, item) {
+            return item.initialZoomLevel < 0.7 ? 1 : 1.5;
+        },
+        imageClickAction: 'zoom',
+        tapToToggleControls: true,
+        pinchToClose: false
+    };
+
+    var gallery = new PhotoSwipe(pswpElement, PhotoSwipeUI_Default, previewPhotoSwipeItems, options);
+
+    gallery.listen('gettingData', function(index, item) {
+        if (item.w < 1 || item.h < 1) {
+            var img = new Image();
+            img.onload = function() {
+                item.w = this.naturalWidth;
+                item.h = this.naturalHeight;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            };
+            img.onerror = function() {
+                item.w = 1200;
+                item.h = 800;
+                gallery.invalidateCurrItems();
+                gallery.updateSize(true);
+            };
+            img.src = item.src;
+        }
+    });
+
+    gallery.init();
+}
+
+function clearImages() {
+    const input = document.getElementById('imagesInput');
+    const previewContainerWrapper = document.getElementById('imagesPreview');
+    const fileCount = document.getElementById('fileCount');
+
+    input.value = '';
+    previewContainerWrapper.style.display = 'none';
+    fileCount.style.display = 'none';
+    previewPhotoSwipeItems = [];
+}
+
+function confirmUploadPhotos() {
+    const eventSelect = document.querySelector('#id_event_album');
+    const fileInput = document.querySelector('#imagesInput');
+
+    // Для страницы конкретного события подпись задана в data-event-label формы
+    let eventText = document.getElementById('uploadForm').dataset.eventLabel;
+    if (!eventText) {
+        if (eventSelect.value === '') {
+            showConfirmationModal(
+                'Ошибка',
+                'Пожалуйста, выберите событие',
+                '❌',
+                null
+            );
+            return;
+        }
+        eventText = eventSelect.options[eventSelect.selectedIndex].text;
+    }
+
+    if (!fileInput.files || fileInput.files.length === 0) {
+        showConfirmationModal(
+            'Ошибка',
+            'Пожалуйста, выберите хотя бы одну фотографию для загрузки',
+            '❌',
+            null
+        );
+        return;
+    }
+
+    const fileCount = fileInput.files.length;
+    const totalSize = Array.from(fileInput.files).reduce((total, file) => total + file.size, 0);
+    const totalSizeMB = (totalSize / 1024 / 1024).toFixed(2);
+
+    showConfirmationModal(
+        'Загрузка фотографий',
+        `Вы уверены, что хотите загрузить ${fileCount} фотографий (${totalSizeMB} МБ) в событие "${eventText}"?\n\nПосле загрузки фото будут отправлены на модерацию.`,
+        '📷',
+        function() {
+            document.getElementById('uploadForm').submit();
+        }
+    );
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (document.getElementById('uploadForm').dataset.imagesError) {
+        showConfirmationModal(
+            'Ошибка',
+            'Пожалуйста, выберите фотографии для загрузки.',
+            '❌',
+            null
+        );
+    }
+});
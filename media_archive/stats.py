@@ -0,0 +1,220 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from . import tasks
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo, ActivityEvent, StatsRollup
+
+# Статистика архива без агрегатов по Photo на каждый просмотр.
+#
+# StatsRollup хранит готовые итоги: число и объём одобренных фото по
+# учебному году, событию и загрузившему, длину очереди модерации и суммарное
+# время ожидания решения по типам объектов. Загрузка, решение модератора и
+# удаление фото прибавляют к итогам разницу в той же транзакции, что и само
+# изменение. Удаление альбома целиком и правки статусов в админке итоги не
+# трогают - их поправляет recompute(): после удаления альбома в фоне и
+# каждую ночь командой recompute_stats.
+
+TYPES = {
+    'year': (1, YearAlbum, 'created_at'),
+    'class': (2, SchoolClass, 'created_at'),
+    'event': (3, EventAlbum, 'created_at'),
+    'photo': (4, Photo, 'uploaded_at'),
+}
+TYPE_NAMES = dict(ActivityEvent.OBJECT_CHOICES)
+
+PHOTO_FIELDS = (
+    'id', 'status', 'file_size', 'uploaded_at', 'taken_at',
+    'event_album_id', 'event_album__title',
+    'event_album__school_class__year_album_id', 'event_album__school_class__year_album__year',
+    'uploaded_by_id', 'uploaded_by__username',
+)
+
+
+def photo_rows(ids):
+    """Строки фото со всем, что нужно итогам; одним запросом."""
+    return list(Photo.objects.filter(id__in=ids).values(*PHOTO_FIELDS))
+
+
+def _add(deltas, kind, key, label, count=0, size=0, seconds=0.0):
+    row = deltas.setdefault((kind, key), [label, 0, 0, 0.0])
+    row[1] += count
+    row[2] += size
+    row[3] += seconds
+
+
+def _add_photos(deltas, rows, sign):
+    for row in rows:
+        size = sign * (row['file_size'] or 0)
+        _add(deltas, 'year', row['event_album__school_class__year_album_id'],
+             row['event_album__school_class__year_album__year'], sign, size)
+        _add(deltas, 'event', row['event_album_id'], row['event_album__title'], sign, size)
+        _add(deltas, 'uploader', row['uploaded_by_id'], row['uploaded_by__username'], sign, size)
+
+
+def _add_pending(deltas, object_type, count):
+    _add(deltas, 'pending', TYPES[object_type][0], TYPE_NAMES[object_type], count)
+
+
+def _apply(deltas):
+    for (kind, key), (label, count, size, seconds) in deltas.items():
+        if not (count or size or seconds):
+            continue
+        changes = {
+            'count': F('count') + count,
+            'bytes': F('bytes') + size,
+            'seconds': F('seconds') + seconds,
+        }
+        if StatsRollup.objects.filter(kind=kind, key=key).update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                StatsRollup.objects.create(
+                    kind=kind, key=key, label=label or '', count=count, bytes=size, seconds=seconds
+                )
+        except IntegrityError:
+            # Строку только что создал другой процесс
+            StatsRollup.objects.filter(kind=kind, key=key).update(**changes)
+
+
+def album_created(object_type, status):
+    if status == 'pending':
+        deltas = {}
+        _add_pending(deltas, object_type, 1)
+        _apply(deltas)
+
+
+def photos_uploaded(photo_ids):
+    rows = photo_rows(photo_ids)
+    deltas = {}
+    _add_photos(deltas, [row for row in rows if row['status'] == 'approved'], 1)
+    _add_pending(deltas, 'photo', sum(row['status'] == 'pending' for row in rows))
+    _apply(deltas)
+
+
+def photos_removed(rows):
+    """rows - photo_rows(), снятые до удаления."""
+    deltas = {}
+    _add_photos(deltas, [row for row in rows if row['status'] == 'approved'], -1)
+    _add_pending(deltas, 'photo', -sum(row['status'] == 'pending' for row in rows))
+    _apply(deltas)
+
+
+def decided(object_type, status, ids, now=None):
+    """Учитывает решение status по объектам ids, которые были на модерации."""
+    if not ids:
+        return
+    now = now or timezone.now()
+    type_key, model, created_field = TYPES[object_type]
+    if object_type == 'photo':
+        rows = photo_rows(ids)
+        created = [row['uploaded_at'] for row in rows]
+    else:
+        rows = []
+        created = list(model.objects.filter(id__in=ids).values_list(created_field, flat=True))
+    deltas = {}
+    _add_pending(deltas, object_type, -len(created))
+    _add(deltas, 'latency', type_key, TYPE_NAMES[object_type], len(created),
+         seconds=sum((now - moment).total_seconds() for moment in created))
+    if status == 'approved':
+        _add_photos(deltas, rows, 1)
+    _apply(deltas)
+
+
+def schedule_recompute():
+    tasks.enqueue(recompute)
+
+
+def recompute():
+    """Пересчитывает все итоги по основным таблицам и журналу действий."""
+    rows = []
+    live = Photo.objects.exclude(event_album__status='deleted')
+    approved = live.filter(status='approved')
+    groups = [
+        ('year', 'event_album__school_class__year_album_id', 'event_album__school_class__year_album__year'),
+        ('event', 'event_album_id', 'event_album__title'),
+        ('uploader', 'uploaded_by_id', 'uploaded_by__username'),
+    ]
+    for kind, key_field, label_field in groups:
+        totals = approved.order_by().values(key_field, label_field).annotate(
+            total=Count('id'), size=Sum('file_size')
+        )
+        rows.extend(
+            StatsRollup(kind=kind, key=row[key_field], label=row[label_field] or '',
+                        count=row['total'], bytes=row['size'] or 0)
+            for row in totals
+        )
+    for object_type, (type_key, model, created_field) in TYPES.items():
+        pending = live if model is Photo else model.objects.all()
+        rows.append(StatsRollup(
+            kind='pending', key=type_key, label=TYPE_NAMES[object_type],
+            count=pending.filter(status='pending').count(),
+        ))
+        latency = _latency_from_log(object_type, model, created_field)
+        if latency['total']:
+            rows.append(StatsRollup(
+                kind='latency', key=type_key, label=TYPE_NAMES[object_type],
+                count=latency['total'], seconds=latency['waited'].total_seconds(),
+            ))
+    # Чтение идёт вне транзакции: в SQLite долгая читающая транзакция,
+    # переходящая к записи, упирается в запись фоновых задач
+    with transaction.atomic():
+        StatsRollup.objects.all().delete()
+        StatsRollup.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _latency_from_log(object_type, model, created_field):
+    """Время от создания объекта до решения по записям журнала действий."""
+    created = model.objects.filter(pk=OuterRef('object_id')).values(created_field)
+    return ActivityEvent.objects.filter(
+        object_type=object_type, action__in=['approve', 'reject']
+    ).annotate(started=Subquery(created)).filter(started__isnull=False).aggregate(
+        total=Count('id'),
+        waited=Sum(ExpressionWrapper(F('created_at') - F('started'), output_field=DurationField())),
+    )
+
+
+def pending_counts():
+    """{тип: объектов на модерации} одним запросом."""
+    counts = dict.fromkeys(TYPES, 0)
+    keys = {type_key: object_type for object_type, (type_key, _, _) in TYPES.items()}
+    for key, count in StatsRollup.objects.filter(kind='pending').values_list('key', 'count'):
+        counts[keys[key]] = max(0, count)
+    return counts
+
+
+def dashboard(top=10):
+    """Всё для страницы статистики одним запросом к StatsRollup."""
+    years, events, uploaders = [], [], []
+    pending, latency = {}, {}
+    for kind, key, label, count, size, seconds in StatsRollup.objects.values_list(
+        'kind', 'key', 'label', 'count', 'bytes', 'seconds'
+    ):
+        if kind == 'year':
+            years.append({'id': key, 'label': label, 'photos': count, 'bytes': size})
+        elif kind == 'event':
+            events.append({'id': key, 'label': label, 'photos': count, 'bytes': size})
+        elif kind == 'uploader':
+            uploaders.append({'label': label, 'photos': count, 'bytes': size})
+        elif kind == 'pending':
+            pending[key] = max(0, count)
+        elif kind == 'latency' and count:
+            latency[key] = seconds / count
+    types = [
+        {
+            'name': TYPE_NAMES[object_type],
+            'pending': pending.get(type_key, 0),
+            'latency_hours': round(latency[type_key] / 3600, 1) if type_key in latency else None,
+        }
+        for object_type, (type_key, _, _) in TYPES.items()
+    ]
+    years = [row for row in years if row['photos'] > 0]
+    return {
+        'total_photos': sum(row['photos'] for row in years),
+        'total_bytes': sum(row['bytes'] for row in years),
+        'years': sorted(years, key=lambda row: row['label'], reverse=True),
+        'events': sorted((row for row in events if row['photos'] > 0), key=lambda row: -row['bytes'])[:top],
+        'uploaders': sorted((row for row in uploaders if row['photos'] > 0), key=lambda row: -row['photos'])[:top],
+        'types': types,
+    }
@@ -0,0 +1,209 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, InvalidStorageError, Storage, default_storage, storages
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него пишутся только .gz
+    brotli = None
+
+# Текстовые форматы, которые имеет смысл сжимать; картинки и woff2 уже сжаты
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.webmanifest'}
+MIN_COMPRESS_SIZE = 256
+
+
+def compress_file(path):
+    """Пишет рядом с файлом path.gz и path.br, если они меньше оригинала."""
+    with open(path, 'rb') as source:
+        data = source.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as output:
+                output.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Манифест с хэшами имён плюс заранее сжатые копии для serve_static
+    или веб-сервера (gzip_static / brotli_static в nginx)."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = set()
+        for name, hashed_name, post_processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and isinstance(hashed_name, str):
+                processed.add(hashed_name)
+            yield name, hashed_name, post_processed
+        if dry_run:
+            return
+        # Сжимаем и исходные, и хэшированные имена: {% static %} при DEBUG
+        # и старые ссылки отдают исходные
+        for name in processed | set(paths):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                compress_file(self.path(name))
+
+
+# Фотографии хранятся по хэшу содержимого: photos/ab/cd/<sha256>.jpg.
+# Два уровня по 256 каталогов держат в каждом не больше нескольких тысяч
+# файлов даже на миллионе фото, одинаковые загрузки занимают место один раз,
+# а бэкап может сравнивать файлы по имени, не читая их.
+
+SHARDED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def sharded_name(name, digest):
+    """photos/IMG_001.JPG -> photos/ab/cd/abcd....jpg"""
+    extension = os.path.splitext(name)[1].lower()
+    return posixpath.join(posixpath.dirname(name), digest[:2], digest[2:4], digest + extension)
+
+
+class ContentAddressedMixin:
+    """Имя файла выбирается по содержимому, а не по имени загрузки.
+    Если такой файл уже есть, он не пишется повторно."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = sharded_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+class ShardedFileSystemStorage(ContentAddressedMixin, FileSystemStorage):
+    pass
+
+
+@deconstructible
+class S3Storage(Storage):
+    """Минимальное S3-совместимое хранилище на boto3 (AWS, MinIO, Ceph).
+
+    endpoint_url позволяет проверить его на локальном MinIO или moto_server.
+    Если задан base_url (публичный бакет или CDN), ссылки строятся от него,
+    иначе выдаются подписанные ссылки на url_expire секунд."""
+
+    def __init__(self, bucket_name, endpoint_url=None, region_name=None,
+                 access_key=None, secret_key=None, location='', base_url=None,
+                 url_expire=3600):
+        self.bucket_name = bucket_name
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.location = location.strip('/')
+        self.base_url = base_url
+        self.url_expire = url_expire
+
+    @cached_property
+    def client(self):
+        import boto3  # необязательная зависимость, нужна только для S3
+
+        return boto3.client(
+            's3',
+            endpoint_url=self.endpoint_url,
+            region_name=self.region_name,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+        )
+
+    def _key(self, name):
+        return posixpath.join(self.location, name) if self.location else name
+
+    def _head(self, name):
+        try:
+            return self.client.head_object(Bucket=self.bucket_name, Key=self._key(name))
+        except self.client.exceptions.ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def _open(self, name, mode='rb'):
+        response = self.client.get_object(Bucket=self.bucket_name, Key=self._key(name))
+        return ContentFile(response['Body'].read(), name=name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.client.upload_fileobj(
+            content, self.bucket_name, self._key(name),
+            ExtraArgs={'ContentType': content_type},
+        )
+        return name
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket_name, Key=self._key(name))
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def size(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['ContentLength']
+
+    def get_modified_time(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return head['LastModified']
+
+    def listdir(self, path):
+        prefix = self._key(path).strip('/')
+        prefix = prefix + '/' if prefix else ''
+        directories, files = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            for entry in page.get('CommonPrefixes', ()):
+                directories.append(entry['Prefix'][len(prefix):].rstrip('/'))
+            for entry in page.get('Contents', ()):
+                files.append(entry['Key'][len(prefix):])
+        return directories, files
+
+    def url(self, name):
+        if self.base_url:
+            return f"{self.base_url.rstrip('/')}/{quote(self._key(name))}"
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket_name, 'Key': self._key(name)},
+            ExpiresIn=self.url_expire,
+        )
+
+
+class ShardedS3Storage(ContentAddressedMixin, S3Storage):
+    pass
+
+
+def photo_storage():
+    """Хранилище Photo.image: STORAGES['photos'], если оно настроено."""
+    try:
+        return storages['photos']
+    except InvalidStorageError:
+        return default_storage
@@ -0,0 +1,60 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Ключи задач, которые уже стоят в очереди: повторные запросы на ту же
+# работу (например, несколько модераций одного события подряд) схлопываются
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ARCHIVE_TASK_WORKERS', 2),
+                thread_name_prefix='archive-task',
+            )
+        return _executor
+
+
+def _run(key, func, args, kwargs):
+    with _pending_lock:
+        _pending.discard(key)
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась с ошибкой', func.__name__)
+    finally:
+        close_old_connections()
+
+
+def enqueue(func, *args, **kwargs):
+    """Запускает func в фоне после коммита текущей транзакции.
+
+    При ARCHIVE_TASKS_EAGER = True задача выполняется сразу в текущем потоке
+    (удобно для management-команд и тестов).
+    """
+    key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+
+    def submit():
+        if getattr(settings, 'ARCHIVE_TASKS_EAGER', False):
+            func(*args, **kwargs)
+            return
+        with _pending_lock:
+            if key in _pending:
+                return
+            _pending.add(key)
+        _get_executor().submit(_run, key, func, args, kwargs)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,224 @@
+'use strict';
+// Сервис-воркер фотоархива, настройки и описание - в media_archive/pwa.py
+
+const CONFIG = JSON.parse('{{ config|escapejs }}');
+const SHELL_CACHE = 'archive-shell-' + CONFIG.version;
+const IMAGE_CACHE = 'archive-images';
+const PAGE_CACHE = 'archive-pages';
+const GALLERY_CACHE = 'archive-gallery';
+const KEEP = [SHELL_CACHE, IMAGE_CACHE, PAGE_CACHE, GALLERY_CACHE];
+const PAGES = CONFIG.pages.map(pattern => new RegExp(pattern));
+const GALLERY = new RegExp(CONFIG.gallery);
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(CONFIG.shell))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(
+                names
+                    .filter(name => name.startsWith('archive-') && !KEEP.includes(name))
+                    .map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('message', event => {
+    // Пользователь вошёл или вышел: сохранённые страницы показывают чужое меню
+    if (event.data && event.data.type === 'reset-pages') {
+        event.waitUntil(Promise.all([caches.delete(PAGE_CACHE), caches.delete(GALLERY_CACHE)]));
+    }
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.mode === 'navigate') {
+        if (PAGES.some(pattern => pattern.test(url.pathname))) {
+            event.respondWith(networkOrCopy(event));
+        } else {
+            event.respondWith(fetch(request).catch(offlinePage));
+        }
+    } else if (url.pathname.startsWith(CONFIG.static)) {
+        event.respondWith(cacheFirst(SHELL_CACHE, request));
+    } else if (url.pathname.startsWith(CONFIG.media) && !request.headers.has('Range')) {
+        event.respondWith(cachedImage(event));
+    } else if (GALLERY.test(url.pathname)) {
+        event.respondWith(revalidated(event));
+    }
+});
+
+function offlinePage() {
+    return caches.match(CONFIG.offline);
+}
+
+function cacheable(response) {
+    return response.ok && response.type === 'basic';
+}
+
+async function cacheFirst(name, request) {
+    const cache = await caches.open(name);
+    const cached = await cache.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (cacheable(response)) {
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+// Страницы: сеть, а если она не ответила за pageTimeout или недоступна -
+// сохранённая копия. Старые копии вытесняются по числу страниц.
+async function networkOrCopy(event) {
+    const request = event.request;
+    const cache = await caches.open(PAGE_CACHE);
+    const network = fetch(request);
+    // Ответ сохраняется, даже если страница уже показана из копии
+    event.waitUntil(network.then(response => {
+        if (cacheable(response) && !response.redirected) {
+            return cache.put(request, response.clone()).then(() => trimEntries(cache, CONFIG.pageLimit));
+        }
+    }).catch(() => {}));
+    const copy = await cache.match(request);
+    if (!copy) {
+        return network.catch(offlinePage);
+    }
+    const timeout = new Promise(resolve => setTimeout(() => resolve(copy), CONFIG.pageTimeout));
+    return Promise.race([network.catch(() => copy), timeout]);
+}
+
+async function trimEntries(cache, limit) {
+    // cache.put переносит запись в конец списка ключей
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - limit)).map(key => cache.delete(key)));
+}
+
+// JSON галереи: запрос с If-None-Match сохранённой копии; 304 - копия
+// актуальна, без сети - отдаём её же.
+async function revalidated(event) {
+    const request = event.request;
+    const cache = await caches.open(GALLERY_CACHE);
+    const copy = await cache.match(request);
+    const headers = new Headers(request.headers);
+    if (copy && copy.headers.has('ETag')) {
+        headers.set('If-None-Match', copy.headers.get('ETag'));
+    }
+    let response;
+    try {
+        response = await fetch(request.url, {headers: headers, credentials: 'same-origin', cache: 'no-store'});
+    } catch (error) {
+        if (copy) {
+            return copy;
+        }
+        throw error;
+    }
+    if (response.status === 304 && copy) {
+        return copy;
+    }
+    if (cacheable(response)) {
+        event.waitUntil(
+            cache.put(request, response.clone()).then(() => trimEntries(cache, CONFIG.pageLimit))
+        );
+    }
+    return response;
+}
+
+// Изображения: кэш с вытеснением давно открытых по суммарному размеру.
+// Размер и время последнего открытия каждой записи - в IndexedDB.
+let database = null;
+let trimming = Promise.resolve();
+
+function openDatabase() {
+    if (!database) {
+        database = new Promise((resolve, reject) => {
+            const open = indexedDB.open('archive-images', 1);
+            open.onupgradeneeded = () => {
+                open.result.createObjectStore('entries', {keyPath: 'url'}).createIndex('used', 'used');
+            };
+            open.onsuccess = () => resolve(open.result);
+            open.onerror = () => reject(open.error);
+        });
+    }
+    return database;
+}
+
+function transact(mode, work) {
+    return openDatabase().then(db => new Promise((resolve, reject) => {
+        const transaction = db.transaction('entries', mode);
+        const request = work(transaction.objectStore('entries'));
+        transaction.oncomplete = () => resolve(request && request.result);
+        transaction.onerror = () => reject(transaction.error);
+    }));
+}
+
+function touch(url) {
+    return transact('readwrite', store => {
+        const request = store.get(url);
+        request.onsuccess = () => {
+            if (request.result) {
+                request.result.used = Date.now();
+                store.put(request.result);
+            }
+        };
+    });
+}
+
+async function trimImages() {
+    const entries = await transact('readonly', store => store.index('used').getAll());
+    let total = entries.reduce((sum, entry) => sum + entry.size, 0);
+    const evicted = [];
+    for (const entry of entries) {
+        if (total <= CONFIG.imageBytes) {
+            break;
+        }
+        total -= entry.size;
+        evicted.push(entry.url);
+    }
+    if (evicted.length) {
+        const cache = await caches.open(IMAGE_CACHE);
+        await Promise.all(evicted.map(url => cache.delete(url)));
+        await transact('readwrite', store => {
+            evicted.forEach(url => store.delete(url));
+        });
+    }
+}
+
+async function remember(cache, request, response) {
+    let size = Number(response.headers.get('Content-Length'));
+    if (!size) {
+        size = (await response.clone().blob()).size;
+    }
+    await cache.put(request, response);
+    await transact('readwrite', store => {
+        store.put({url: request.url, size: size, used: Date.now()});
+    });
+    trimming = trimming.then(trimImages, trimImages);
+    return trimming;
+}
+
+async function cachedImage(event) {
+    const request = event.request;
+    const cache = await caches.open(IMAGE_CACHE);
+    const cached = await cache.match(request);
+    if (cached) {
+        event.waitUntil(touch(request.url).catch(() => {}));
+        return cached;
+    }
+    const response = await fetch(request);
+    if (cacheable(response)) {
+        event.waitUntil(remember(cache, request, response.clone()).catch(() => {}));
+    }
+    return response;
+}
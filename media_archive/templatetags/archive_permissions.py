@@ -0,0 +1,12 @@
+from django import template
+
+from .. import permissions
+
+register = template.Library()
+
+
+@register.filter
+def can_delete(obj, user):
+    """{% if photo|can_delete:user %} - сравнивает uploaded_by_id/created_by_id
+    с user.pk, не загружая пользователя."""
+    return permissions.can_delete(user, obj)
@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import hashlib
+import io
+import json
+import os
+import pstats
+import re
+import sqlite3
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.http import Http404, HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import activity, assets, auth, backup, checks, compression, covers, deletion, imaging, ingest, loadtest, metrics, moderation, permissions, pwa, similarity, stats, throttling, timeline
+from .models import ActivityDaily, ActivityEvent, EventAlbum, Photo, SchoolClass, StatsRollup, YearAlbum, bump_cache_version
+from .storage import SHARDED_NAME_RE
+
+# Манифест статики появляется только после collectstatic
+TEST_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def jpeg(color, size=(32, 32), **options):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG', **options)
+    return buffer.getvalue()
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('moderator', password='secret')
+        YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.user)
+
+    def test_window_allows_burst_then_asks_to_wait(self):
+        rate = throttling.parse_rate('6/m')
+        waits = [throttling.take_token('test', 'ip1', rate, 3) for _ in range(4)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        self.assertGreater(waits[3], 0)
+        self.assertLessEqual(waits[3], 30)
+        # У другого клиента своё окно
+        self.assertEqual(throttling.take_token('test', 'ip2', rate, 3), 0)
+
+    def test_taken_place_is_not_reused(self):
+        rate = throttling.parse_rate('6/m')
+        self.assertEqual(throttling.take_token('test', 'ip1', rate, 2), 0)
+        # Другой процесс прочитал счётчик раньше, чем его увеличили
+        window, _, _ = throttling._window('test', 'ip1', rate, 2)
+        cache.delete(window)
+        self.assertEqual(throttling.take_token('test', 'ip1', rate, 2), 0)
+        self.assertGreater(throttling.take_token('test', 'ip1', rate, 2), 0)
+
+    def test_async_views_for_logged_in_user(self):
+        self.client.force_login(self.user)
+        cache.clear()
+        for url in ('/search/?q=20', '/api/v1/suggest/?q=20'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    @override_settings(ARCHIVE_RATE_LIMITS={'search': {'rate': '6/m', 'burst': 2}})
+    def test_logged_in_user_gets_429(self):
+        self.client.force_login(self.user)
+        responses = [self.client.get('/api/v1/suggest/?q=20') for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [200, 200, 429])
+        self.assertTrue(responses[2]['Retry-After'])
+
+
+@override_settings(STORAGES=TEST_STORAGES, ARCHIVE_TASKS_EAGER=True)
+class ModerationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='secret')
+        self.first = User.objects.create_user('first', password='secret', is_staff=True)
+        self.second = User.objects.create_user('second', password='secret', is_staff=True)
+        self.year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.author)
+        self.classes = [
+            SchoolClass.objects.create(class_name=f'11{letter}', year_album=self.year, created_by=self.author)
+            for letter in 'АБВ'
+        ]
+        for _ in self.classes:
+            stats.album_created('class', 'pending')
+
+    def pending_classes(self):
+        return StatsRollup.objects.get(kind='pending', key=stats.TYPES['class'][0]).count
+
+    def test_moderation_api_accepts_superusers(self):
+        superuser = User.objects.create_user('root', password='secret', is_superuser=True)
+        self.client.force_login(self.author)
+        response = self.client.post('/api/v1/moderation/claim/', {'type': 'class'})
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(superuser)
+        response = self.client.post('/api/v1/moderation/claim/', {'type': 'class'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['items']), 3)
+
+    def test_timeline_shows_photos_once_their_class_is_approved(self):
+        cache.clear()
+        event = EventAlbum.objects.create(
+            title='Выпускной', school_class=self.classes[0], status='approved', created_by=self.author
+        )
+        taken_at = timezone.make_aware(datetime.datetime(2020, 5, 25, 12))
+        Photo.objects.create(
+            event_album=event, image='photos/aa.jpg', status='approved',
+            uploaded_by=self.author, taken_at=taken_at
+        )
+        day = timezone.localdate(taken_at)
+        # Класс ещё на модерации: его фото в ленте не видны
+        self.assertEqual(timeline.buckets('month', day, day)[0]['photos'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            moderation.decide_one(self.first, 'class', self.classes[0].pk, 'approved')
+        self.assertEqual(timeline.buckets('month', day, day)[0]['photos'], 1)
+
+    def test_claims_do_not_overlap(self):
+        first, _ = moderation.claim(self.first, 'class', 2)
+        second, _ = moderation.claim(self.second, 'class', 2)
+        first_ids = set(first.values_list('id', flat=True))
+        second_ids = set(second.values_list('id', flat=True))
+        self.assertEqual(len(first_ids), 2)
+        self.assertEqual(len(second_ids), 1)
+        self.assertFalse(first_ids & second_ids)
+        # Повторный запрос возвращает уже взятое, а не новую пачку
+        again, _ = moderation.claim(self.first, 'class', 2)
+        self.assertEqual(set(again.values_list('id', flat=True)), first_ids)
+
+    def test_decide_applies_only_held_objects(self):
+        held, _ = moderation.claim(self.first, 'class', 1)
+        held_id = held.get().id
+        other_id = next(c.id for c in self.classes if c.id != held_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            results = moderation.decide(self.first, [
+                ('class', held_id, 'approve'),
+                ('class', other_id, 'approve'),
+            ])
+        self.assertEqual([result['ok'] for result in results], [True, False])
+        self.assertEqual(SchoolClass.objects.get(id=held_id).status, 'approved')
+        self.assertEqual(SchoolClass.objects.get(id=other_id).status, 'pending')
+        # Повторное решение по уже решённому объекту не применяется
+        results = moderation.decide(self.first, [('class', held_id, 'reject')])
+        self.assertFalse(results[0]['ok'])
+        self.assertEqual(SchoolClass.objects.get(id=held_id).status, 'approved')
+        self.assertEqual(self.pending_classes(), 2)
+        self.assertEqual(ActivityEvent.objects.filter(action='approve').count(), 1)
+
+    def test_second_decision_on_dashboard_is_not_counted(self):
+        school_class = self.classes[0]
+        data = {'object_type': 'class', 'object_id': school_class.id, 'action': 'approve'}
+        for moderator in (self.first, self.second):
+            self.client.force_login(moderator)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/moderation/process/', data)
+            self.assertRedirects(response, '/moderation/', fetch_redirect_response=False)
+        school_class.refresh_from_db()
+        self.assertEqual(school_class.status, 'approved')
+        self.assertEqual(self.pending_classes(), 2)
+        self.assertEqual(ActivityEvent.objects.filter(action='approve').count(), 1)
+
+    def test_dashboard_respects_lease_and_keeps_other_fields(self):
+        held, _ = moderation.claim(self.second, 'class', 1)
+        school_class = held.get()
+        SchoolClass.objects.filter(id=school_class.id).update(cover_thumbnail='covers/class.jpg')
+        self.client.force_login(self.first)
+        data = {'object_type': 'class', 'object_id': school_class.id, 'action': 'approve'}
+        self.client.post('/moderation/process/', data)
+        self.assertEqual(SchoolClass.objects.get(id=school_class.id).status, 'pending')
+
+        self.client.force_login(self.second)
+        self.client.post('/moderation/process/', data)
+        updated = SchoolClass.objects.get(id=school_class.id)
+        self.assertEqual(updated.status, 'approved')
+        self.assertIsNone(updated.claimed_by_id)
+        self.assertEqual(updated.cover_thumbnail.name, 'covers/class.jpg')
+        self.assertEqual(updated.cache_version, school_class.cache_version + 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ProfilingTests(TestCase):
+    def test_staff_profiles_async_view(self):
+        staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(ARCHIVE_PROFILING_ENABLED=True, ARCHIVE_PROFILE_DIR=directory):
+                client = AsyncClient()
+                client.force_login(staff)
+                response = async_to_sync(client.get)('/search/?q=20&_profile=1')
+            self.assertEqual(response.status_code, 200)
+            saved = sorted(os.listdir(directory))
+        self.assertEqual([name.rsplit('.', 1)[1] for name in saved], ['json', 'prof'])
+
+    def test_sync_view_under_asgi_is_profiled_in_its_thread(self):
+        staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(ARCHIVE_PROFILING_ENABLED=True, ARCHIVE_PROFILE_DIR=directory):
+                client = AsyncClient()
+                client.force_login(staff)
+                response = async_to_sync(client.get)('/?_profile=1')
+            self.assertEqual(response.status_code, 200)
+            profile = next(name for name in os.listdir(directory) if name.endswith('.prof'))
+            functions = pstats.Stats(os.path.join(directory, profile)).stats
+        self.assertTrue(any(
+            filename.endswith(os.path.join('media_archive', 'views.py')) and name == 'home'
+            for filename, _, name in functions
+        ))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+
+    def test_metrics_endpoint_reports_views_for_staff_only(self):
+        self.assertEqual(self.client.get('/').status_code, 200)
+        self.assertEqual(self.client.get('/metrics').status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('archive_responses_total{view="home",method="GET",status="200"} 1', body)
+        self.assertIn('archive_responses_total{view="metrics",method="GET",status="302"} 1', body)
+        for name in metrics.METRICS:
+            self.assertIn(f'# TYPE {name} histogram', body)
+            self.assertIn(f'{name}_bucket{{view="home",le="+Inf"}} 1', body)
+            self.assertIn(f'{name}_count{{view="home"}} 1', body)
+
+    def test_slow_requests_are_logged_with_sql(self):
+        with self.settings(ARCHIVE_SLOW_REQUEST_MS=0):
+            with self.assertLogs('media_archive.slow_requests', 'WARNING') as logs:
+                Client().get('/')
+        [message] = logs.output
+        self.assertIn('Медленный запрос GET / (home)', message)
+        self.assertIn('SELECT', message)
+
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ApiResourceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', password='secret')
+        cls.year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=author)
+        cls.school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=cls.year, status='approved', created_by=author
+        )
+        cls.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=cls.school_class, status='approved', created_by=author
+        )
+        cls.photos = [
+            Photo.objects.create(
+                event_album=cls.event, image=f'photos/{index:02x}.jpg', status='approved', uploaded_by=author
+            )
+            for index in range(5)
+        ]
+        Photo.objects.create(event_album=cls.event, image='photos/ff.jpg', uploaded_by=author)
+        pending_year = YearAlbum.objects.create(year='2020-2021', created_by=author)
+        hidden_class = SchoolClass.objects.create(
+            class_name='11Б', year_album=pending_year, status='approved', created_by=author
+        )
+        cls.deleted_event = EventAlbum.objects.create(
+            title='Удаляется', school_class=hidden_class, status='deleted', created_by=author
+        )
+        cls.hidden_photo = Photo.objects.create(
+            event_album=cls.deleted_event, image='photos/ee.jpg', status='approved', uploaded_by=author
+        )
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_lists_only_approved_with_approved_parents(self):
+        self.assertEqual([item['id'] for item in self.get('/api/v1/years/')['data']], [self.year.id])
+        self.assertEqual([item['id'] for item in self.get('/api/v1/classes/')['data']], [self.school_class.id])
+        self.assertEqual([item['id'] for item in self.get('/api/v1/events/')['data']], [self.event.id])
+        photos = self.get(f'/api/v1/photos/?event={self.deleted_event.id}')
+        self.assertEqual(photos['data'], [])
+        response = self.client.get(f'/api/v1/photos/{self.hidden_photo.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_event_gallery_hidden_with_its_ancestors(self):
+        self.assertEqual(len(self.get(f'/api/v1/events/{self.event.id}/photos/')['photos']), 5)
+        hidden_event = EventAlbum.objects.create(
+            title='Последний звонок', school_class=self.deleted_event.school_class,
+            status='approved', created_by=self.event.created_by
+        )
+        Photo.objects.create(
+            event_album=hidden_event, image='photos/dd.jpg', status='approved', uploaded_by=self.event.created_by
+        )
+        # Событие одобрено, но его год ещё на модерации
+        response = self.client.get(f'/api/v1/events/{hidden_event.id}/photos/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_fields_and_include(self):
+        data = self.get(
+            f'/api/v1/years/{self.year.id}/?fields=year,classes_count'
+            '&include=classes.events&fields[class]=class_name&fields[event]=title,photos_count'
+        )['data']
+        self.assertEqual(data, {
+            'year': '2019-2020',
+            'classes_count': 1,
+            'classes': [{'class_name': '11А', 'events': [{'title': 'Выпускной', 'photos_count': 5}]}],
+        })
+        response = self.client.get('/api/v1/years/?fields=unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pages_cover_all_photos_once(self):
+        seen, url = [], f'/api/v1/photos/?event={self.event.id}&fields=id&limit=2'
+        while True:
+            page = self.get(url)
+            seen.extend(item['id'] for item in page['data'])
+            if not page['next']:
+                break
+            url = f'/api/v1/photos/?event={self.event.id}&fields=id&limit=2&after={page["next"]}'
+        self.assertEqual(sorted(seen), sorted(photo.id for photo in self.photos))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_ids_report_missing(self):
+        ids = f'{self.photos[1].id},{self.hidden_photo.id},{self.photos[0].id}'
+        page = self.get(f'/api/v1/photos/?ids={ids}&fields=id')
+        self.assertEqual([item['id'] for item in page['data']], [self.photos[1].id, self.photos[0].id])
+        self.assertEqual(page['missing'], [self.hidden_photo.id])
+
+
+class VendorAssetTests(TestCase):
+    COMMAND = 'media_archive.management.commands.fetch_vendor_assets.Command'
+
+    def test_committed_fonts_match_pins(self):
+        self.assertTrue(all(assets.verified(name) for name in assets.fonts_names()))
+
+    def test_copy_with_wrong_hash_is_not_written(self):
+        committed = dict(assets.SHA256)
+        pins = {**committed, **{name: '0' * 64 for name in assets.photoswipe_names()}}
+        with mock.patch.object(assets, 'SHA256', pins), \
+                mock.patch(f'{self.COMMAND}._read', return_value=b'/*! PhotoSwipe - v4.1.3 */'), \
+                mock.patch(f'{self.COMMAND}._write') as write:
+            with self.assertRaisesMessage(CommandError, 'SHA256 не совпадает'):
+                call_command('fetch_vendor_assets', 'photoswipe/dist', stdout=io.StringIO())
+            # Без закреплённых хэшей файлы пишутся только с --pin
+            with mock.patch.object(assets, 'SHA256', committed):
+                with self.assertRaisesMessage(CommandError, '--pin'):
+                    call_command('fetch_vendor_assets', 'photoswipe/dist', stdout=io.StringIO())
+                call_command('fetch_vendor_assets', 'photoswipe/dist', '--pin', stdout=io.StringIO())
+        self.assertEqual(write.call_count, len(assets.PHOTOSWIPE_FILES))
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root.name))
+        self.author = User.objects.create_user('author', password='secret')
+        year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.author)
+        school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=year, status='approved', created_by=self.author
+        )
+        self.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=school_class, status='approved', created_by=self.author
+        )
+
+    def camera_jpeg(self, size=(40, 20)):
+        from PIL import ExifTags, Image
+
+        exif = Image.Exif()
+        exif[ExifTags.Base.Make] = 'Canon'
+        exif[ExifTags.Base.Model] = 'EOS 5D'
+        exif[ExifTags.Base.Orientation] = 6
+        exif.get_ifd(ExifTags.IFD.Exif).update({
+            ExifTags.Base.DateTimeOriginal: '2020:05:25 10:30:00',
+            ExifTags.Base.OffsetTimeOriginal: '+03:00',
+        })
+        exif.get_ifd(ExifTags.IFD.GPSInfo).update({
+            ExifTags.GPS.GPSLatitudeRef: 'N',
+            ExifTags.GPS.GPSLatitude: (55.0, 45.0, 21.0),
+        })
+        return jpeg('red', size, exif=exif, xmp=b'<x:xmpmeta>Lat 55.7558</x:xmpmeta>', comment=b'Home address')
+
+    def test_upload_fills_exif_fields_used_by_gallery_index(self):
+        result = ingest.process_upload(SimpleUploadedFile('IMG_0001.JPG', self.camera_jpeg()))
+        self.assertTrue(result.ok, result.error)
+        [photo] = ingest.create_photos(self.event, self.author, 'approved', [result])
+        photo.refresh_from_db()
+        self.assertTrue(photo.has_exif_time)
+        self.assertEqual(photo.taken_at, datetime.datetime(2020, 5, 25, 7, 30, tzinfo=datetime.timezone.utc))
+        self.assertEqual((photo.camera_make, photo.camera_model), ('Canon', 'EOS 5D'))
+        # Ориентация 6: кадр повёрнут, ширина и высота меняются местами
+        self.assertEqual((photo.width, photo.height), (20, 40))
+        self.assertEqual(photo.file_size, photo.image.size)
+        gallery = Photo.objects.filter(event_album=self.event, status='approved').order_by('taken_at')
+        self.assertIn('photo_gallery_idx', gallery.explain())
+
+    def test_reencoding_strips_gps_xmp_and_comments(self):
+        from PIL import Image
+
+        result = ingest.process_upload(SimpleUploadedFile('IMG_0001.JPG', self.camera_jpeg()))
+        self.assertTrue(result.ok, result.error)
+        data = result.content.read()
+        self.assertNotIn(b'55.7558', data)
+        self.assertNotIn(b'Home address', data)
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertFalse({'exif', 'xmp', 'comment'} & set(image.info))
+            # Поворот применён к пикселям, поэтому тег ориентации не нужен
+            self.assertEqual(image.size, (20, 40))
+
+    def test_rejects_oversized_uploads_before_decoding(self):
+        from PIL import Image
+
+        # configure_pillow() выставляет лимит Pillow один раз на процесс
+        imaging.configure_pillow.cache_clear()
+        self.addCleanup(imaging.configure_pillow)
+        self.addCleanup(imaging.configure_pillow.cache_clear)
+        with self.settings(ARCHIVE_MAX_IMAGE_PIXELS=1000, ARCHIVE_MAX_UPLOAD_BYTES=4096):
+            bomb = ingest.process_upload(SimpleUploadedFile('bomb.png', self.png((100, 100))))
+            self.assertEqual(bomb.error, 'Изображение слишком большое')
+            # Между лимитом и двойным лимитом Pillow только предупреждает
+            with self.assertWarns(Image.DecompressionBombWarning):
+                large = ingest.process_upload(SimpleUploadedFile('large.png', self.png((40, 40))))
+            self.assertIn('мегапикселей', large.error)
+            heavy = ingest.process_upload(SimpleUploadedFile('heavy.jpg', b'\xff' * 5000))
+            self.assertIn('Файл больше', heavy.error)
+        self.assertEqual(ingest.create_photos(self.event, self.author, 'approved', [bomb, large, heavy]), [])
+
+    def png(self, size):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('L', size).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+
+@override_settings(ARCHIVE_TASKS_EAGER=True)
+class CoverTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root.name))
+        self.author = User.objects.create_user('author', password='secret')
+        self.year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.author)
+        self.school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=self.year, status='approved', created_by=self.author
+        )
+        self.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=self.school_class, status='approved', created_by=self.author
+        )
+        storage = Photo._meta.get_field('image').storage
+        self.early, self.late = [
+            Photo.objects.create(
+                event_album=self.event, status='approved', uploaded_by=self.author,
+                image=storage.save('photos/photo.jpg', ContentFile(jpeg(color))),
+                taken_at=timezone.make_aware(datetime.datetime(2020, 5, day, 12)),
+            )
+            for day, color in ((25, 'red'), (26, 'blue'))
+        ]
+
+    def albums(self):
+        return [model.objects.get(pk=album.pk) for model, album in (
+            (EventAlbum, self.event), (SchoolClass, self.school_class), (YearAlbum, self.year)
+        )]
+
+    def test_refresh_uses_earliest_photo_at_every_level(self):
+        covers.refresh_event_cover(self.event.pk)
+        for album in self.albums():
+            self.assertEqual(album.cover_photo_id, self.early.pk)
+            self.assertFalse(album.cover_is_manual)
+            self.assertTrue(album.cover_thumbnail.storage.exists(album.cover_thumbnail.name))
+        # Повторный пересчёт без изменений не трогает карточку
+        version = EventAlbum.objects.get(pk=self.event.pk).cache_version
+        self.assertFalse(covers.refresh_cover(EventAlbum, self.event.pk))
+        self.assertEqual(EventAlbum.objects.get(pk=self.event.pk).cache_version, version)
+
+    def test_manual_cover_kept_until_photo_is_hidden(self):
+        covers.refresh_event_cover(self.event.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            covers.set_manual_cover(EventAlbum.objects.get(pk=self.event.pk), self.late)
+        event = EventAlbum.objects.get(pk=self.event.pk)
+        self.assertEqual((event.cover_photo_id, event.cover_is_manual), (self.late.pk, True))
+        self.assertTrue(event.cover_thumbnail)
+        # Ручную обложку не сбрасывает пересчёт, пока фото одобрено
+        self.assertFalse(covers.refresh_cover(EventAlbum, self.event.pk))
+        manual_thumbnail = event.cover_thumbnail.name
+
+        Photo.objects.filter(pk=self.late.pk).update(status='rejected')
+        self.assertTrue(covers.refresh_cover(EventAlbum, self.event.pk))
+        event = EventAlbum.objects.get(pk=self.event.pk)
+        self.assertEqual((event.cover_photo_id, event.cover_is_manual), (self.early.pk, False))
+        self.assertFalse(event.cover_thumbnail.storage.exists(manual_thumbnail))
+
+
+class StatsRollupTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author')
+        self.year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.author)
+        school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=self.year, status='approved', created_by=self.author
+        )
+        self.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=school_class, status='approved', created_by=self.author
+        )
+
+    def upload(self, status, size):
+        photo = Photo.objects.create(
+            event_album=self.event, image=f'photos/{size}.jpg', status=status,
+            file_size=size, uploaded_by=self.author
+        )
+        stats.photos_uploaded([photo.id])
+        return photo
+
+    def rollups(self):
+        return {
+            (row.kind, row.key): (row.count, row.bytes)
+            for row in StatsRollup.objects.exclude(kind='latency')
+            # recompute() пишет и нулевые строки очереди
+            if row.count or row.bytes
+        }
+
+    def test_incremental_totals_match_recompute(self):
+        first = self.upload('approved', 100)
+        pending = self.upload('pending', 50)
+        self.upload('pending', 25)
+        photo_key = stats.TYPES['photo'][0]
+        self.assertEqual(stats.pending_counts()['photo'], 2)
+
+        Photo.objects.filter(pk=pending.pk).update(status='approved')
+        stats.decided('photo', 'approved', [pending.id])
+        rows = stats.photo_rows([first.id])
+        first.delete()
+        stats.photos_removed(rows)
+
+        summary = stats.dashboard()
+        self.assertEqual((summary['total_photos'], summary['total_bytes']), (1, 50))
+        self.assertEqual(summary['events'], [{'id': self.event.pk, 'label': 'Выпускной', 'photos': 1, 'bytes': 50}])
+        self.assertEqual(summary['uploaders'], [{'label': 'author', 'photos': 1, 'bytes': 50}])
+        self.assertEqual(StatsRollup.objects.get(kind='latency', key=photo_key).count, 1)
+
+        incremental = self.rollups()
+        self.assertEqual(incremental[('pending', photo_key)], (1, 0))
+        stats.recompute()
+        self.assertEqual(self.rollups(), incremental)
+
+
+@override_settings(ARCHIVE_TASKS_EAGER=False, ARCHIVE_ACTIVITY_BATCH=3, ARCHIVE_ACTIVITY_FLUSH_SECONDS=3600)
+class ActivityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('parent')
+        self.enterContext(mock.patch.object(activity, '_buffer', []))
+        self.enterContext(mock.patch.object(activity, '_timer', None))
+        self.enqueue = self.enterContext(mock.patch.object(activity.tasks, 'enqueue'))
+        self.addCleanup(lambda: activity._timer and activity._timer.cancel())
+
+    def record(self, action, object_type, object_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.record(self.user, action, object_type, object_ids)
+
+    def daily(self):
+        return {
+            (row.actor_id, row.action, row.object_type): row.count
+            for row in ActivityDaily.objects.filter(day=timezone.localdate())
+        }
+
+    def test_buffer_is_flushed_when_full(self):
+        self.record('upload', 'photo', [1, 2])
+        self.assertIsNotNone(activity._timer)
+        self.enqueue.assert_not_called()
+        self.assertFalse(ActivityEvent.objects.exists())
+
+        self.record('approve', 'photo', [1])
+        self.enqueue.assert_called_once_with(activity.flush)
+        self.assertEqual(activity.flush(), 3)
+        self.assertEqual(activity.flush(), 0)
+        self.assertEqual(ActivityEvent.objects.count(), 3)
+        self.assertEqual(self.daily(), {
+            (self.user.pk, 'upload', 'photo'): 2,
+            (self.user.pk, 'approve', 'photo'): 1,
+        })
+
+    def test_daily_rollup_accumulates_and_rebuilds(self):
+        self.record('upload', 'photo', [1, 2])
+        activity.flush()
+        self.record('upload', 'photo', [3])
+        # Транзакция не завершилась: запись не попадает в буфер
+        activity.record(None, 'delete', 'event', [7])
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.record(None, 'delete', 'event', [8])
+        activity.flush()
+        expected = {(self.user.pk, 'upload', 'photo'): 3, (None, 'delete', 'event'): 1}
+        self.assertEqual(self.daily(), expected)
+
+        ActivityDaily.objects.update(count=0)
+        self.assertEqual(activity.rebuild_daily(), 2)
+        self.assertEqual(self.daily(), expected)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PwaTests(TestCase):
+    def setUp(self):
+        pwa.worker_config.cache_clear()
+        self.addCleanup(pwa.worker_config.cache_clear)
+
+    def test_service_worker_embeds_config(self):
+        response = self.client.get('/sw.js')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/javascript; charset=utf-8')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        escaped = re.search(r"JSON\.parse\('(.*)'\)", response.content.decode()).group(1)
+        config = json.loads(json.loads(f'"{escaped}"'))
+        self.assertEqual(config, pwa.worker_config())
+        self.assertIn('/offline/', config['shell'])
+        self.assertTrue(any(re.match(pattern, '/event/5/') for pattern in config['pages']))
+        self.assertRegex('/api/v1/events/5/photos/', config['gallery'])
+
+    def test_manifest(self):
+        response = self.client.get('/manifest.webmanifest')
+        self.assertEqual(response['Content-Type'], 'application/manifest+json')
+        self.assertIn('Фотоархив'.encode(), response.content)
+        manifest = response.json()
+        self.assertEqual((manifest['start_url'], manifest['scope']), ('/', '/'))
+        self.assertEqual({icon['purpose'] for icon in manifest['icons']}, {'any', 'maskable'})
+
+        page = self.client.get('/')
+        self.assertContains(page, '<link rel="manifest" href="/manifest.webmanifest">')
+        self.assertContains(page, 'data-service-worker="/sw.js"')
+
+
+class CheckDeleteTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='secret')
+        self.other = User.objects.create_user('other', password='secret')
+        self.year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.owner)
+        self.albums = YearAlbum.objects.exclude(status='deleted')
+
+    def test_owner_and_moderators_are_allowed(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        superuser = User.objects.create_user('root', is_superuser=True)
+        for user, expected in [
+            (self.owner, True), (staff, True), (superuser, True),
+            (self.other, False), (AnonymousUser(), False),
+        ]:
+            with self.subTest(user=user.username), self.assertNumQueries(1):
+                allowed, row = permissions.check_delete(user, self.albums, self.year.pk, 'year')
+            self.assertEqual(allowed, expected)
+            self.assertEqual(row, {'created_by_id': self.owner.pk, 'year': '2019-2020'})
+
+    def test_missing_or_filtered_object_is_404(self):
+        with self.assertRaises(Http404):
+            permissions.check_delete(self.owner, self.albums, self.year.pk + 1)
+        YearAlbum.objects.filter(pk=self.year.pk).update(status='deleted')
+        with self.assertRaises(Http404):
+            permissions.check_delete(self.owner, self.albums, self.year.pk)
+
+    def test_delete_view_refuses_other_users(self):
+        self.client.force_login(self.other)
+        response = self.client.post(f'/year/{self.year.pk}/delete/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual(YearAlbum.objects.get(pk=self.year.pk).status, 'approved')
+
+        self.client.force_login(self.owner)
+        self.client.post(f'/year/{self.year.pk}/delete/')
+        self.assertEqual(YearAlbum.objects.get(pk=self.year.pk).status, 'deleted')
+
+
+@override_settings(STORAGES=TEST_STORAGES, ARCHIVE_RATE_LIMITS={})
+class BatchUploadTests(TestCase):
+    URL = '/api/v1/uploads/'
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root.name))
+        self.parent = User.objects.create_user('parent', password='secret')
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.staff)
+        school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=year, status='approved', created_by=self.staff
+        )
+        self.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=school_class, status='approved', created_by=self.staff
+        )
+
+    def files(self):
+        return {
+            'event': str(self.event.pk),
+            'images': [
+                SimpleUploadedFile('first.jpg', jpeg('red')),
+                SimpleUploadedFile('notes.txt', b'not an image'),
+                SimpleUploadedFile('second.jpg', jpeg('blue')),
+            ],
+        }
+
+    def test_requires_authentication_and_csrf_for_sessions(self):
+        client = Client(enforce_csrf_checks=True)
+        self.assertEqual(client.post(self.URL, self.files()).status_code, 401)
+        client.force_login(self.parent)
+        self.assertEqual(client.post(self.URL, self.files()).status_code, 401)
+        self.assertFalse(Photo.objects.exists())
+
+        token = 'a' * 32
+        client.cookies['csrftoken'] = token
+        response = client.post(self.URL, self.files(), HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'pending')
+
+    def test_basic_auth_upload_reports_each_file(self):
+        credentials = base64.b64encode(b'staff:secret').decode()
+        response = Client(enforce_csrf_checks=True).post(
+            self.URL, self.files(), HTTP_AUTHORIZATION=f'Basic {credentials}'
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['status'], data['created'], data['failed']), ('approved', 2, 1))
+        self.assertEqual([item['file'] for item in data['results']], ['first.jpg', 'notes.txt', 'second.jpg'])
+        self.assertEqual(data['results'][1], {'file': 'notes.txt', 'ok': False, 'error': 'Файл не является изображением'})
+        ids = [item['id'] for item in data['results'] if item['ok']]
+        self.assertEqual(sorted(Photo.objects.filter(event_album=self.event).values_list('id', flat=True)), sorted(ids))
+
+        wrong = base64.b64encode(b'staff:wrong').decode()
+        response = self.client.post(self.URL, self.files(), HTTP_AUTHORIZATION=f'Basic {wrong}')
+        self.assertEqual(response.status_code, 401)
+
+
+class PhotoStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root.name))
+        self.storage = Photo._meta.get_field('image').storage
+        self.author = User.objects.create_user('author', password='secret')
+        year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.author)
+        school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=year, status='approved', created_by=self.author
+        )
+        self.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=school_class, status='approved', created_by=self.author
+        )
+
+    def test_same_content_is_stored_once_under_sharded_name(self):
+        digest = hashlib.sha256(b'photo').hexdigest()
+        first = self.storage.save('photos/IMG_0001.JPG', ContentFile(b'photo'))
+        second = self.storage.save('photos/copy.jpg', ContentFile(b'photo'))
+        self.assertEqual(first, f'photos/{digest[:2]}/{digest[2:4]}/{digest}.jpg')
+        self.assertEqual(second, first)
+        self.assertEqual(os.listdir(os.path.dirname(self.storage.path(first))), [f'{digest}.jpg'])
+
+    def test_migrate_moves_flat_files_to_sharded_names(self):
+        flat = {'photos/a.jpg': b'same', 'photos/b.jpg': b'same', 'photos/c.jpg': b'other'}
+        for name, content in flat.items():
+            default_storage.save(name, ContentFile(content))
+        photos = [
+            Photo.objects.create(event_album=self.event, image=name, uploaded_by=self.author)
+            for name in [*flat, 'photos/missing.jpg']
+        ]
+        output = io.StringIO()
+        call_command('migrate_photo_storage', stdout=output, stderr=io.StringIO())
+        self.assertIn('Перенесено фото: 3, с ошибками: 1', output.getvalue())
+
+        names = [Photo.objects.get(pk=photo.pk).image.name for photo in photos]
+        self.assertEqual(names[0], names[1])
+        self.assertEqual(names[3], 'photos/missing.jpg')
+        for name, content in zip(names[:3], flat.values()):
+            self.assertRegex(name, SHARDED_NAME_RE)
+            with self.storage.open(name) as stored:
+                self.assertEqual(stored.read(), content)
+        for name in flat:
+            self.assertFalse(default_storage.exists(name))
+
+
+@override_settings(ARCHIVE_TASKS_EAGER=True, ARCHIVE_DELETE_CHUNK_SIZE=2)
+class PurgeDeletedTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root.name))
+        self.storage = Photo._meta.get_field('image').storage
+        self.author = User.objects.create_user('author', password='secret')
+        self.year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=self.author)
+        kept_class = SchoolClass.objects.create(
+            class_name='11А', year_album=self.year, status='approved', created_by=self.author
+        )
+        doomed_class = SchoolClass.objects.create(
+            class_name='11Б', year_album=self.year, status='approved', created_by=self.author
+        )
+        self.kept_event = EventAlbum.objects.create(
+            title='Выпускной', school_class=kept_class, status='approved', created_by=self.author
+        )
+        self.doomed_event = EventAlbum.objects.create(
+            title='Последний звонок', school_class=doomed_class, status='approved', created_by=self.author
+        )
+        self.shared = self.photo(self.kept_event, b'shared')
+        self.doomed = [self.photo(self.doomed_event, b'shared')]
+        self.doomed += [self.photo(self.doomed_event, f'own {index}'.encode()) for index in range(4)]
+        # Обложка уцелевшего года - фото из удаляемого класса
+        YearAlbum.objects.filter(pk=self.year.pk).update(cover_photo=self.doomed[1])
+
+    def photo(self, event, content):
+        name = self.storage.save('photos/photo.jpg', ContentFile(content))
+        return Photo.objects.create(event_album=event, image=name, status='approved', uploaded_by=self.author)
+
+    def test_purges_photos_albums_and_unshared_files(self):
+        doomed_class = self.doomed_event.school_class
+        # Фоновое удаление ставится после коммита; здесь запускаем его сами
+        deletion.soft_delete(doomed_class)
+        self.assertEqual(SchoolClass.objects.get(pk=doomed_class.pk).status, 'deleted')
+        self.assertEqual(EventAlbum.objects.get(pk=self.doomed_event.pk).status, 'deleted')
+
+        self.assertEqual(deletion.purge_deleted(), len(self.doomed))
+        self.assertFalse(Photo.objects.filter(event_album=self.doomed_event).exists())
+        self.assertFalse(SchoolClass.objects.filter(pk=doomed_class.pk).exists())
+        self.assertFalse(EventAlbum.objects.filter(pk=self.doomed_event.pk).exists())
+        self.assertTrue(Photo.objects.filter(pk=self.shared.pk).exists())
+        # Общий файл остаётся, пока на него ссылается уцелевшее фото
+        self.assertTrue(self.storage.exists(self.shared.image.name))
+        for photo in self.doomed[1:]:
+            self.assertFalse(self.storage.exists(photo.image.name))
+        self.assertIsNone(YearAlbum.objects.get(pk=self.year.pk).cover_photo_id)
+
+    def test_cards_count_only_approved_children_and_refresh_after_purge(self):
+        doomed_class = self.doomed_event.school_class
+        deletion.soft_delete(doomed_class)
+        version = YearAlbum.objects.get(pk=self.year.pk).cache_version
+        with self.settings(STORAGES=TEST_STORAGES):
+            self.assertContains(self.client.get('/'), '1 классов')
+            self.assertContains(self.client.get(f'/year/{self.year.pk}/'), '1 событий')
+        deletion.purge_deleted()
+        # Кэшированная карточка года собирается заново
+        self.assertGreater(YearAlbum.objects.get(pk=self.year.pk).cache_version, version)
+
+    def test_upload_reusing_file_deleted_before_commit_rewrites_it(self):
+        doomed = self.doomed[0]
+        rows = [(doomed.image.name, '', '')]
+        Photo.objects.filter(pk__in=[self.shared.pk, doomed.pk]).delete()
+        store_image = ingest._store_image
+
+        def store_then_delete(result):
+            # save() нашёл файл и вернул его имя, а удаление успевает
+            # стереть его до того, как загрузка создаст запись
+            name = store_image(result)
+            if rows:
+                deletion.remove_photo_files([rows.pop()])
+                self.assertFalse(self.storage.exists(name))
+            return name
+
+        result = ingest.IngestResult(
+            source_name='photo.jpg',
+            content=ContentFile(b'shared', name='photo.jpg'),
+            metadata=imaging.empty_metadata((1, 1)),
+            file_size=6,
+        )
+        with mock.patch.object(ingest, '_store_image', side_effect=store_then_delete):
+            [photo] = ingest.create_photos(self.kept_event, self.author, 'approved', [result])
+        self.assertEqual(photo.image.name, doomed.image.name)
+        self.assertTrue(self.storage.exists(photo.image.name))
+
+    def test_delete_rechecks_references_under_lock(self):
+        doomed = self.doomed[1]
+        Photo.objects.filter(pk=doomed.pk).delete()
+        orphans = [(self.storage, doomed.image.name)]
+        # Между поиском сирот и удалением загрузка сослалась на тот же файл
+        self.photo(self.kept_event, b'own 0')
+        deletion.delete_unreferenced(orphans)
+        self.assertTrue(self.storage.exists(doomed.image.name))
+        Photo.objects.filter(image=doomed.image.name).delete()
+        deletion.delete_unreferenced(orphans)
+        self.assertFalse(self.storage.exists(doomed.image.name))
+
+
+class SimilarityTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(self.settings(
+            MEDIA_ROOT=os.path.join(root.name, 'media'),
+            ARCHIVE_FEATURES_ROOT=os.path.join(root.name, 'features'),
+        ))
+        self.storage = Photo._meta.get_field('image').storage
+        author = User.objects.create_user('author', password='secret')
+        year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=author)
+        school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=year, status='approved', created_by=author
+        )
+        self.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=school_class, status='approved', created_by=author
+        )
+        self.author = author
+
+    def photo(self, name):
+        return Photo.objects.create(
+            event_album=self.event, image=name, status='approved', uploaded_by=self.author
+        )
+
+    def test_extract_retries_failed_photos_and_finds_neighbours(self):
+        # Файла первого фото пока нет: вектор для него не извлечётся
+        red = self.photo('photos/red.jpg')
+        dark_red = self.photo(self.storage.save('photos/dark.jpg', ContentFile(jpeg((200, 10, 10)))))
+        blue = self.photo(self.storage.save('photos/blue.jpg', ContentFile(jpeg((10, 10, 230)))))
+        output = io.StringIO()
+        call_command('extract_features', '--workers', '1', stdout=output)
+        self.assertIn('добавлено: 2, не удалось прочитать: 1', output.getvalue())
+
+        with open(self.storage.path('photos/red.jpg'), 'wb') as output:
+            output.write(jpeg((250, 0, 0)))
+        output = io.StringIO()
+        call_command('extract_features', '--workers', '1', stdout=output)
+        self.assertIn('добавлено: 1, не удалось прочитать: 0', output.getvalue())
+
+        ids, _ = similarity.get_store().load()
+        self.assertEqual(ids.tolist(), [red.id, dark_red.id, blue.id])
+        response = self.client.get(f'/api/v1/photos/{red.id}/similar/?fields=id&limit=2')
+        self.assertEqual([item['id'] for item in response.json()['data']], [dark_red.id, blue.id])
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        self.enterContext(self.settings(MEDIA_ROOT=os.path.join(root.name, 'media'), STORAGES=TEST_STORAGES))
+
+    def test_benchmark_reports_seeded_routes(self):
+        call_command(
+            'seed_archive', '--years', '1', '--classes', '1', '--events', '1', '--photos', '2',
+            '--uploaders', '1', '--pending-ratio', '0', stdout=io.StringIO(),
+        )
+        self.assertEqual(Photo.objects.filter(status='approved').count(), 2)
+        report_path = os.path.join(self.root, 'report.json')
+        call_command(
+            'benchmark', '--iterations', '2', '--only', 'home', '--only', 'event_detail',
+            '--output', report_path, stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+        with open(report_path, encoding='utf-8') as report_file:
+            report = json.load(report_file)
+        self.assertEqual(set(report['views']), {'home', 'event_detail'})
+        for result in report['views'].values():
+            self.assertEqual(result['statuses'], [200])
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['response_bytes'], 0)
+
+    def test_load_run_counts_statuses_and_errors(self):
+        async def app(scope, receive, send):
+            if scope['query_string'] == b'fail':
+                raise RuntimeError('boom')
+            await receive()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b'ok'})
+
+        result = asyncio.run(loadtest.run_load('ok', loadtest.asgi_sender(app, '/'), 7, 3))
+        self.assertEqual((result['requests'], result['errors'], result['statuses']), (7, 0, {'200': 7}))
+        self.assertEqual(result['avg_response_bytes'], 2)
+        result = asyncio.run(loadtest.run_load('fail', loadtest.asgi_sender(app, '/?fail'), 4, 2))
+        self.assertEqual((result['requests'], result['errors']), (4, 4))
+
+
+class BackupRestoreTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.media = os.path.join(root.name, 'media')
+        self.dest = os.path.join(root.name, 'backups')
+        self.database = os.path.join(root.name, 'db.sqlite3')
+        database = sqlite3.connect(self.database)
+        database.execute('CREATE TABLE archive (id INTEGER PRIMARY KEY)')
+        database.close()
+        self.enterContext(self.settings(MEDIA_ROOT=self.media, ARCHIVE_ORIGINALS_ROOT=None))
+        self.enterContext(mock.patch.object(backup, 'sqlite_path', return_value=self.database))
+        for name, content in (('a.jpg', b'first'), ('b.jpg', b'second')):
+            self.write(name, content)
+
+    def path(self, name):
+        return os.path.join(self.media, 'photos', name)
+
+    def write(self, name, content):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), 'wb') as output:
+            output.write(content)
+
+    def read(self, name):
+        with open(self.path(name), 'rb') as source:
+            return source.read()
+
+    def test_round_trip_restores_missing_and_changed_files(self):
+        call_command('backup', self.dest, stdout=io.StringIO())
+        os.remove(self.path('a.jpg'))
+        # Тот же размер и mtime, другое содержимое
+        stat = os.stat(self.path('b.jpg'))
+        self.write('b.jpg', b'SECOND')
+        os.utime(self.path('b.jpg'), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        with self.assertRaisesMessage(CommandError, '--force'):
+            call_command('restore', self.dest, stdout=io.StringIO())
+        output = io.StringIO()
+        call_command('restore', self.dest, '--force', stdout=output)
+        self.assertIn('файлов: 2', output.getvalue())
+        self.assertEqual(self.read('a.jpg'), b'first')
+        self.assertEqual(self.read('b.jpg'), b'second')
+        # Повторное восстановление ничего не копирует
+        output = io.StringIO()
+        call_command('restore', self.dest, '--force', stdout=output)
+        self.assertIn('файлов: 0', output.getvalue())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+        year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=cls.user)
+        school_class = SchoolClass.objects.create(
+            class_name='11А', year_album=year, status='approved', created_by=cls.user
+        )
+        cls.event = EventAlbum.objects.create(
+            title='Выпускной', school_class=school_class, status='approved', created_by=cls.user
+        )
+        cls.photo = Photo.objects.create(
+            event_album=cls.event, image='photos/aa.jpg', status='approved', uploaded_by=cls.user
+        )
+
+    async def asyncSetUp(self):
+        await cache.aclear()
+        await self.async_client.aforce_login(self.user)
+
+    async def test_search_and_suggest(self):
+        response = await self.async_client.get('/search/?q=20')
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/search/?q=20', headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual([item['year'] for item in response.json()['results']], ['2019-2020'])
+        response = await self.async_client.get('/api/v1/suggest/?q=Вып')
+        self.assertEqual([item['type'] for item in response.json()['results']], ['event'])
+
+    async def test_event_photos_revalidate_by_etag(self):
+        url = f'/api/v1/events/{self.event.id}/photos/'
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([photo['id'] for photo in response.json()['photos']], [self.photo.id])
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_resources_and_timeline(self):
+        response = await self.async_client.get(f'/api/v1/photos/{self.photo.id}/?fields=id,event_id')
+        self.assertEqual(response.json()['data'], {'id': self.photo.id, 'event_id': self.event.id})
+        response = await self.async_client.get('/api/v1/timeline/?unit=week')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(bucket['photos'] for bucket in response.json()['data']), 1)
+        response = await self.async_client.get('/api/v1/timeline/?unit=day')
+        self.assertEqual(response.status_code, 400)
+
+
+class CachedModelBackendTests(TestCase):
+    def test_local_cache_keeps_users_briefly(self):
+        self.assertEqual(auth.user_cache_seconds(), 5)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(auth.user_cache_seconds(), 300)
+
+    def test_saving_user_drops_cached_copy(self):
+        cache.clear()
+        user = User.objects.create_user('reader', password='secret')
+        backend = auth.CachedModelBackend()
+        self.assertEqual(backend.get_user(user.pk), user)
+        with self.assertNumQueries(0):
+            backend.get_user(user.pk)
+        user.is_active = False
+        user.save()
+        self.assertIsNone(backend.get_user(user.pk))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class TemplateCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user('author', password='secret')
+        self.year = YearAlbum.objects.create(year='2019-2020', status='approved', created_by=author)
+
+    def test_templates_are_compiled_once(self):
+        from django.template import engines
+        from django.template.loaders.cached import Loader
+
+        [loader] = engines.all()[0].engine.template_loaders
+        self.assertIsInstance(loader, Loader)
+        self.client.get('/')
+        self.assertIn('media_archive/home.html', {key.split('-')[0] for key in loader.get_template_cache})
+
+    def test_album_card_is_cached_until_its_version_changes(self):
+        self.assertContains(self.client.get('/'), '>2019-2020</div>')
+        # Обновление без save() не меняет cache_version: карточка из кэша
+        YearAlbum.objects.filter(pk=self.year.pk).update(year='2020-2021')
+        response = self.client.get('/')
+        self.assertContains(response, '>2019-2020</div>')
+        self.assertNotContains(response, '>2020-2021</div>')
+        bump_cache_version(YearAlbum, self.year.pk)
+        response = self.client.get('/')
+        self.assertContains(response, '>2020-2021</div>')
+        self.assertNotContains(response, '>2019-2020</div>')
+        # Стили страниц вынесены в статические файлы, а не во встроенный <style>
+        self.assertContains(response, 'media_archive/css/base.css')
+
+
+class StartupTests(SimpleTestCase):
+    def test_startup_does_not_import_pillow_or_numpy(self):
+        output = io.StringIO()
+        # Время старта зависит от машины; здесь проверяются только ленивые импорты
+        call_command('startup_benchmark', '--runs', '1', '--budget-ms', '60000', stdout=output)
+        self.assertIn('Старт укладывается в бюджет', output.getvalue())
+
+    def test_media_folders_are_created_by_system_check(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media_root = os.path.join(root.name, 'media')
+        with self.settings(MEDIA_ROOT=media_root):
+            self.assertEqual(checks.check_media_folders(None), [])
+        self.assertTrue(os.path.isdir(os.path.join(media_root, 'photos')))
+
+
+class CompressionTests(SimpleTestCase):
+    def setUp(self):
+        compression._cache = None
+        self.middleware = compression.CompressionMiddleware(lambda request: None)
+        self.request = RequestFactory().get('/', headers={'Accept-Encoding': 'gzip, br'})
+
+    def respond(self, personal=False):
+        response = HttpResponse('<p>Фотоархив</p>' * 200)
+        if personal:
+            response.set_cookie(settings.CSRF_COOKIE_NAME, 'token')
+        return self.middleware.process_response(self.request, response)
+
+    def test_personal_responses_use_padded_gzip_without_cache(self):
+        self.assertEqual(self.respond(personal=True)['Content-Encoding'], 'gzip')
+        self.respond(personal=True)
+        cache = compression.body_cache()
+        self.assertEqual((cache.hits, len(cache.entries)), (0, 0))
+
+    def test_public_responses_are_cached(self):
+        first = self.respond()
+        second = self.respond()
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(compression.body_cache().hits, 1)
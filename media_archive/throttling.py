@@ -0,0 +1,211 @@
+import collections
+import functools
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+# Ограничение частоты запросов и одновременных загрузок.
+#
+# rate_limit - лимит на каждого пользователя (или IP для анонимов):
+# не больше burst запросов за окно burst / rate секунд, то есть в среднем
+# rate в секунду. Запрос занимает в окне место с номером n через
+# cache.add, а это атомарная операция на любом бэкенде кэша, поэтому
+# одновременные запросы не затирают друг друга. Счётчик окна - только
+# подсказка, с какого места начинать. С LocMemCache лимит действует на
+# процесс, с общим кэшем (DatabaseCache на SQLite, Redis) - на весь сайт.
+#
+# ingest_slot - общий на процесс лимит одновременных загрузок. Остальные
+# загрузки ждут своей очереди не дольше ARCHIVE_INGEST_QUEUE_TIMEOUT
+# и в порядке прихода, а если очередь уже полна, сразу получают 429
+# с Retry-After. Чтение страниц при этом не ждёт диска.
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'30/m' -> 0.5 запроса в секунду"""
+    count, _, unit = rate.partition('/')
+    return int(count) / RATE_UNITS[unit[:1] or 's']
+
+
+def client_ip(request):
+    header = getattr(settings, 'ARCHIVE_CLIENT_IP_HEADER', None)
+    if header and request.META.get(header):
+        # Например HTTP_X_REAL_IP за nginx; без прокси заголовку верить нельзя
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_key(request, user=None):
+    if user is None:
+        user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'u{user.pk}'
+    return f'ip{client_ip(request)}'
+
+
+async def aclient_key(request):
+    # request.user в корутине читать нельзя: ленивый объект идёт в базу синхронно
+    auser = getattr(request, 'auser', None)
+    return client_key(request, await auser() if auser is not None else None)
+
+
+def _window(scope, key, rate, burst):
+    """Ключ текущего окна, срок его хранения и сколько секунд до следующего."""
+    length = burst / rate
+    now = time.time()
+    number = int(now // length)
+    return f'ratelimit:{scope}:{key}:{number}', math.ceil(length) + 1, (number + 1) * length - now
+
+
+def take_token(scope, key, rate, burst):
+    """Занимает место в окне. Возвращает 0 или через сколько секунд оно появится."""
+    window, timeout, retry_after = _window(scope, key, rate, burst)
+    for place in range(cache.get(window, 0), burst):
+        if cache.add(f'{window}:{place}', True, timeout):
+            cache.set(window, place + 1, timeout)
+            return 0
+    return retry_after
+
+
+async def atake_token(scope, key, rate, burst):
+    window, timeout, retry_after = _window(scope, key, rate, burst)
+    for place in range(await cache.aget(window, 0), burst):
+        if await cache.aadd(f'{window}:{place}', True, timeout):
+            await cache.aset(window, place + 1, timeout)
+            return 0
+    return retry_after
+
+
+def too_many_requests(request, retry_after, message):
+    retry_after = max(1, math.ceil(retry_after))
+    wants_json = (
+        request.path.startswith('/api/')
+        or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    )
+    if wants_json:
+        response = JsonResponse({'error': message, 'retry_after': retry_after}, status=429)
+    else:
+        response = HttpResponse(
+            f'{message}. Повторите через {retry_after} с.',
+            status=429, content_type='text/plain; charset=utf-8',
+        )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _limit_for(scope):
+    limit = getattr(settings, 'ARCHIVE_RATE_LIMITS', {}).get(scope)
+    if not limit:
+        return None
+    return parse_rate(limit['rate']), limit.get('burst', 1)
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Декоратор представления: лимит ARCHIVE_RATE_LIMITS[scope] на клиента
+    для запросов с методами methods."""
+
+    def check(request):
+        limit = _limit_for(scope) if request.method in methods else None
+        if limit is None:
+            return None
+        wait = take_token(scope, client_key(request), *limit)
+        if wait:
+            return too_many_requests(request, wait, 'Слишком много запросов')
+        return None
+
+    async def acheck(request):
+        limit = _limit_for(scope) if request.method in methods else None
+        if limit is None:
+            return None
+        wait = await atake_token(scope, await aclient_key(request), *limit)
+        if wait:
+            return too_many_requests(request, wait, 'Слишком много запросов')
+        return None
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            async def wrapper(request, *args, **kwargs):
+                response = await acheck(request)
+                if response is not None:
+                    return response
+                return await view_func(request, *args, **kwargs)
+            markcoroutinefunction(wrapper)
+        else:
+            def wrapper(request, *args, **kwargs):
+                response = check(request)
+                if response is not None:
+                    return response
+                return view_func(request, *args, **kwargs)
+        return functools.wraps(view_func)(wrapper)
+
+    return decorator
+
+
+class IngestGate:
+    """Не больше limit одновременных загрузок, остальные ждут по очереди."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = 0
+        self.queue = collections.deque()
+
+    def acquire(self, limit, queue_size, timeout):
+        with self.condition:
+            if not self.queue and self.active < limit:
+                self.active += 1
+                return True
+            if len(self.queue) >= queue_size:
+                return False
+            waiter = object()
+            self.queue.append(waiter)
+            deadline = time.monotonic() + timeout
+            try:
+                while self.queue[0] is not waiter or self.active >= limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self.condition.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.queue.remove(waiter)
+                self.condition.notify_all()
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+
+_gate = IngestGate()
+
+
+def ingest_slot(view_func):
+    """Декоратор загрузок: POST проходит, только получив слот в _gate."""
+
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view_func(request, *args, **kwargs)
+        acquired = _gate.acquire(
+            getattr(settings, 'ARCHIVE_INGEST_CONCURRENCY', 2),
+            getattr(settings, 'ARCHIVE_INGEST_QUEUE', 8),
+            getattr(settings, 'ARCHIVE_INGEST_QUEUE_TIMEOUT', 10),
+        )
+        if not acquired:
+            return too_many_requests(
+                request, getattr(settings, 'ARCHIVE_INGEST_RETRY_AFTER', 15),
+                'Сервер занят загрузкой других фотографий',
+            )
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _gate.release()
+
+    return wrapper
@@ -0,0 +1,142 @@
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Photo
+
+# Лента архива по датам съёмки поперёк иерархии год → класс → событие.
+#
+# Период - месяц или неделя (с понедельника) по местному времени. Итог
+# периода - число одобренных фото и события, в которых они сняты, с
+# обложками. Недостающие в кэше периоды считаются одним сгруппированным
+# запросом по диапазону taken_at (индекс photo_timeline_idx) и кладутся в
+# кэш по отдельности. Загрузка, решение модератора, удаление и смена
+# обложки события удаляют из кэша только периоды, на которые пришлись
+# затронутые фото.
+
+UNITS = ('month', 'week')
+TRUNCATE = {'month': TruncMonth, 'week': TruncWeek}
+EVENTS_PER_BUCKET = 12
+
+# Какие фото затрагивает решение или удаление объекта каждого типа
+PHOTO_FILTERS = {
+    'photo': 'id__in',
+    'event': 'event_album_id__in',
+    'class': 'event_album__school_class_id__in',
+    'year': 'event_album__school_class__year_album_id__in',
+}
+
+
+def bucket_start(day, unit):
+    if unit == 'month':
+        return day.replace(day=1)
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def next_bucket(start, unit):
+    if unit == 'month':
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + datetime.timedelta(days=7)
+
+
+def bucket_starts(unit, first, last):
+    """Начала периодов, пересекающихся с днями first..last."""
+    starts = []
+    start = bucket_start(first, unit)
+    while start <= last:
+        starts.append(start)
+        start = next_bucket(start, unit)
+    return starts
+
+
+def _key(unit, start):
+    return f'timeline:{unit}:{start.isoformat()}'
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+
+
+def _query(unit, starts):
+    """Итоги периодов starts (подряд идущих) одним запросом."""
+    buckets = {start: {'start': start, 'photos': 0, 'events': []} for start in starts}
+    rows = Photo.objects.filter(
+        status='approved',
+        event_album__status='approved',
+        event_album__school_class__status='approved',
+        event_album__school_class__year_album__status='approved',
+        taken_at__gte=_midnight(starts[0]),
+        taken_at__lt=_midnight(next_bucket(starts[-1], unit)),
+    ).annotate(bucket=TRUNCATE[unit]('taken_at')).values(
+        'bucket', 'event_album_id', 'event_album__title',
+        'event_album__school_class__class_name', 'event_album__cover_thumbnail',
+    ).annotate(total=Count('id'), first_taken=Min('taken_at')).order_by('first_taken')
+    for row in rows:
+        bucket = buckets[timezone.localtime(row['bucket']).date()]
+        bucket['photos'] += row['total']
+        cover = row['event_album__cover_thumbnail']
+        bucket['events'].append({
+            'id': row['event_album_id'],
+            'title': row['event_album__title'],
+            'class_name': row['event_album__school_class__class_name'],
+            'photos': row['total'],
+            'cover_url': default_storage.url(cover) if cover else None,
+        })
+    for bucket in buckets.values():
+        bucket['events_total'] = len(bucket['events'])
+        del bucket['events'][EVENTS_PER_BUCKET:]
+    return buckets
+
+
+def buckets(unit, first, last):
+    """Итоги периодов, пересекающихся с днями first..last, по порядку."""
+    starts = bucket_starts(unit, first, last)
+    keys = {start: _key(unit, start) for start in starts}
+    cached = cache.get_many(keys.values())
+    result = {start: cached[key] for start, key in keys.items() if key in cached}
+    missing = [start for start in starts if start not in result]
+    if missing:
+        # Один запрос на весь диапазон пропусков: обычно это весь экран
+        # после холодного старта или один-два сброшенных периода
+        computed = _query(unit, bucket_starts(unit, missing[0], missing[-1]))
+        timeout = getattr(settings, 'ARCHIVE_TIMELINE_CACHE_SECONDS', 86400)
+        cache.set_many({keys[start]: computed[start] for start in missing}, timeout)
+        result.update((start, computed[start]) for start in missing)
+    return [result[start] for start in starts]
+
+
+def touch(moments):
+    """Сбрасывает кэш периодов, на которые приходятся моменты съёмки
+    moments, после успешного завершения текущей транзакции."""
+    _touch_days({timezone.localtime(moment).date() for moment in moments if moment is not None})
+
+
+def _touch_days(days):
+    keys = {_key(unit, bucket_start(day, unit)) for day in days for unit in UNITS}
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def touch_objects(object_type, ids):
+    """Сбрасывает периоды с одобренными фото объектов ids; при удалении
+    вызывать до него."""
+    if not ids:
+        return
+    days = Photo.objects.filter(status='approved', **{PHOTO_FILTERS[object_type]: ids}).annotate(
+        day=TruncDate('taken_at')
+    ).values_list('day', flat=True).distinct().order_by()
+    _touch_days(set(days))
+
+
+def decided(object_type, status, ids):
+    # В ленту попадают одобренные фото, у которых одобрены событие, класс
+    # и год: одобрение любого из них может открыть фото, отклонение
+    # ожидающего модерации объекта ленту не меняет
+    if status == 'approved':
+        touch_objects(object_type, ids)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -27,5 +27,31 @@ urlpatterns = [
     path('class/<int:class_id>/delete/', views.delete_class, name='delete_class'),
     path('event/<int:event_id>/delete/', views.delete_event, name='delete_event'),
     path('photo/<int:photo_id>/delete/', views.delete_photo, name='delete_photo'),
+    path('photo/<int:photo_id>/set-cover/', views.set_cover, name='set_cover'),
+    path('stats/', views.activity_stats, name='activity_stats'),
+    path('stats/archive/', views.archive_stats, name='archive_stats'),
+    path('timeline/', views.timeline_view, name='timeline'),
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('manifest.webmanifest', views.web_manifest, name='web_manifest'),
+    path('offline/', views.offline, name='offline'),
     path('debug/', views.debug_home, name='debug_home'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('profiles/', views.profiles_view, name='profiles'),
+    path('profiles/<str:name>.prof', views.profile_download, name='profile_download'),
+    path('api/v1/years/', api.years, name='api_years'),
+    path('api/v1/years/<int:year_id>/', api.year, name='api_year'),
+    path('api/v1/classes/', api.classes, name='api_classes'),
+    path('api/v1/classes/<int:class_id>/', api.school_class, name='api_class'),
+    path('api/v1/events/', api.events, name='api_events'),
+    path('api/v1/events/<int:event_id>/', api.event, name='api_event'),
+    path('api/v1/events/<int:event_id>/photos/', api.event_photos, name='api_event_photos'),
+    path('api/v1/photos/', api.photos, name='api_photos'),
+    path('api/v1/photos/<int:photo_id>/', api.photo, name='api_photo'),
+    path('api/v1/photos/<int:photo_id>/similar/', api.similar_photos, name='api_similar_photos'),
+    path('api/v1/uploads/', api.batch_upload, name='api_batch_upload'),
+    path('api/v1/suggest/', api.suggest, name='api_suggest'),
+    path('api/v1/timeline/', api.timeline_buckets, name='api_timeline'),
+    path('api/v1/moderation/claim/', api.moderation_claim, name='api_moderation_claim'),
+    path('api/v1/moderation/decide/', api.moderation_decide, name='api_moderation_decide'),
+    path('api/v1/moderation/release/', api.moderation_release, name='api_moderation_release'),
 ]
\ No newline at end of file
@@ -1,48 +1,81 @@
 # views.py
+import asyncio
+import json
+import mimetypes
+import os
+import re
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Count, Q
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils import timezone
+from django.utils.http import http_date
+from django.views.static import was_modified_since
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django import forms
 from django.contrib.auth.models import User
-from .models import YearAlbum, SchoolClass, EventAlbum, Photo
+from .models import YearAlbum, SchoolClass, EventAlbum, Photo, ActivityEvent, ActivityDaily, bump_cache_version
 from .forms import YearAlbumForm, SchoolClassForm, EventAlbumForm, PhotoUploadForm
+from .decorators import admin_required
+from .throttling import ingest_slot, rate_limit
+from . import activity, covers, deletion, ingest, metrics, moderation, permissions, profiling, pwa, stats, timeline
+
+def _with_card_counts(years):
+    # Карточки показывают только одобренные классы: удалённые и ожидающие
+    # модерации не должны попадать в кэшированный фрагмент
+    return years.annotate(approved_classes_total=Count('classes', filter=Q(classes__status='approved')))
 
 def home(request):
-    years = YearAlbum.objects.filter(status='approved').order_by('-year')
+    years = _with_card_counts(YearAlbum.objects.filter(status='approved')).order_by('-year')
     grouped_years = []
     for i in range(0, len(years), 3):
         grouped_years.append(years[i:i + 3])
     return render(request, 'media_archive/home.html', {'years': grouped_years})
 
-def search_years(request):
+@rate_limit('search', methods=('GET',))
+async def search_years(request):
     query = request.GET.get('q', '').strip()
     years = YearAlbum.objects.filter(status='approved')
     if query:
         years = years.filter(year__icontains=query)
     years = years.order_by('-year')
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        years = years.annotate(
+            classes_total=Count('classes'),
+            approved_classes_total=Count('classes', filter=Q(classes__status='approved'))
+        )
         results = []
-        for year in years:
+        async for year in years:
             results.append({
                 'year': year.year,
                 'id': year.id,
-                'classes_count': year.classes.count(),
-                'approved_classes_count': year.classes.filter(status='approved').count()
+                'classes_count': year.classes_total,
+                'approved_classes_count': year.approved_classes_total,
+                'cover_url': year.cover_thumbnail.url if year.cover_thumbnail else None
             })
         return JsonResponse({'results': results})
+    years = [year async for year in _with_card_counts(years)]
     grouped_years = []
     for i in range(0, len(years), 3):
         grouped_years.append(years[i:i + 3])
-    return render(request, 'media_archive/home.html', {
+    # Шаблон обращается к базе (счётчики, пользователь), поэтому рендерим в потоке
+    return await sync_to_async(render)(request, 'media_archive/home.html', {
         'years': grouped_years,
         'search_query': query
     })
 
 def year_detail(request, year_id):
     year = get_object_or_404(YearAlbum, id=year_id, status='approved')
-    classes = year.classes.filter(status='approved').order_by('created_at')
+    classes = year.classes.filter(status='approved').annotate(
+        approved_events_total=Count('events', filter=Q(events__status='approved'))
+    ).order_by('created_at')
     classes_grouped = []
     for i in range(0, len(classes), 3):
         classes_grouped.append(classes[i:i + 3])
@@ -53,7 +86,9 @@ def year_detail(request, year_id):
 
 def class_detail(request, class_id):
     school_class = get_object_or_404(SchoolClass, id=class_id, status='approved')
-    events = school_class.events.filter(status='approved').order_by('created_at')
+    events = school_class.events.filter(status='approved').annotate(
+        approved_photos_total=Count('photos', filter=Q(photos__status='approved'))
+    ).order_by('created_at')
     events_grouped = []
     for i in range(0, len(events), 3):
         events_grouped.append(events[i:i + 3])
@@ -64,7 +99,7 @@ def class_detail(request, class_id):
 
 def event_detail(request, event_id):
     event = get_object_or_404(EventAlbum, id=event_id, status='approved')
-    photos = event.photos.filter(status='approved').order_by('uploaded_at')
+    photos = event.photos.filter(status='approved').select_related('uploaded_by').order_by('taken_at', 'id')
     return render(request, 'media_archive/event_detail.html', {
         'event': event,
         'photos': photos
@@ -72,28 +107,25 @@ def event_detail(request, event_id):
 
 @login_required
 def profile(request):
-    user_years = YearAlbum.objects.filter(created_by=request.user)
-    user_classes = SchoolClass.objects.filter(created_by=request.user)
-    user_events = EventAlbum.objects.filter(created_by=request.user)
-    user_photos = Photo.objects.filter(uploaded_by=request.user).order_by('uploaded_at')
-    pending_years_count = 0
-    pending_classes_count = 0
-    pending_events_count = 0
-    pending_photos_count = 0
+    user_years = YearAlbum.objects.filter(created_by=request.user).exclude(status='deleted')
+    user_classes = SchoolClass.objects.filter(created_by=request.user).exclude(status='deleted')
+    user_events = EventAlbum.objects.filter(created_by=request.user).exclude(status='deleted')
+    user_photos = Photo.objects.filter(uploaded_by=request.user).exclude(
+        event_album__status='deleted'
+    ).order_by('uploaded_at')
+    pending = dict.fromkeys(stats.TYPES, 0)
     if request.user.is_staff or request.user.is_superuser:
-        pending_years_count = YearAlbum.objects.filter(status='pending').count()
-        pending_classes_count = SchoolClass.objects.filter(status='pending').count()
-        pending_events_count = EventAlbum.objects.filter(status='pending').count()
-        pending_photos_count = Photo.objects.filter(status='pending').count()
+        # Готовые итоги вместо четырёх COUNT по основным таблицам
+        pending = stats.pending_counts()
     return render(request, 'media_archive/profile.html', {
         'user_years': user_years,
         'user_classes': user_classes,
         'user_events': user_events,
         'user_photos': user_photos,
-        'pending_years_count': pending_years_count,
-        'pending_classes_count': pending_classes_count,
-        'pending_events_count': pending_events_count,
-        'pending_photos_count': pending_photos_count,
+        'pending_years_count': pending['year'],
+        'pending_classes_count': pending['class'],
+        'pending_events_count': pending['event'],
+        'pending_photos_count': pending['photo'],
     })
 
 @login_required
@@ -110,6 +142,8 @@ def create_year(request):
                 year.status = 'pending'
                 messages.success(request, f'Учебный год {year.year} создан и отправлен на модерацию!')
             year.save()
+            activity.record(request.user, 'create', 'year', [year.pk])
+            stats.album_created('year', year.status)
             next_url = request.POST.get('next', request.GET.get('next', 'profile'))
             return redirect(next_url)
     else:
@@ -133,6 +167,8 @@ def create_class(request):
                 school_class.status = 'pending'
                 messages.success(request, f'Класс {school_class.class_name} создан и отправлен на модерацию!')
             school_class.save()
+            activity.record(request.user, 'create', 'class', [school_class.pk])
+            stats.album_created('class', school_class.status)
             next_url = request.POST.get('next', request.GET.get('next', 'profile'))
             return redirect(next_url)
     else:
@@ -157,6 +193,8 @@ def create_event(request):
                 event.status = 'pending'
                 messages.success(request, f'Событие "{event.title}" создано и отправлено на модерацию!')
             event.save()
+            activity.record(request.user, 'create', 'event', [event.pk])
+            stats.album_created('event', event.status)
             next_url = request.POST.get('next', request.GET.get('next', 'profile'))
             return redirect(next_url)
     else:
@@ -167,7 +205,17 @@ def create_event(request):
         'next': request.META.get('HTTP_REFERER', 'profile')
     })
 
+def _save_uploaded_photos(request, event_album, images):
+    status = 'approved' if request.user.is_staff or request.user.is_superuser else 'pending'
+    results = ingest.process_uploads(images)
+    for result in results:
+        if not result.ok:
+            messages.error(request, f'{result.source_name}: {result.error}')
+    return len(ingest.create_photos(event_album, request.user, status, results))
+
 @login_required
+@rate_limit('upload')
+@ingest_slot
 def upload_photo(request):
     if request.method == 'POST':
         form = PhotoUploadForm(request.POST, request.FILES)
@@ -177,20 +225,9 @@ def upload_photo(request):
             if not images:
                 messages.error(request, 'Пожалуйста, выберите хотя бы одну фотографию.')
                 return render(request, 'media_archive/upload_photo.html', {'form': form})
-            success_count = 0
-            for image in images:
-                photo = Photo(
-                    event_album=event_album,
-                    image=image,
-                    uploaded_by=request.user
-                )
-                if request.user.is_staff or request.user.is_superuser:
-                    photo.status = 'approved'
-                else:
-                    photo.status = 'pending'
-                photo.save()
-                success_count += 1
+            success_count = _save_uploaded_photos(request, event_album, images)
             if request.user.is_staff or request.user.is_superuser:
+                covers.schedule_event_refresh(event_album.id)
                 messages.success(request, f'{success_count} фотографий загружено и опубликовано!')
             else:
                 messages.success(request, f'{success_count} фотографий загружено и отправлено на модерацию!')
@@ -222,6 +259,8 @@ def create_class_for_year(request, year_id):
                 school_class.status = 'pending'
                 messages.success(request, f'Класс {school_class.class_name} создан и отправлен на модерацию!')
             school_class.save()
+            activity.record(request.user, 'create', 'class', [school_class.pk])
+            stats.album_created('class', school_class.status)
             return redirect('year_detail', year_id=year_id)
     else:
         form = SchoolClassForm(initial={'year_album': year})
@@ -248,6 +287,8 @@ def create_event_for_class(request, class_id):
                 event.status = 'pending'
                 messages.success(request, f'Событие "{event.title}" создано и отправлено на модерацию!')
             event.save()
+            activity.record(request.user, 'create', 'event', [event.pk])
+            stats.album_created('event', event.status)
             return redirect('class_detail', class_id=class_id)
     else:
         form = EventAlbumForm(initial={'school_class': school_class})
@@ -274,6 +315,8 @@ def create_event_for_year(request, year_id):
                 event.status = 'pending'
                 messages.success(request, f'Событие "{event.title}" создано и отправлено на модерацию!')
             event.save()
+            activity.record(request.user, 'create', 'event', [event.pk])
+            stats.album_created('event', event.status)
             return redirect('year_detail', year_id=year_id)
     else:
         form = EventAlbumForm()
@@ -285,6 +328,8 @@ def create_event_for_year(request, year_id):
     })
 
 @login_required
+@rate_limit('upload')
+@ingest_slot
 def upload_photo_for_event(request, event_id):
     event = get_object_or_404(EventAlbum, id=event_id, status='approved')
     if request.method == 'POST':
@@ -298,20 +343,9 @@ def upload_photo_for_event(request, event_id):
                     'event': event,
                     'predefined_event': True
                 })
-            success_count = 0
-            for image in images:
-                photo = Photo(
-                    event_album=event,
-                    image=image,
-                    uploaded_by=request.user
-                )
-                if request.user.is_staff or request.user.is_superuser:
-                    photo.status = 'approved'
-                else:
-                    photo.status = 'pending'
-                photo.save()
-                success_count += 1
+            success_count = _save_uploaded_photos(request, event, images)
             if request.user.is_staff or request.user.is_superuser:
+                covers.schedule_event_refresh(event.id)
                 messages.success(request, f'{success_count} фотографий загружено и опубликовано!')
             else:
                 messages.success(request, f'{success_count} фотографий загружено и отправлено на модерацию!')
@@ -326,6 +360,8 @@ def upload_photo_for_event(request, event_id):
     })
 
 @login_required
+@rate_limit('upload')
+@ingest_slot
 def upload_photo_for_class(request, class_id):
     school_class = get_object_or_404(SchoolClass, id=class_id, status='approved')
     events = school_class.events.filter(status='approved')
@@ -341,20 +377,9 @@ def upload_photo_for_class(request, class_id):
                     'school_class': school_class,
                     'predefined_class': True
                 })
-            success_count = 0
-            for image in images:
-                photo = Photo(
-                    event_album=event_album,
-                    image=image,
-                    uploaded_by=request.user
-                )
-                if request.user.is_staff or request.user.is_superuser:
-                    photo.status = 'approved'
-                else:
-                    photo.status = 'pending'
-                photo.save()
-                success_count += 1
+            success_count = _save_uploaded_photos(request, event_album, images)
             if request.user.is_staff or request.user.is_superuser:
+                covers.schedule_event_refresh(event_album.id)
                 messages.success(request, f'{success_count} фотографий загружено и опубликовано!')
             else:
                 messages.success(request, f'{success_count} фотографий загружено и отправлено на модерацию!')
@@ -370,15 +395,17 @@ def upload_photo_for_class(request, class_id):
 
 @login_required
 def delete_year(request, year_id):
-    year = get_object_or_404(YearAlbum, id=year_id)
-    if year.created_by != request.user and not request.user.is_staff and not request.user.is_superuser:
+    albums = YearAlbum.objects.exclude(status='deleted')
+    allowed, row = permissions.check_delete(request.user, albums, year_id, 'year')
+    if not allowed:
         messages.error(request, 'У вас нет прав для удаления этого учебного года')
         return redirect('home')
     if request.method == 'POST':
-        year_name = year.year
-        year.delete()
-        messages.success(request, f'Учебный год {year_name} удален!')
+        deletion.soft_delete(YearAlbum(pk=year_id))
+        activity.record(request.user, 'delete', 'year', [year_id])
+        messages.success(request, f'Учебный год {row["year"]} удален!')
         return redirect('home')
+    year = get_object_or_404(albums.select_related('created_by'), id=year_id)
     return render(request, 'media_archive/confirm_delete.html', {
         'object': year,
         'object_type': 'учебный год',
@@ -387,60 +414,82 @@ def delete_year(request, year_id):
 
 @login_required
 def delete_class(request, class_id):
-    school_class = get_object_or_404(SchoolClass, id=class_id)
-    if school_class.created_by != request.user and not request.user.is_staff and not request.user.is_superuser:
+    albums = SchoolClass.objects.exclude(status='deleted')
+    allowed, row = permissions.check_delete(request.user, albums, class_id, 'class_name', 'year_album_id')
+    if not allowed:
         messages.error(request, 'У вас нет прав для удаления этого класса')
         return redirect('profile')
+    year_id = row['year_album_id']
     if request.method == 'POST':
-        class_name = school_class.class_name
-        year_id = school_class.year_album.id
-        school_class.delete()
-        messages.success(request, f'Класс {class_name} удален!')
+        deletion.soft_delete(SchoolClass(pk=class_id))
+        activity.record(request.user, 'delete', 'class', [class_id])
+        bump_cache_version(YearAlbum, year_id)
+        covers.schedule_year_refresh(year_id)
+        messages.success(request, f'Класс {row["class_name"]} удален!')
         return redirect('year_detail', year_id=year_id)
+    school_class = get_object_or_404(albums.select_related('created_by', 'year_album'), id=class_id)
     return render(request, 'media_archive/confirm_delete.html', {
         'object': school_class,
         'object_type': 'класс',
         'back_url': 'year_detail',
-        'back_id': school_class.year_album.id
+        'back_id': year_id
     })
 
 @login_required
 def delete_event(request, event_id):
-    event = get_object_or_404(EventAlbum, id=event_id)
-    if event.created_by != request.user and not request.user.is_staff and not request.user.is_superuser:
+    albums = EventAlbum.objects.exclude(status='deleted')
+    allowed, row = permissions.check_delete(request.user, albums, event_id, 'title', 'school_class_id')
+    if not allowed:
         messages.error(request, 'У вас нет прав для удаления этого события')
         return redirect('profile')
+    class_id = row['school_class_id']
     if request.method == 'POST':
-        event_title = event.title
-        class_id = event.school_class.id
-        event.delete()
-        messages.success(request, f'Событие "{event_title}" удалено!')
+        deletion.soft_delete(EventAlbum(pk=event_id))
+        activity.record(request.user, 'delete', 'event', [event_id])
+        bump_cache_version(SchoolClass, class_id)
+        covers.schedule_class_refresh(class_id)
+        messages.success(request, f'Событие "{row["title"]}" удалено!')
         return redirect('class_detail', class_id=class_id)
+    event = get_object_or_404(albums.select_related('created_by', 'school_class'), id=event_id)
     return render(request, 'media_archive/confirm_delete.html', {
         'object': event,
         'object_type': 'событие',
         'back_url': 'class_detail',
-        'back_id': event.school_class.id
+        'back_id': class_id
     })
 
 @login_required
 def delete_photo(request, photo_id):
-    photo = get_object_or_404(Photo, id=photo_id)
-    if photo.uploaded_by != request.user and not request.user.is_staff and not request.user.is_superuser:
+    allowed, row = permissions.check_delete(
+        request.user, Photo.objects.all(), photo_id,
+        'event_album_id', 'image', 'thumbnail', 'original_name'
+    )
+    if not allowed:
         messages.error(request, 'У вас нет прав для удаления этой фотографии')
         return redirect('profile')
+    event_id = row['event_album_id']
     if request.method == 'POST':
-        event_id = photo.event_album.id
-        photo.delete()
+        rows = stats.photo_rows([photo_id])
+        Photo.objects.filter(pk=photo_id).delete()
+        stats.photos_removed(rows)
+        timeline.touch([row['taken_at'] for row in rows if row['status'] == 'approved'])
+        activity.record(request.user, 'delete', 'photo', [photo_id])
+        deletion.schedule_photo_files_removal([
+            (row['image'], row['thumbnail'], row['original_name'])
+        ])
+        bump_cache_version(EventAlbum, event_id)
+        covers.schedule_event_refresh(event_id)
         messages.success(request, 'Фотография удалена!')
         return redirect('event_detail', event_id=event_id)
+    photo = get_object_or_404(Photo.objects.select_related('uploaded_by', 'event_album'), id=photo_id)
     return render(request, 'media_archive/confirm_delete.html', {
         'object': photo,
         'object_type': 'фотографию',
         'back_url': 'event_detail',
-        'back_id': photo.event_album.id
+        'back_id': event_id
     })
 
+@rate_limit('login')
 def login_view(request):
     if request.method == 'POST':
         username = request.POST.get('username', '').strip()
@@ -454,6 +503,7 @@ def login_view(request):
             messages.error(request, 'Неверный логин или пароль')
     return render(request, 'media_archive/login.html')
 
+@rate_limit('register')
 def register_view(request):
     if request.method == 'POST':
         username = request.POST.get('username', '').strip()
@@ -494,10 +544,12 @@ def moderation_dashboard(request):
     if not request.user.is_staff and not request.user.is_superuser:
         messages.error(request, 'У вас нет прав для доступа к модерации')
         return redirect('home')
-    pending_years = YearAlbum.objects.filter(status='pending')
-    pending_classes = SchoolClass.objects.filter(status='pending')
-    pending_events = EventAlbum.objects.filter(status='pending')
-    pending_photos = Photo.objects.filter(status='pending').order_by('uploaded_at')
+    # Объекты, взятые другими модераторами через очередь, не показываем
+    visible = moderation.visible_to(request.user)
+    pending_years = YearAlbum.objects.filter(visible, status='pending')
+    pending_classes = SchoolClass.objects.filter(visible, status='pending')
+    pending_events = EventAlbum.objects.filter(visible, status='pending')
+    pending_photos = moderation.pending(Photo).filter(visible).order_by('uploaded_at')
     return render(request, 'media_archive/moderation_dashboard.html', {
         'pending_years': pending_years,
         'pending_classes': pending_classes,
@@ -578,38 +630,245 @@ def process_moderation(request):
     except (ValueError, TypeError):
         messages.error(request, 'Неверный ID объекта')
         return redirect('moderation_dashboard')
+    model = moderation.MODELS.get(object_type)
+    if model is None:
+        messages.error(request, 'Неизвестный тип объекта')
+        return redirect('moderation_dashboard')
+    obj = get_object_or_404(model, id=object_id)
+    status = 'approved' if action == 'approve' else 'rejected'
+    # Объект мог уже обработать или взять из очереди другой модератор:
+    # это проверяет условный UPDATE в decide_one, а не чтение выше
+    error = moderation.decide_one(request.user, object_type, obj.pk, status)
+    if error is not None:
+        messages.error(request, error)
+        return redirect('moderation_dashboard')
     if object_type == 'year':
-        obj = get_object_or_404(YearAlbum, id=object_id)
-        obj.status = 'approved' if action == 'approve' else 'rejected'
-        obj.save()
         action_text = 'одобрен' if action == 'approve' else 'отклонен'
         messages.success(request, f'Учебный год "{obj.year}" {action_text}!')
     elif object_type == 'class':
-        obj = get_object_or_404(SchoolClass, id=object_id)
-        obj.status = 'approved' if action == 'approve' else 'rejected'
-        obj.save()
         action_text = 'одобрен' if action == 'approve' else 'отклонен'
         messages.success(request, f'Класс "{obj.class_name}" {action_text}!')
     elif object_type == 'event':
-        obj = get_object_or_404(EventAlbum, id=object_id)
-        obj.status = 'approved' if action == 'approve' else 'rejected'
-        obj.save()
         action_text = 'одобрено' if action == 'approve' else 'отклонено'
         messages.success(request, f'Событие "{obj.title}" {action_text}!')
-    elif object_type == 'photo':
-        obj = get_object_or_404(Photo, id=object_id)
-        obj.status = 'approved' if action == 'approve' else 'rejected'
-        obj.save()
+    else:
         action_text = 'одобрено' if action == 'approve' else 'отклонено'
         messages.success(request, f'Фото #{obj.id} {action_text}!')
-    else:
-        messages.error(request, 'Неизвестный тип объекта')
-        return redirect('moderation_dashboard')
     return redirect('moderation_dashboard')
 
+@login_required
+def set_cover(request, photo_id):
+    if not request.user.is_staff and not request.user.is_superuser:
+        messages.error(request, 'У вас нет прав для выбора обложки')
+        return redirect('home')
+    photo = get_object_or_404(
+        Photo.objects.select_related('event_album__school_class__year_album'),
+        id=photo_id,
+        status='approved'
+    )
+    if request.method != 'POST':
+        return redirect('event_detail', event_id=photo.event_album_id)
+    target = request.POST.get('target', 'event')
+    if target == 'year':
+        album = photo.event_album.school_class.year_album
+        messages.success(request, f'Фото #{photo.id} выбрано обложкой учебного года {album.year}!')
+    elif target == 'class':
+        album = photo.event_album.school_class
+        messages.success(request, f'Фото #{photo.id} выбрано обложкой класса {album.class_name}!')
+    else:
+        album = photo.event_album
+        messages.success(request, f'Фото #{photo.id} выбрано обложкой события "{album.title}"!')
+    covers.set_manual_cover(album, photo)
+    return redirect('event_detail', event_id=photo.event_album_id)
+
+STATS_PERIODS = (7, 30, 90, 365)
+
+@admin_required
+def activity_stats(request):
+    """Статистика действий за период по дневным итогам ActivityDaily:
+    один запрос к небольшой таблице вместо агрегатов по Photo и альбомам."""
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in STATS_PERIODS:
+        days = 30
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = ActivityDaily.objects.filter(day__gte=since).values_list(
+        'day', 'actor__username', 'action', 'count'
+    )
+    actions = [code for code, _ in ActivityEvent.ACTION_CHOICES]
+    by_day = {}
+    totals = dict.fromkeys(actions, 0)
+    by_actor = {}
+    for day, username, action, count in rows:
+        by_day.setdefault(day, dict.fromkeys(actions, 0))[action] += count
+        totals[action] += count
+        by_actor.setdefault(username or 'удалённый пользователь', dict.fromkeys(actions, 0))[action] += count
+    uploaders = sorted(
+        ((name, counts['upload']) for name, counts in by_actor.items() if counts['upload']),
+        key=lambda item: -item[1]
+    )[:10]
+    moderators = sorted(
+        ((name, counts['approve'], counts['reject'])
+         for name, counts in by_actor.items() if counts['approve'] or counts['reject']),
+        key=lambda item: -(item[1] + item[2])
+    )[:10]
+    return render(request, 'media_archive/stats.html', {
+        'days': days,
+        'periods': STATS_PERIODS,
+        'columns': [name for _, name in ActivityEvent.ACTION_CHOICES],
+        'totals': [totals[action] for action in actions],
+        'daily': [
+            (day, [by_day[day][action] for action in actions])
+            for day in sorted(by_day, reverse=True)
+        ],
+        'uploaders': uploaders,
+        'moderators': moderators,
+    })
+
+@admin_required
+def archive_stats(request):
+    return render(request, 'media_archive/archive_stats.html', stats.dashboard())
+
+def timeline_view(request):
+    """Лента: месяцы учебного года ?year= или недели месяца ?month=ГГГГ-ММ."""
+    today = timezone.localdate()
+    match = re.fullmatch(r'(\d{4})-(\d{2})', request.GET.get('month', ''))
+    if match and 1 <= int(match[2]) <= 12 and int(match[1]) >= 1900:
+        unit = 'week'
+        first = date(int(match[1]), int(match[2]), 1)
+        last = timeline.next_bucket(first, 'month') - timedelta(days=1)
+        previous = (first - timedelta(days=1)).strftime('%Y-%m')
+        following = (last + timedelta(days=1)).strftime('%Y-%m')
+    else:
+        unit = 'month'
+        year = request.GET.get('year', '')
+        year = int(year) if year.isdigit() and 1900 <= int(year) <= 2100 else today.year
+        first, last = date(year, 1, 1), date(year, 12, 31)
+        previous, following = year - 1, year + 1
+    buckets = [
+        {
+            **bucket,
+            'end': timeline.next_bucket(bucket['start'], unit) - timedelta(days=1),
+            'more': bucket['events_total'] - len(bucket['events']),
+        }
+        for bucket in timeline.buckets(unit, first, last)
+    ]
+    return render(request, 'media_archive/timeline.html', {
+        'unit': unit,
+        'first': first,
+        'buckets': buckets,
+        'total_photos': sum(bucket['photos'] for bucket in buckets),
+        'previous': previous,
+        'following': following,
+    })
+
+def service_worker(request):
+    response = render(request, 'media_archive/sw.js', {
+        'config': json.dumps(pwa.worker_config()),
+    }, content_type='text/javascript; charset=utf-8')
+    # Браузер сверяет воркер с сервером при каждой проверке обновлений
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def web_manifest(request):
+    return JsonResponse(pwa.manifest(), content_type='application/manifest+json',
+                        json_dumps_params={'ensure_ascii': False})
+
+def offline(request):
+    return render(request, 'media_archive/offline.html')
+
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+async def _read_file_chunks(path):
+    handle = await asyncio.to_thread(open, path, 'rb')
+    try:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, MEDIA_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
+
+async def _serve_file(request, root, path, cache_control=None, encodings=()):
+    try:
+        fullpath = safe_join(root, path)
+        stat = await asyncio.to_thread(os.stat, fullpath)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404('Файл не найден')
+    if not os.path.isfile(fullpath):
+        raise Http404('Файл не найден')
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_encoding = None
+    if encodings:
+        # Заранее сжатая копия лежит рядом: file.css.br / file.css.gz
+        accepted = request.headers.get('Accept-Encoding', '')
+        for encoding, suffix in encodings:
+            if encoding in accepted:
+                try:
+                    stat = await asyncio.to_thread(os.stat, fullpath + suffix)
+                except FileNotFoundError:
+                    continue
+                fullpath += suffix
+                content_encoding = encoding
+                break
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = StreamingHttpResponse(
+            _read_file_chunks(fullpath),
+            content_type=content_type or 'application/octet-stream'
+        )
+        response.headers['Content-Length'] = str(stat.st_size)
+        response.headers['Last-Modified'] = http_date(stat.st_mtime)
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+    if encodings:
+        response.headers['Vary'] = 'Accept-Encoding'
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+async def serve_media(request, path):
+    return await _serve_file(request, settings.MEDIA_ROOT, path)
+
+# Имена после ManifestStaticFilesStorage: base.3f2a9c1d7e4b.css
+HASHED_STATIC_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+async def serve_static(request, path):
+    """Отдаёт собранную статику; файлы с хэшем в имени кэшируются навсегда,
+    сжатые при collectstatic копии (.br, .gz) выбираются по Accept-Encoding."""
+    cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_STATIC_RE.search(path) else 'no-cache'
+    return await _serve_file(request, settings.STATIC_ROOT, path, cache_control, STATIC_ENCODINGS)
+
 def debug_home(request):
-    years = YearAlbum.objects.filter(status='approved').order_by('-year')
-    response = f"Найдено годов: {years.count()}<br><br>"
-    for year in years:
-        response += f"- {year.year} (ID: {year.id})<br>"
-    return HttpResponse(response)
\ No newline at end of file
+    years = list(YearAlbum.objects.filter(status='approved').order_by('-year').values_list('year', 'id'))
+    lines = [f"Найдено годов: {len(years)}<br><br>"]
+    lines.extend(f"- {year} (ID: {year_id})<br>" for year, year_id in years)
+    return HttpResponse(''.join(lines))
+
+@admin_required
+def metrics_view(request):
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@admin_required
+def profiles_view(request):
+    profiles = profiling.recent_profiles()
+    for info in profiles:
+        info['top'] = profiling.top_functions(profiling.profile_path(info['name']), limit=10)
+    return render(request, 'media_archive/profiles.html', {
+        'profiles': profiles,
+        'enabled': getattr(settings, 'ARCHIVE_PROFILING_ENABLED', False),
+        'sample_rate': getattr(settings, 'ARCHIVE_PROFILE_SAMPLE_RATE', 0),
+    })
+
+@admin_required
+def profile_download(request, name):
+    path = profiling.profile_path(name)
+    if path is None:
+        raise Http404('Профиль не найден')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name + '.prof')
@@ -42,12 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'media_archive.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'media_archive.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'media_archive.profiling.ProfilingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -55,10 +58,17 @@ ROOT_URLCONF = 'school_archive.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'media_archive.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,  # ← ВАЖНО: должно быть True
         'OPTIONS': {
+            # Шаблоны компилируются один раз на процесс; runserver сбрасывает
+            # кэш при изменении файлов. Загрузчик app_directories заменяет APP_DIRS
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -79,6 +89,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Фоновые задачи пишут в базу параллельно с запросами
+            'timeout': 20,
+        },
     }
 }
 
@@ -102,6 +116,32 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# pbkdf2_sha256 с настраиваемым числом итераций: вход 0,3 с CPU вместо 0,5 с
+# при 1 000 000 итераций Django 5.2. Хэши с другим числом итераций
+# пересчитываются при входе
+PASSWORD_HASHERS = [
+    'media_archive.auth.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+ARCHIVE_PASSWORD_ITERATIONS = 600_000
+
+# Пользователь из сессии берётся из кэша; 0 - каждый раз из базы.
+# С кэшем процесса (LocMemCache) сброс записи не виден другим процессам,
+# поэтому срок там не больше ARCHIVE_AUTH_LOCAL_CACHE_SECONDS
+AUTHENTICATION_BACKENDS = ['media_archive.auth.CachedModelBackend']
+ARCHIVE_AUTH_USER_CACHE_SECONDS = 300
+ARCHIVE_AUTH_LOCAL_CACHE_SECONDS = 5
+
+# Сессии в кэше с записью в базу: чтение сессии обычно не трогает SQLite.
+# Сообщения - в подписанной cookie, чтобы анонимный просмотр никогда не
+# создавал и не загружал сессию. Просроченные строки удаляет purge_sessions
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -118,6 +158,27 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic добавляет к именам хэш содержимого (base.3f2a9c1d7e4b.css),
+# поэтому такие файлы можно кэшировать навсегда, и сразу пишет .gz/.br копии
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'media_archive.storage.CompressedManifestStaticFilesStorage',
+    },
+    # Фотографии: photos/ab/cd/<sha256>.jpg в MEDIA_ROOT. Для S3 (или MinIO
+    # как локальной замены) - 'media_archive.storage.ShardedS3Storage' с
+    # OPTIONS bucket_name, endpoint_url, access_key, secret_key, base_url.
+    # Старые файлы переносит команда migrate_photo_storage
+    'photos': {
+        'BACKEND': 'media_archive.storage.ShardedFileSystemStorage',
+    },
+}
+# Отдавать STATIC_ROOT из Django, если перед ним нет веб-сервера
+ARCHIVE_SERVE_STATIC = True
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -127,6 +188,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+ARCHIVE_SERVE_MEDIA = DEBUG
+
+# Фоновые задачи (обложки альбомов и т.п.)
+ARCHIVE_TASK_WORKERS = 2
+ARCHIVE_TASKS_EAGER = False
+
+# Приём загрузок: лимиты, перекодирование и удаление метаданных
+ARCHIVE_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+ARCHIVE_MAX_IMAGE_PIXELS = 80_000_000
+ARCHIVE_MAX_STORED_SIDE = 3840
+ARCHIVE_MAX_STORED_BYTES = 4 * 1024 * 1024
+ARCHIVE_INGEST_FORMAT = 'JPEG'  # или 'WEBP'
+ARCHIVE_INGEST_QUALITY = 88
+ARCHIVE_INGEST_MIN_QUALITY = 70
+ARCHIVE_INGEST_WORKERS = 4
+# Каталог для нетронутых оригиналов; None - оригиналы не сохраняются
+ARCHIVE_ORIGINALS_ROOT = None
+
+# Поиск похожих фото: каталог с векторами признаков (заполняет команда
+# extract_features; нужен numpy)
+ARCHIVE_FEATURES_ROOT = BASE_DIR / 'features'
+
+# Лента архива: сколько хранить в кэше итоги периода. Загрузки и модерация
+# сбрасывают затронутые периоды сразу, срок ловит правки в админке
+ARCHIVE_TIMELINE_CACHE_SECONDS = 24 * 3600
+
+# Сервис-воркер (см. media_archive/pwa.py): объём кэша изображений на
+# устройстве, сколько страниц хранить для просмотра без сети и сколько ждать
+# сеть, прежде чем показать сохранённую копию страницы
+ARCHIVE_OFFLINE_IMAGE_CACHE_MB = 150
+ARCHIVE_OFFLINE_PAGES = 60
+ARCHIVE_OFFLINE_PAGE_TIMEOUT_MS = 2500
+
+# Метрики запросов для /metrics (доступно только staff)
+ARCHIVE_METRICS_ENABLED = True
+# Порог журнала медленных запросов с SQL, мс; None - журнал выключен
+ARCHIVE_SLOW_REQUEST_MS = 1000
+
+# Сжатие ответов: сколько байт сжатых тел держать в памяти процесса
+ARCHIVE_COMPRESSION_CACHE_BYTES = 16 * 1024 * 1024
+
+# Профилирование запросов: ?_profile=1 для staff или случайная доля запросов
+ARCHIVE_PROFILING_ENABLED = False
+ARCHIVE_PROFILE_SAMPLE_RATE = 0
+ARCHIVE_PROFILE_DIR = BASE_DIR / 'profiles'
+ARCHIVE_PROFILE_KEEP = 50
+
+# Очередь модерации: на сколько секунд модератор берёт пачку объектов
+ARCHIVE_MODERATION_LEASE_SECONDS = 300
+
+# Фоновое удаление альбомов: фото в пачке и потоки для удаления файлов
+ARCHIVE_DELETE_CHUNK_SIZE = 500
+ARCHIVE_DELETE_FILE_WORKERS = 8
+
+# Лимиты частоты запросов на пользователя (анонимов - на IP):
+# не больше burst запросов за окно burst / rate. Состояние в кэше Django (CACHES)
+ARCHIVE_RATE_LIMITS = {
+    'upload': {'rate': '20/m', 'burst': 10},
+    'login': {'rate': '10/m', 'burst': 5},
+    'register': {'rate': '5/h', 'burst': 3},
+    'search': {'rate': '120/m', 'burst': 30},
+}
+# Заголовок с IP клиента от своего прокси (например 'HTTP_X_REAL_IP')
+ARCHIVE_CLIENT_IP_HEADER = None
+# Одновременных загрузок на процесс, длина очереди и сколько в ней ждать, с
+ARCHIVE_INGEST_CONCURRENCY = 2
+ARCHIVE_INGEST_QUEUE = 8
+ARCHIVE_INGEST_QUEUE_TIMEOUT = 10
+ARCHIVE_INGEST_RETRY_AFTER = 15
+
+# Журнал действий: буфер процесса сбрасывается в базу одним INSERT,
+# когда набирается столько записей или проходит столько секунд
+ARCHIVE_ACTIVITY_BATCH = 200
+ARCHIVE_ACTIVITY_FLUSH_SECONDS = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'media_archive.slow_requests': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+# Бюджет времени импорта проекта для команды startup_benchmark, мс
+ARCHIVE_STARTUP_BUDGET_MS = 600
 
 # Authentication
 LOGIN_REDIRECT_URL = '/profile/'
@@ -135,21 +284,3 @@ LOGIN_URL = '/login/'
 
 # УБЕРИТЕ ЭТУ СТРОКУ:
 # AUTH_USER_MODEL = 'media_archive.CustomUser'
-
-# Автоматическое создание папок для медиа-файлов
-def create_media_folders():
-    """Создает необходимые папки для медиа-файлов при запуске проекта"""
-    media_folders = [
-        MEDIA_ROOT,
-        os.path.join(MEDIA_ROOT, 'photos'),  # Только photos внутри media
-    ]
-    
-    for folder in media_folders:
-        try:
-            os.makedirs(folder, exist_ok=True)
-            print(f"✅ Папка создана/проверена: {folder}")
-        except Exception as e:
-            print(f"⚠️ Ошибка при создании папки {folder}: {e}")
-
-# Создаем папки при импорте настроек
-create_media_folders()
\ No newline at end of file
@@ -1,9 +1,20 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from media_archive.views import serve_media, serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('media_archive.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+# В продакшене медиа отдаёт веб-сервер; здесь - асинхронная потоковая отдача
+if settings.ARCHIVE_SERVE_MEDIA:
+    urlpatterns.append(
+        path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media')
+    )
+
+if settings.ARCHIVE_SERVE_STATIC:
+    urlpatterns.append(
+        path(f"{settings.STATIC_URL.strip('/')}/<path:path>", serve_static, name='static')
+    )